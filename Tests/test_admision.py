@@ -0,0 +1,168 @@
+import os
+import sys
+import csv
+import time
+import uuid
+import asyncio
+import tempfile
+import subprocess
+import zmq
+import zmq.asyncio
+import matplotlib.pyplot as plt
+from codec import codificar, decodificar
+
+# Levanta un central en localhost y le ofrece carga en lazo abierto (a ritmo fijo, sin esperar
+# respuestas) por encima de su capacidad, con y sin control de admisión. Goodput = respuestas
+# exitosas que llegan antes de que el cliente deje de esperar.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CENTRAL = "tcp://127.0.0.1:5555"
+FACTORES_CARGA = [0.5, 1, 2, 4]  # carga ofrecida como múltiplo de la capacidad medida
+SEGUNDOS_POR_PUNTO = 5
+PLAZO_CLIENTE = 1.0              # segundos; una respuesta posterior ya no le sirve a nadie
+SEGUNDOS_CAPACIDAD = 3
+EN_VUELO_CAPACIDAD = 64
+
+# Un commit por solicitud fija la capacidad en algunos cientos por segundo, al alcance del generador
+PROGRAMA_CENTRAL = """
+import servidor
+servidor.IP_DEL_BACKUP = "127.0.0.1"
+servidor.TAM_LOTE_ESCRITURA = 1
+servidor.MAX_EN_COLA = {max_en_cola}
+servidor.LATENCIA_OBJETIVO_MS = {objetivo}
+servidor.ServidorCentral().recibir_y_atender()
+"""
+CONFIGURACIONES = {
+    "sin control de admisión": {"max_en_cola": None, "objetivo": None},
+    "con control de admisión": {"max_en_cola": 1000, "objetivo": 200},
+}
+
+def lanzar(configuracion, directorio):
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    return subprocess.Popen([sys.executable, "-c", PROGRAMA_CENTRAL.format(**configuracion)], cwd=directorio,
+                            env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def solicitud():
+    return {
+        "uuid": str(uuid.uuid4()),
+        "facultad": "Facultad de Ingeniería",
+        "num_salones": 1,
+        "num_laboratorios": 0,
+        "franja_inicio": 0,
+        "franja_fin": 1
+    }
+
+async def medir_capacidad(contexto):
+    """Solicitudes por segundo que atiende el central con EN_VUELO_CAPACIDAD siempre en vuelo."""
+    socket = contexto.socket(zmq.DEALER)
+    socket.connect(CENTRAL)
+    for _ in range(EN_VUELO_CAPACIDAD):
+        await socket.send_multipart([b"", codificar(solicitud())])
+    atendidas = 0
+    fin = time.time() + SEGUNDOS_CAPACIDAD
+    while time.time() < fin:
+        _, datos = await socket.recv_multipart()
+        atendidas += 1
+        await socket.send_multipart([b"", codificar(solicitud())])
+    socket.close(linger=0)
+    return atendidas / SEGUNDOS_CAPACIDAD
+
+async def ofrecer(contexto, ritmo):
+    """Envía `ritmo` solicitudes por segundo durante SEGUNDOS_POR_PUNTO y clasifica las respuestas."""
+    socket = contexto.socket(zmq.DEALER)
+    socket.connect(CENTRAL)
+    enviadas = {}
+    resultados = {"exitosas": 0, "tardias": 0, "ocupado": 0, "latencias": []}
+
+    async def recibir():
+        while True:
+            _, datos = await socket.recv_multipart()
+            respuesta, _ = decodificar(datos)
+            latencia = time.time() - enviadas.pop(respuesta.get("uuid"), time.time())
+            if respuesta.get("status") == "ocupado":
+                resultados["ocupado"] += 1
+            elif latencia > PLAZO_CLIENTE:
+                resultados["tardias"] += 1
+            else:
+                resultados["exitosas"] += 1
+                resultados["latencias"].append(latencia)
+
+    receptor = asyncio.ensure_future(recibir())
+    inicio = time.time()
+    total = int(ritmo * SEGUNDOS_POR_PUNTO)
+    for i in range(total):
+        # Lazo abierto: el ritmo no depende de cuánto tarda el servidor
+        await asyncio.sleep(max(0, inicio + i / ritmo - time.time()))
+        mensaje = solicitud()
+        enviadas[mensaje["uuid"]] = time.time()
+        await socket.send_multipart([b"", codificar(mensaje)])
+    await asyncio.sleep(PLAZO_CLIENTE)
+    receptor.cancel()
+    socket.close(linger=0)
+    resultados["sin_respuesta"] = len(enviadas)
+    resultados["ofrecidas"] = total
+    return resultados
+
+def medir(nombre, configuracion, ritmo):
+    with tempfile.TemporaryDirectory() as directorio:
+        central = lanzar(configuracion, directorio)
+        time.sleep(1.5)
+        contexto = zmq.asyncio.Context()
+        try:
+            if ritmo is None:
+                return asyncio.run(medir_capacidad(contexto))
+            return asyncio.run(ofrecer(contexto, ritmo))
+        finally:
+            contexto.term()
+            central.kill()
+            central.wait()
+
+def main():
+    capacidad = medir("capacidad", CONFIGURACIONES["sin control de admisión"], None)
+    print(f"==> Capacidad medida: {capacidad:.0f} sol/s")
+
+    filas = []
+    for nombre, configuracion in CONFIGURACIONES.items():
+        for factor in FACTORES_CARGA:
+            ritmo = capacidad * factor
+            r = medir(nombre, configuracion, ritmo)
+            latencias = sorted(r["latencias"]) or [0]
+            fila = {
+                "configuracion": nombre,
+                "factor_carga": factor,
+                "ofrecidas_por_s": r["ofrecidas"] / SEGUNDOS_POR_PUNTO,
+                "goodput_por_s": r["exitosas"] / SEGUNDOS_POR_PUNTO,
+                "rechazadas_por_s": r["ocupado"] / SEGUNDOS_POR_PUNTO,
+                "tardias_o_perdidas_por_s": (r["tardias"] + r["sin_respuesta"]) / SEGUNDOS_POR_PUNTO,
+                "p99_ms": latencias[int(len(latencias) * 0.99) - 1 if len(latencias) > 1 else 0] * 1000
+            }
+            print(f"==> {nombre:24} carga x{factor}: goodput {fila['goodput_por_s']:.0f}/{fila['ofrecidas_por_s']:.0f} sol/s | "
+                  f"ocupado {fila['rechazadas_por_s']:.0f}/s | tardías {fila['tardias_o_perdidas_por_s']:.0f}/s | "
+                  f"p99 {fila['p99_ms']:.0f} ms")
+            filas.append(fila)
+
+    with open("admision.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(filas[0]))
+        writer.writeheader()
+        writer.writerows(filas)
+
+    # Gráfica: goodput y p99 de las exitosas frente a la carga ofrecida
+    fig, ax = plt.subplots(2, 1, figsize=(8, 7))
+    for nombre in CONFIGURACIONES:
+        datos = [f for f in filas if f["configuracion"] == nombre]
+        ax[0].plot([f["ofrecidas_por_s"] for f in datos], [f["goodput_por_s"] for f in datos], marker="o", label=nombre)
+        ax[1].plot([f["ofrecidas_por_s"] for f in datos], [f["p99_ms"] for f in datos], marker="o", label=nombre)
+    ax[0].axvline(capacidad, color="black", linestyle="--", label="capacidad")
+    ax[0].set_ylabel(f"Goodput (exitosas en < {PLAZO_CLIENTE:.0f} s por s)")
+    ax[0].set_title("Goodput con carga ofrecida por encima de la capacidad")
+    ax[1].set_xlabel("Carga ofrecida (sol/s)")
+    ax[1].set_ylabel("p99 de las exitosas (ms)")
+    for a in ax:
+        a.legend()
+        a.grid(True)
+
+    plt.tight_layout()
+    plt.savefig("grafico_admision.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
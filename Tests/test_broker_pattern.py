@@ -3,7 +3,7 @@ import time
 import statistics
 import csv
 import matplotlib.pyplot as plt
-from facultad import enviar_peticiones_a_facultad_balanceado
+from facultad import enviar_peticiones_a_facultad_broker
 
 NUM_FACULTADES = 5
 PROGRAMAS_POR_FACULTAD = 5
@@ -14,7 +14,7 @@ ESCENARIOS = [
 
 def programa_academico(facultad_id, programa_id, aulas, labs, resultados):
     start = time.time()
-    response = enviar_peticiones_a_facultad_balanceado(facultad_id, aulas, labs)
+    response = enviar_peticiones_a_facultad_broker(facultad_id, aulas, labs)
     end = time.time()
 
     resultado = {
@@ -0,0 +1,72 @@
+import threading
+import time
+import statistics
+import csv
+import matplotlib.pyplot as plt
+from facultad import Facultad, FACULTADES
+
+CLIENTES_CONCURRENTES = [1, 5, 10, 25, 50]
+SOLICITUDES_POR_CLIENTE = 20
+AULAS = 1
+LABS = 0
+
+def cliente(facultad_id, n, rtts):
+    facultad = Facultad(FACULTADES[facultad_id % len(FACULTADES) + 1])
+    for _ in range(n):
+        inicio = time.time()
+        facultad.enviar_solicitud(AULAS, LABS)
+        fin = time.time()
+        rtts.append((fin - inicio) * 1000)
+
+def percentil(valores, p):
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+def ejecutar_carga(num_clientes):
+    rtts = []
+    threads = [
+        threading.Thread(target=cliente, args=(i, SOLICITUDES_POR_CLIENTE, rtts))
+        for i in range(num_clientes)
+    ]
+    inicio = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracion = time.time() - inicio
+
+    return {
+        "clientes": num_clientes,
+        "p50": percentil(rtts, 50),
+        "p99": percentil(rtts, 99),
+        "throughput": len(rtts) / duracion
+    }
+
+def main():
+    resultados = []
+    for n in CLIENTES_CONCURRENTES:
+        print(f"\nCarga con {n} facultades concurrentes...")
+        r = ejecutar_carga(n)
+        print(f"==> {n} clientes - p50: {r['p50']:.2f} ms | p99: {r['p99']:.2f} ms | {r['throughput']:.0f} sol/s")
+        resultados.append(r)
+        time.sleep(1)
+
+    with open("carga_concurrente.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["clientes", "p50", "p99", "throughput"])
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica
+    x = [r["clientes"] for r in resultados]
+    plt.plot(x, [r["p50"] for r in resultados], marker="o", label="p50")
+    plt.plot(x, [r["p99"] for r in resultados], marker="o", color="red", label="p99")
+    plt.xlabel("Facultades concurrentes")
+    plt.ylabel("Latencia (ms)")
+    plt.title("Latencia vs clientes concurrentes (ROUTER/DEALER)")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("grafico_carga_concurrente.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
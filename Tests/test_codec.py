@@ -0,0 +1,94 @@
+import csv
+import timeit
+import uuid
+import matplotlib.pyplot as plt
+from codec import codificar, decodificar, CODEC_JSON, CODEC_MSGPACK, CODEC_BINARIO
+
+# Microbenchmark del codec: no requiere servidores
+CODECS = [CODEC_JSON, CODEC_MSGPACK, CODEC_BINARIO]
+REPETICIONES = 20000
+EVENTOS_POR_LOTE = 500
+
+def mensajes():
+    solicitud = {
+        "uuid": str(uuid.uuid4()),
+        "facultad": "Facultad de Ingeniería",
+        "num_salones": 7,
+        "num_laboratorios": 2,
+        "plazo": 1747736130.5
+    }
+    # Tal como la envía el servidor: con las franjas y los IDs concretos asignados
+    respuesta = {
+        "status": "success",
+        "uuid": solicitud["uuid"],
+        "salones_asignados": 7,
+        "laboratorios_asignados": 2,
+        "salones_restantes": 443,
+        "laboratorios_restantes": 138,
+        "franja_inicio": 42,
+        "franja_fin": 84,
+        "ids_salones": [0, 1, 2, 3, 4, 5, 6],
+        "ids_laboratorios": [0, 1]
+    }
+    lote = {"tipo": "lote", "eventos": [{
+        "tipo": "reserva",
+        "uuid": str(uuid.uuid4()),
+        "facultad": "Facultad de Ingeniería",
+        "salones_asignados": 7,
+        "laboratorios_asignados": 2,
+        "fecha": "2025-05-20T10:15:30.123456",
+        "seq": seq
+    } for seq in range(EVENTOS_POR_LOTE)]}
+    return {"solicitud": solicitud, "respuesta": respuesta, "lote_replicacion": lote}
+
+def medir(mensaje, codec):
+    datos = codificar(mensaje, codec)
+    assert decodificar(datos)[0] == mensaje
+    repeticiones = max(1, REPETICIONES // len(mensaje.get("eventos", [None])))
+    codificacion = timeit.timeit(lambda: codificar(mensaje, codec), number=repeticiones) / repeticiones
+    decodificacion = timeit.timeit(lambda: decodificar(datos), number=repeticiones) / repeticiones
+    return len(datos), codificacion * 1e6, decodificacion * 1e6
+
+def main():
+    resultados = []
+    for nombre, mensaje in mensajes().items():
+        por_reserva = len(mensaje.get("eventos", [None]))
+        for codec in CODECS:
+            tam, cod, dec = medir(mensaje, codec)
+            print(f"{nombre:17} {codec:8} | {tam / por_reserva:7.1f} bytes/reserva | "
+                  f"codificar: {cod:8.2f} µs | decodificar: {dec:8.2f} µs")
+            resultados.append({
+                "mensaje": nombre,
+                "codec": codec,
+                "bytes": tam,
+                "bytes_por_reserva": tam / por_reserva,
+                "codificar_us": cod,
+                "decodificar_us": dec
+            })
+
+    with open("rendimiento_codec.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["mensaje", "codec", "bytes", "bytes_por_reserva", "codificar_us", "decodificar_us"])
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica: bytes por reserva y coste de codificar + decodificar la respuesta
+    fig, ax = plt.subplots(2, 1, figsize=(8, 6))
+    for i, nombre in enumerate(["solicitud", "respuesta", "lote_replicacion"]):
+        filas = [r for r in resultados if r["mensaje"] == nombre]
+        x = [j + i * 0.25 for j in range(len(CODECS))]
+        ax[0].bar(x, [r["bytes_por_reserva"] for r in filas], width=0.25, label=nombre)
+        ax[1].bar(x, [r["codificar_us"] + r["decodificar_us"] for r in filas], width=0.25, label=nombre)
+    for a in ax:
+        a.set_xticks([j + 0.25 for j in range(len(CODECS))])
+        a.set_xticklabels(CODECS)
+        a.legend()
+    ax[0].set_ylabel("Bytes por reserva")
+    ax[0].set_title("Tamaño en el cable por codec")
+    ax[1].set_ylabel("Codificar + decodificar (µs)")
+
+    plt.tight_layout()
+    plt.savefig("grafico_rendimiento_codec.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
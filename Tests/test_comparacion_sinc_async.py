@@ -1,8 +1,8 @@
 import time
 import csv
+import asyncio
 import matplotlib.pyplot as plt
-from facultad import Facultad
-from concurrent.futures import ThreadPoolExecutor
+from facultad import Facultad, ClienteAsincrono
 
 # Configuración
 FACULTAD = "Facultad de Ingeniería"
@@ -10,35 +10,46 @@ AULAS = 5
 LABS = 3
 LOTES = [100, 200, 300]  # Tamaños de lote a comparar
 REPETICIONES = 3
-MAX_HILOS_ASYNC = 50     # Controla cuántos hilos simultáneos usa el modo asíncrono
+EXITOSAS = ("success", "partial")  # "ocupado" o sin respuesta no cuentan como solicitud atendida
 
 # Envío SÍNCRONO: uno por uno
 def medir_sync(facultad_nombre, n, aulas, labs):
     facultad = Facultad(facultad_nombre)
     rtts = []
+    rechazadas = 0
+    inicio_lote = time.time()
     for _ in range(n):
         inicio = time.time()
-        facultad.enviar_solicitud(aulas, labs)
+        respuesta = facultad.enviar_solicitud(aulas, labs)
         fin = time.time()
-        rtts.append((fin - inicio) * 1000)
-    return rtts
-
-# Envío ASÍNCRONO: en paralelo con hilos limitados
-def medir_async(facultad_nombre, n, aulas, labs, max_workers=MAX_HILOS_ASYNC):
-    resultados = [0] * n
-
-    def enviar(i):
-        facultad = Facultad(facultad_nombre)
-        inicio = time.time()
-        facultad.enviar_solicitud(aulas, labs)
-        fin = time.time()
-        resultados[i] = (fin - inicio) * 1000
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for i in range(n):
-            executor.submit(enviar, i)
-
-    return resultados
+        if respuesta and respuesta.get("status") in EXITOSAS:
+            rtts.append((fin - inicio) * 1000)
+        else:
+            rechazadas += 1
+    return rtts, (time.time() - inicio_lote) * 1000, rechazadas
+
+# Envío ASÍNCRONO: todas las solicitudes en vuelo a la vez sobre un solo DEALER (zmq.asyncio)
+def medir_async(facultad_nombre, n, aulas, labs):
+    async def lote():
+        cliente = ClienteAsincrono()
+        rtts = []
+        rechazadas = []
+
+        async def enviar():
+            inicio = time.time()
+            respuesta = await cliente.reservar(facultad_nombre, aulas, labs)
+            if respuesta and respuesta.get("status") in EXITOSAS:
+                rtts.append((time.time() - inicio) * 1000)
+            else:
+                rechazadas.append(respuesta)
+
+        inicio_lote = time.time()
+        await asyncio.gather(*(enviar() for _ in range(n)))
+        duracion = (time.time() - inicio_lote) * 1000
+        cliente.cerrar()
+        return rtts, duracion, len(rechazadas)
+
+    return asyncio.run(lote())
 
 # Programa principal
 def main():
@@ -48,39 +59,58 @@ def main():
     for n in LOTES:
         total_sync = []
         total_async = []
+        duraciones_sync = []
+        duraciones_async = []
+        rechazadas_sync = 0
+        rechazadas_async = 0
 
         print(f"\nLote de {n} solicitudes...")
 
         for _ in range(REPETICIONES):
-            total_sync.extend(medir_sync(FACULTAD, n, AULAS, LABS))
-            total_async.extend(medir_async(FACULTAD, n, AULAS, LABS))
-
-        prom_sync = sum(total_sync) / len(total_sync)
-        prom_async = sum(total_async) / len(total_async)
-        datos_sync.append((n, prom_sync))
-        datos_async.append((n, prom_async))
-
-        print(f"⏱️  {n} solicitudes: Síncrono = {prom_sync:.2f} ms, Asíncrono = {prom_async:.2f} ms")
+            rtts, duracion, rechazadas = medir_sync(FACULTAD, n, AULAS, LABS)
+            total_sync.extend(rtts)
+            duraciones_sync.append(duracion)
+            rechazadas_sync += rechazadas
+            rtts, duracion, rechazadas = medir_async(FACULTAD, n, AULAS, LABS)
+            total_async.extend(rtts)
+            duraciones_async.append(duracion)
+            rechazadas_async += rechazadas
+
+        prom_sync = sum(total_sync) / len(total_sync) if total_sync else 0
+        prom_async = sum(total_async) / len(total_async) if total_async else 0
+        lote_sync = sum(duraciones_sync) / len(duraciones_sync)
+        lote_async = sum(duraciones_async) / len(duraciones_async)
+        datos_sync.append((n, prom_sync, lote_sync, rechazadas_sync / REPETICIONES))
+        datos_async.append((n, prom_async, lote_async, rechazadas_async / REPETICIONES))
+
+        print(f"⏱️  {n} solicitudes: Síncrono = {prom_sync:.2f} ms ({lote_sync:.0f} ms el lote), "
+              f"Asíncrono = {prom_async:.2f} ms ({lote_async:.0f} ms el lote)")
+        print(f"   Rechazadas o sin respuesta por lote: síncrono {rechazadas_sync / REPETICIONES:.0f}, "
+              f"asíncrono {rechazadas_async / REPETICIONES:.0f}")
 
     # Guardar resultados en CSV
     with open("comparacion_sinc_async.csv", "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["lote", "rtt_sync", "rtt_async"])
+        writer.writerow(["lote", "rtt_sync", "rtt_async", "duracion_lote_sync", "duracion_lote_async",
+                         "rechazadas_sync", "rechazadas_async"])
         for s, a in zip(datos_sync, datos_async):
-            writer.writerow([s[0], s[1], a[1]])
+            writer.writerow([s[0], s[1], a[1], s[2], a[2], s[3], a[3]])
 
     # Graficar
     x = [s[0] for s in datos_sync]
-    y_sync = [s[1] for s in datos_sync]
-    y_async = [a[1] for a in datos_async]
-
-    plt.plot(x, y_sync, marker="o", label="Síncrono")
-    plt.plot(x, y_async, marker="o", color="green", label="Asíncrono (ThreadPool)")
-    plt.xlabel("Número de Solicitudes")
-    plt.ylabel("RTT Promedio (ms)")
-    plt.title("Comparación de Desempeño: Síncrono vs Asíncrono")
-    plt.grid(True)
-    plt.legend()
+    fig, ax = plt.subplots(2, 1, figsize=(8, 6))
+    ax[0].plot(x, [s[1] for s in datos_sync], marker="o", label="Síncrono")
+    ax[0].plot(x, [a[1] for a in datos_async], marker="o", color="green", label="Asíncrono (zmq.asyncio)")
+    ax[0].set_ylabel("RTT Promedio (ms)")
+    ax[0].set_title("Comparación de Desempeño: Síncrono vs Asíncrono")
+    ax[0].grid(True)
+    ax[0].legend()
+    ax[1].plot(x, [s[2] for s in datos_sync], marker="o", label="Síncrono")
+    ax[1].plot(x, [a[2] for a in datos_async], marker="o", color="green", label="Asíncrono (zmq.asyncio)")
+    ax[1].set_xlabel("Número de Solicitudes")
+    ax[1].set_ylabel("Tiempo total del lote (ms)")
+    ax[1].grid(True)
+    ax[1].legend()
     plt.tight_layout()
     plt.savefig("comparacion_sinc_async.png")
     plt.show()
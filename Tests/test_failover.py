@@ -0,0 +1,132 @@
+import os
+import sys
+import csv
+import time
+import uuid
+import logging
+import tempfile
+import threading
+import subprocess
+import matplotlib.pyplot as plt
+from facultad import SesionFacultad
+
+# Levanta central y réplica en localhost, mata el central con carga en curso y mide
+# cuánto tiempo los clientes se quedan sin ninguna respuesta exitosa.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERVALOS_LATIDO = [1.0, 0.3, 0.1]  # segundos; la pausa aceptable se escala con el intervalo
+CLIENTES = 4
+SEGUNDOS_ANTES = 3
+SEGUNDOS_DESPUES = 5
+TIMEOUT_CLIENTE_MS = 200
+CENTRAL = "tcp://127.0.0.1:5555"
+REPLICA = "tcp://127.0.0.1:5565"  # en la misma máquina la réplica no puede usar el 5555
+
+PROGRAMA_CENTRAL = """
+import servidor
+servidor.IP_DEL_BACKUP = "127.0.0.1"
+servidor.INTERVALO_LATIDO = {intervalo}
+servidor.ServidorCentral().recibir_y_atender()
+"""
+PROGRAMA_REPLICA = """
+import replica
+replica.PUERTO_SOLICITUDES = 5565
+replica.PUERTO_HEALTHCHECK = 5567
+replica.IP_SERVIDOR_CENTRAL = "127.0.0.1"
+replica.INTERVALO_LATIDO = {intervalo}
+replica.PAUSA_ACEPTABLE = {pausa}
+replica.ServidorReplica().iniciar(interactivo=False)
+"""
+
+def lanzar(programa, directorio):
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    return subprocess.Popen([sys.executable, "-c", programa], cwd=directorio, env=entorno,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def cliente(detener, exitos):
+    sesion = SesionFacultad([CENTRAL, REPLICA], timeout=TIMEOUT_CLIENTE_MS, reintentos=1)
+    while not detener.is_set():
+        respuesta = sesion.enviar({
+            "uuid": str(uuid.uuid4()),
+            "facultad": "Facultad de Ingeniería",
+            "num_salones": 1,
+            "num_laboratorios": 0,
+            "franja_inicio": 0,
+            "franja_fin": 1
+        })
+        if respuesta and respuesta.get("status") in ("success", "partial"):
+            exitos.append(time.time())
+    sesion.cerrar()
+
+def medir(intervalo):
+    with tempfile.TemporaryDirectory() as directorio:
+        replica = lanzar(PROGRAMA_REPLICA.format(intervalo=intervalo, pausa=2 * intervalo), directorio)
+        central = lanzar(PROGRAMA_CENTRAL.format(intervalo=intervalo), directorio)
+        time.sleep(2)  # arranque de ambos procesos y primeros latidos
+
+        detener = threading.Event()
+        exitos = []
+        hilos = [threading.Thread(target=cliente, args=(detener, exitos)) for _ in range(CLIENTES)]
+        for h in hilos:
+            h.start()
+        time.sleep(SEGUNDOS_ANTES)
+        central.kill()
+        caida = time.time()
+        time.sleep(SEGUNDOS_DESPUES)
+        detener.set()
+        for h in hilos:
+            h.join()
+        replica.kill()
+        central.wait()
+        replica.wait()
+
+    # Hueco: la mayor separación entre respuestas exitosas a partir de la última antes de la caída
+    # (justo después del kill aún pueden llegar respuestas que el central alcanzó a enviar)
+    exitos.sort()
+    antes = [t for t in exitos if t <= caida]
+    despues = [t for t in exitos if t > caida]
+    if not antes or not despues:
+        return None, exitos, caida
+    tramo = antes[-1:] + despues
+    return max(b - a for a, b in zip(tramo, tramo[1:])), exitos, caida
+
+def main():
+    logging.disable(logging.WARNING)  # los reintentos del cliente durante la caída son esperados
+    resultados = []
+    series = {}
+    for intervalo in INTERVALOS_LATIDO:
+        hueco, exitos, caida = medir(intervalo)
+        if hueco is None:
+            print(f"==> Latido cada {intervalo} s: la réplica no tomó el control en {SEGUNDOS_DESPUES} s")
+            continue
+        print(f"==> Latido cada {intervalo} s: {hueco * 1000:.0f} ms sin respuestas exitosas")
+        resultados.append({"intervalo_latido_s": intervalo, "hueco_ms": hueco * 1000, "exitos": len(exitos)})
+        series[intervalo] = [t - caida for t in exitos]
+
+    with open("failover.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["intervalo_latido_s", "hueco_ms", "exitos"])
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica: hueco de disponibilidad y respuestas exitosas por segundo alrededor de la caída
+    fig, ax = plt.subplots(2, 1, figsize=(8, 7))
+    ax[0].bar([str(r["intervalo_latido_s"]) for r in resultados], [r["hueco_ms"] for r in resultados], color="tomato")
+    ax[0].set_xlabel("Intervalo entre latidos (s)")
+    ax[0].set_ylabel("Tiempo sin servicio (ms)")
+    ax[0].set_title("Failover tras matar el central con carga")
+    for intervalo, tiempos in series.items():
+        inicio = int(min(tiempos)) - 1
+        cubetas = list(range(inicio, int(max(tiempos)) + 2))
+        ax[1].plot(cubetas, [sum(1 for t in tiempos if c <= t < c + 1) for c in cubetas], marker=".",
+                   label=f"latido {intervalo} s")
+    ax[1].axvline(0, color="black", linestyle="--", label="caída del central")
+    ax[1].set_xlabel("Segundos desde la caída")
+    ax[1].set_ylabel("Respuestas exitosas por segundo")
+    ax[1].legend()
+    ax[1].grid(True)
+
+    plt.tight_layout()
+    plt.savefig("grafico_failover.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import threading
+import time
+import statistics
+import csv
+import matplotlib.pyplot as plt
+from facultad import enviar_peticiones_a_facultad_balanceado, enviar_lote_a_facultad
+
+# Cada facultad reserva para todo su semestre: una solicitud por programa o un solo lote
+NUM_FACULTADES = 5
+PROGRAMAS_POR_FACULTAD = [5, 10, 20, 50]
+AULAS = 2
+LABS = 1
+
+def semestre_individual(facultad_id, num_programas, tiempos):
+    inicio = time.time()
+    for _ in range(num_programas):
+        enviar_peticiones_a_facultad_balanceado(facultad_id, AULAS, LABS)
+    tiempos.append((time.time() - inicio) * 1000)
+
+def semestre_lote(facultad_id, num_programas, tiempos):
+    inicio = time.time()
+    enviar_lote_a_facultad(facultad_id, [(AULAS, LABS)] * num_programas)
+    tiempos.append((time.time() - inicio) * 1000)
+
+def medir(funcion, num_programas):
+    tiempos = []
+    threads = [
+        threading.Thread(target=funcion, args=(fid + 1, num_programas, tiempos))
+        for fid in range(NUM_FACULTADES)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statistics.mean(tiempos)
+
+def main():
+    resultados = []
+    for n in PROGRAMAS_POR_FACULTAD:
+        individual = medir(semestre_individual, n)
+        lote = medir(semestre_lote, n)
+        print(f"==> {n} programas por facultad - individual: {individual:.1f} ms | lote: {lote:.1f} ms")
+        resultados.append({"programas": n, "individual_ms": individual, "lote_ms": lote})
+
+    with open("lote_programas.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["programas", "individual_ms", "lote_ms"])
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica
+    x = [r["programas"] for r in resultados]
+    plt.plot(x, [r["individual_ms"] for r in resultados], marker="o", label="Una solicitud por programa")
+    plt.plot(x, [r["lote_ms"] for r in resultados], marker="o", color="green", label="Un lote por facultad")
+    plt.xlabel("Programas por facultad")
+    plt.ylabel("Tiempo del semestre completo (ms)")
+    plt.title(f"Reserva del semestre ({NUM_FACULTADES} facultades concurrentes)")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("grafico_lote_programas.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
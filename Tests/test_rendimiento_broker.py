@@ -0,0 +1,113 @@
+import threading
+import time
+import statistics
+import csv
+import uuid
+import zmq
+import matplotlib.pyplot as plt
+from broker import Broker, TrabajadorBroker
+
+# Todo corre en localhost: broker, servidores simulados y facultades
+PUERTO_FRONTEND = 6560
+PUERTO_BACKEND = 6561
+NUM_SERVIDORES = 4
+TIEMPO_SERVICIO = 0.001  # segundos que tarda cada servidor simulado en asignar
+CLIENTES_CONCURRENTES = [1, 10, 25, 50]
+SOLICITUDES_POR_CLIENTE = 50
+TIMEOUT = 5000
+
+def servidor_simulado(mensaje):
+    time.sleep(TIEMPO_SERVICIO)
+    return {
+        "status": "success",
+        "uuid": mensaje["uuid"],
+        "salones_asignados": mensaje["num_salones"],
+        "laboratorios_asignados": mensaje["num_laboratorios"]
+    }
+
+def iniciar_entorno(contexto):
+    broker = Broker(PUERTO_FRONTEND, PUERTO_BACKEND, contexto)
+    threading.Thread(target=broker.ejecutar, daemon=True).start()
+    for _ in range(NUM_SERVIDORES):
+        trabajador = TrabajadorBroker(contexto, f"tcp://127.0.0.1:{PUERTO_BACKEND}", servidor_simulado)
+        threading.Thread(target=trabajador.ejecutar, daemon=True).start()
+    time.sleep(0.5)
+    return broker
+
+def cliente(contexto, n, rtts, fallidos):
+    socket = contexto.socket(zmq.REQ)
+    socket.setsockopt(zmq.RCVTIMEO, TIMEOUT)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(f"tcp://127.0.0.1:{PUERTO_FRONTEND}")
+    for _ in range(n):
+        solicitud = {"uuid": str(uuid.uuid4()), "facultad": "Facultad de Ingeniería", "num_salones": 1, "num_laboratorios": 1}
+        inicio = time.time()
+        try:
+            socket.send_json(solicitud)
+            respuesta = socket.recv_json()
+            if respuesta.get("uuid") == solicitud["uuid"]:
+                rtts.append((time.time() - inicio) * 1000)
+            else:
+                fallidos.append(solicitud["uuid"])
+        except zmq.Again:
+            fallidos.append(solicitud["uuid"])
+            break
+    socket.close()
+
+def ejecutar_carga(contexto, num_clientes):
+    rtts, fallidos = [], []
+    threads = [
+        threading.Thread(target=cliente, args=(contexto, SOLICITUDES_POR_CLIENTE, rtts, fallidos))
+        for _ in range(num_clientes)
+    ]
+    inicio = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracion = time.time() - inicio
+    percentiles = statistics.quantiles(rtts, n=100, method="inclusive")
+
+    return {
+        "clientes": num_clientes,
+        "throughput": len(rtts) / duracion,
+        "p50": percentiles[49],
+        "p99": percentiles[98],
+        "fallidos": len(fallidos)
+    }
+
+def main():
+    contexto = zmq.Context.instance()
+    broker = iniciar_entorno(contexto)
+
+    resultados = []
+    for n in CLIENTES_CONCURRENTES:
+        r = ejecutar_carga(contexto, n)
+        print(f"==> {n} clientes - {r['throughput']:.0f} sol/s | p50: {r['p50']:.2f} ms | "
+              f"p99: {r['p99']:.2f} ms | fallidos: {r['fallidos']}")
+        resultados.append(r)
+    print(f"Atendidas por el broker: {broker.atendidas} | Reencoladas: {broker.reencoladas}")
+
+    with open("rendimiento_broker.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["clientes", "throughput", "p50", "p99", "fallidos"])
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica
+    x = [r["clientes"] for r in resultados]
+    fig, ax = plt.subplots(2, 1, figsize=(8, 6))
+    ax[0].plot(x, [r["throughput"] for r in resultados], marker="o", color="orange")
+    ax[0].set_ylabel("Solicitudes/s")
+    ax[0].set_title("Throughput del broker (localhost)")
+    ax[1].plot(x, [r["p50"] for r in resultados], marker="o", label="p50")
+    ax[1].plot(x, [r["p99"] for r in resultados], marker="o", color="red", label="p99")
+    ax[1].set_xlabel("Facultades concurrentes")
+    ax[1].set_ylabel("Latencia (ms)")
+    ax[1].legend()
+
+    plt.tight_layout()
+    plt.savefig("grafico_rendimiento_broker.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import time
+import csv
+import sqlite3
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib.pyplot as plt
+from database import AlmacenReservas, EscritorAgrupado, SQL_CREAR_TABLA, SQL_BUSCAR_UUID, SQL_INSERTAR, fila_reserva
+
+FACULTAD = "Facultad de Ingeniería"
+AULAS = 5
+LABS = 3
+# Misma forma que las reservas de los servidores: IDs concretos durante una semana
+ASIGNACION = {"franja_inicio": 0, "franja_fin": 42, "ids_salones": list(range(AULAS)), "ids_laboratorios": list(range(LABS))}
+LOTES = [100, 500, 1000]
+MODOS_SYNCHRONOUS = ["FULL", "NORMAL"]
+HILOS_CONCURRENTES = 32
+
+# ANTES: una conexión nueva por reserva, journal por defecto (DELETE)
+def medir_conexion_por_reserva(db_name, n):
+    with sqlite3.connect(db_name) as conn:
+        conn.execute(SQL_CREAR_TABLA)
+    inicio = time.time()
+    for _ in range(n):
+        solicitud_uuid = str(uuid.uuid4())
+        with sqlite3.connect(db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_BUSCAR_UUID, (solicitud_uuid,))
+            if cursor.fetchone():
+                continue
+            cursor.execute(SQL_INSERTAR, fila_reserva(solicitud_uuid, FACULTAD, AULAS, LABS, None, ASIGNACION))
+            conn.commit()
+    return n / (time.time() - inicio)
+
+# DESPUÉS: conexión persistente en WAL con sentencias cacheadas
+def medir_almacen(db_name, n, synchronous):
+    almacen = AlmacenReservas(db_name, synchronous=synchronous)
+    almacen.crear_tabla()
+    inicio = time.time()
+    for _ in range(n):
+        solicitud_uuid = str(uuid.uuid4())
+        if almacen.existe_uuid(solicitud_uuid):
+            continue
+        almacen.insertar_solicitud(solicitud_uuid, FACULTAD, AULAS, LABS, asignacion=ASIGNACION)
+    reservas_por_segundo = n / (time.time() - inicio)
+    almacen.cerrar()
+    return reservas_por_segundo
+
+# GROUP COMMIT: varios hilos concurrentes comparten un commit por lote (synchronous=FULL)
+def medir_escritor_agrupado(db_name, n, hilos=HILOS_CONCURRENTES):
+    almacen = AlmacenReservas(db_name, synchronous="FULL")
+    almacen.crear_tabla()
+    escritor = EscritorAgrupado(almacen)
+
+    def reservar(_):
+        escritor.guardar(str(uuid.uuid4()), FACULTAD, AULAS, LABS, asignacion=ASIGNACION)
+
+    inicio = time.time()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        list(executor.map(reservar, range(n)))
+    return n / (time.time() - inicio)
+
+def main():
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in LOTES:
+            fila = {"lote": n}
+            fila["antes"] = medir_conexion_por_reserva(os.path.join(directorio, f"antes_{n}.db"), n)
+            for modo in MODOS_SYNCHRONOUS:
+                fila[f"wal_{modo.lower()}"] = medir_almacen(os.path.join(directorio, f"wal_{modo}_{n}.db"), n, modo)
+            fila["agrupado_full"] = medir_escritor_agrupado(os.path.join(directorio, f"agrupado_{n}.db"), n)
+            resultados.append(fila)
+            print(f"==> {n} reservas - Antes: {fila['antes']:.0f} res/s | " +
+                  " | ".join(f"WAL {modo}: {fila[f'wal_{modo.lower()}']:.0f} res/s" for modo in MODOS_SYNCHRONOUS) +
+                  f" | Group commit FULL ({HILOS_CONCURRENTES} hilos): {fila['agrupado_full']:.0f} res/s")
+
+    campos = ["lote", "antes"] + [f"wal_{modo.lower()}" for modo in MODOS_SYNCHRONOUS] + ["agrupado_full"]
+    with open("rendimiento_sqlite.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=campos)
+        writer.writeheader()
+        writer.writerows(resultados)
+
+    # Gráfica
+    x = [r["lote"] for r in resultados]
+    plt.plot(x, [r["antes"] for r in resultados], marker="o", color="red", label="Conexión por reserva")
+    for modo in MODOS_SYNCHRONOUS:
+        plt.plot(x, [r[f"wal_{modo.lower()}"] for r in resultados], marker="o", label=f"Persistente WAL ({modo})")
+    plt.plot(x, [r["agrupado_full"] for r in resultados], marker="o", color="green", label="Group commit (FULL)")
+    plt.xlabel("Número de Reservas")
+    plt.ylabel("Reservas por segundo")
+    plt.title("Rendimiento de SQLite: antes vs después")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("grafico_rendimiento_sqlite.png")
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import zmq
+import json
+import time
+import logging
+from collections import OrderedDict, deque
+from codec import codificar, decodificar_solicitud, CODEC_JSON
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger("Broker")
+
+PUERTO_FRONTEND = 5560  # Facultades (REQ)
+PUERTO_BACKEND = 5561   # Servidores (DEALER)
+INTERFACE = "0.0.0.0"
+HEARTBEAT_INTERVAL = 1.0  # segundos
+HEARTBEAT_LIVENESS = 3    # heartbeats perdidos antes de dar por muerto al otro extremo
+RECONEXION_INICIAL = 1.0
+RECONEXION_MAX = 32.0
+MAX_PENDIENTES = 10000
+
+# Protocolo Paranoid Pirate
+PPP_READY = b"\x01"
+PPP_HEARTBEAT = b"\x02"
+PPP_DISCONNECT = b"\x03"
+
+class Broker:
+    """Broker LRU con heartbeats entre las facultades y los servidores.
+
+    Cada solicitud se entrega al servidor que lleva más tiempo libre. Un servidor
+    que deja de enviar heartbeats se da por muerto y la solicitud que tenía en
+    curso vuelve al frente de la cola; el UUID hace que reenviarla sea seguro.
+    """
+
+    def __init__(self, puerto_frontend=PUERTO_FRONTEND, puerto_backend=PUERTO_BACKEND, contexto=None):
+        self.contexto = contexto or zmq.Context.instance()
+        self.frontend = self.contexto.socket(zmq.ROUTER)
+        self.frontend.bind(f"tcp://{INTERFACE}:{puerto_frontend}")
+        self.backend = self.contexto.socket(zmq.ROUTER)
+        self.backend.bind(f"tcp://{INTERFACE}:{puerto_backend}")
+
+        self.disponibles = OrderedDict()  # trabajador -> None, en orden LRU
+        self.en_curso = {}                # trabajador -> (cliente, payload)
+        self.ultimo_contacto = {}         # trabajador -> instante del último mensaje
+        self.pendientes = deque()         # (cliente, payload)
+        self.atendidas = 0
+        self.reencoladas = 0
+
+    def _expira(self):
+        return HEARTBEAT_INTERVAL * HEARTBEAT_LIVENESS
+
+    def _retirar(self, trabajador, motivo):
+        self.disponibles.pop(trabajador, None)
+        self.ultimo_contacto.pop(trabajador, None)
+        solicitud = self.en_curso.pop(trabajador, None)
+        if solicitud:
+            self.pendientes.appendleft(solicitud)
+            self.reencoladas += 1
+        logger.warning(f"Servidor {trabajador!r} retirado ({motivo}); solicitudes reencoladas: {1 if solicitud else 0}")
+
+    def _purgar(self):
+        limite = time.monotonic() - self._expira()
+        for trabajador, visto in list(self.ultimo_contacto.items()):
+            if visto < limite:
+                self._retirar(trabajador, "sin heartbeat")
+
+    def _despachar(self):
+        while self.pendientes and self.disponibles:
+            trabajador, _ = self.disponibles.popitem(last=False)
+            cliente, payload = self.pendientes.popleft()
+            self.en_curso[trabajador] = (cliente, payload)
+            self.backend.send_multipart([trabajador, cliente, b"", payload])
+
+    def _atender_backend(self):
+        frames = self.backend.recv_multipart()
+        trabajador, mensaje = frames[0], frames[1:]
+        self.ultimo_contacto[trabajador] = time.monotonic()
+
+        if len(mensaje) == 1:
+            if mensaje[0] == PPP_DISCONNECT:
+                self._retirar(trabajador, "desconexión")
+            elif trabajador not in self.en_curso:
+                # READY o HEARTBEAT de un servidor libre (también si el broker se reinició)
+                if mensaje[0] == PPP_READY:
+                    logger.info(f"Servidor {trabajador!r} listo")
+                self.disponibles.setdefault(trabajador, None)
+            return
+
+        if len(mensaje) != 3:
+            logger.warning(f"Mensaje mal formado de {trabajador!r} descartado ({len(mensaje)} frames)")
+            return
+        cliente, _, respuesta = mensaje
+        solicitud = self.en_curso.pop(trabajador, None)
+        if solicitud and solicitud[0] == cliente:
+            self.frontend.send_multipart([cliente, b"", respuesta])
+            self.atendidas += 1
+        else:
+            logger.warning(f"Respuesta tardía de {trabajador!r} descartada (la solicitud fue reencolada)")
+        self.disponibles[trabajador] = None
+
+    def _atender_frontend(self):
+        frames = self.frontend.recv_multipart()
+        # [identidad, "", payload]; cualquier otra forma la descarta en vez de tumbar el broker
+        if len(frames) != 3:
+            logger.warning(f"Mensaje mal formado de un cliente descartado ({len(frames)} frames)")
+            return
+        cliente, _, payload = frames
+        if len(self.pendientes) >= MAX_PENDIENTES:
+            error = {"status": "error", "message": "Broker saturado, intente más tarde."}
+            self.frontend.send_multipart([cliente, b"", json.dumps(error).encode()])
+            return
+        self.pendientes.append((cliente, payload))
+
+    def ejecutar(self):
+        poller = zmq.Poller()
+        poller.register(self.backend, zmq.POLLIN)
+        poller.register(self.frontend, zmq.POLLIN)
+        proximo_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        logger.info("Broker listo: facultades en el frontend, servidores en el backend.")
+
+        while True:
+            socks = dict(poller.poll(HEARTBEAT_INTERVAL * 1000))
+            if self.backend in socks:
+                self._atender_backend()
+            if self.frontend in socks:
+                self._atender_frontend()
+            self._despachar()
+
+            if time.monotonic() >= proximo_heartbeat:
+                for trabajador in self.ultimo_contacto:
+                    self.backend.send_multipart([trabajador, PPP_HEARTBEAT])
+                proximo_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+            self._purgar()
+
+class TrabajadorBroker:
+    """Lado servidor del patrón Paranoid Pirate.
+
+    Conecta un DEALER al backend del broker, anuncia READY, intercambia heartbeats
+    y entrega cada solicitud a `procesar(mensaje) -> respuesta`. Si deja de oír al
+    broker se reconecta con espera exponencial. Con `activo` (callable) solo se
+    registra mientras el servidor sea primario.
+    """
+
+    def __init__(self, contexto, endpoint, procesar, activo=None):
+        self.contexto = contexto
+        self.endpoint = endpoint
+        self.procesar = procesar
+        self.activo = activo
+        self.socket = None
+
+    def _conectar(self):
+        self.socket = self.contexto.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.endpoint)
+        self.socket.send(PPP_READY)
+        self.liveness = HEARTBEAT_LIVENESS
+
+    def _cerrar(self, despedirse=False):
+        if self.socket is not None:
+            if despedirse:
+                self.socket.send(PPP_DISCONNECT)
+            self.socket.close()
+            self.socket = None
+
+    def _responder(self, cliente, payload):
+        mensaje, codec = {}, CODEC_JSON
+        try:
+            mensaje, codec = decodificar_solicitud(payload)
+            respuesta = self.procesar(mensaje)
+        except Exception as e:
+            logger.error(f"Error procesando solicitud del broker: {e}")
+            respuesta = {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        self.socket.send_multipart([cliente, b"", codificar(respuesta, codec)])
+
+    def ejecutar(self):
+        reconexion = RECONEXION_INICIAL
+        proximo_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        while True:
+            if self.activo is not None and not self.activo():
+                self._cerrar(despedirse=True)
+                time.sleep(HEARTBEAT_INTERVAL)
+                continue
+            if self.socket is None:
+                self._conectar()
+
+            if self.socket.poll(HEARTBEAT_INTERVAL * 1000):
+                frames = self.socket.recv_multipart()
+                if len(frames) == 3:
+                    self._responder(frames[0], frames[2])
+                self.liveness = HEARTBEAT_LIVENESS
+                reconexion = RECONEXION_INICIAL
+            else:
+                self.liveness -= 1
+                if self.liveness == 0:
+                    logger.warning(f"Broker sin responder, reconectando en {reconexion:.0f} s...")
+                    self._cerrar()
+                    time.sleep(reconexion)
+                    reconexion = min(reconexion * 2, RECONEXION_MAX)
+                    continue
+
+            if time.monotonic() >= proximo_heartbeat:
+                self.socket.send(PPP_HEARTBEAT)
+                proximo_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+
+if __name__ == "__main__":
+    try:
+        Broker().ejecutar()
+    except KeyboardInterrupt:
+        logger.info("Broker detenido por el usuario")
@@ -0,0 +1,141 @@
+import json
+import struct
+import uuid as uuid_lib
+
+try:
+    import msgpack
+except ImportError:  # opcional: sin msgpack el codec compacto usa JSON
+    msgpack = None
+
+# El primer byte de cada frame indica el formato. Un frame JSON empieza por "{",
+# así que los clientes y servidores que aún usan send_json/recv_json siguen siendo compatibles.
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+CODEC_BINARIO = "binario"  # layouts struct para solicitud/respuesta simples; el resto va en msgpack
+
+VERSION_JSON = ord("{")
+VERSION_MSGPACK = 0x02
+VERSION_SOLICITUD = 0x03
+VERSION_SOLICITUD_PLAZO = 0x05
+VERSION_RESPUESTA = 0x06  # 0x04 era la respuesta sin franjas ni IDs, que el servidor ya no envía
+
+# versión, uuid (16 bytes), salones, laboratorios, longitud del nombre de la facultad (+ nombre en UTF-8)
+SOLICITUD = struct.Struct("!B16sHHB")
+# igual que SOLICITUD más el plazo del cliente (epoch en segundos) antes de la longitud del nombre
+SOLICITUD_PLAZO = struct.Struct("!B16sHHdB")
+# versión, uuid (16 bytes), estado, salones y laboratorios asignados, salones y laboratorios restantes,
+# franja inicial y final (+ un uint16 por ID: primero los salones asignados y luego los laboratorios)
+RESPUESTA = struct.Struct("!B16sBHHIIHH")
+
+ESTADOS = ["success", "partial", "duplicate"]
+CAMPOS_SOLICITUD = {"uuid", "facultad", "num_salones", "num_laboratorios"}
+CAMPOS_SOLICITUD_PLAZO = CAMPOS_SOLICITUD | {"plazo"}
+CAMPOS_RESPUESTA = {"uuid", "status", "message", "salones_asignados", "laboratorios_asignados",
+                    "salones_restantes", "laboratorios_restantes", "franja_inicio", "franja_fin",
+                    "ids_salones", "ids_laboratorios"}
+
+def _uuid_binario(valor):
+    try:
+        return uuid_lib.UUID(valor).bytes
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def _en_rango(valor, maximo):
+    return isinstance(valor, int) and 0 <= valor <= maximo
+
+def _solicitud_binaria(mensaje):
+    campos = set(mensaje)
+    if campos != CAMPOS_SOLICITUD and campos != CAMPOS_SOLICITUD_PLAZO:
+        return None
+    uuid_bytes = _uuid_binario(mensaje["uuid"])
+    facultad = str(mensaje["facultad"]).encode()
+    if (uuid_bytes is None or len(facultad) > 255
+            or not _en_rango(mensaje["num_salones"], 0xFFFF) or not _en_rango(mensaje["num_laboratorios"], 0xFFFF)):
+        return None
+    if "plazo" in mensaje:
+        if not isinstance(mensaje["plazo"], (int, float)):
+            return None
+        return SOLICITUD_PLAZO.pack(VERSION_SOLICITUD_PLAZO, uuid_bytes, mensaje["num_salones"],
+                                    mensaje["num_laboratorios"], mensaje["plazo"], len(facultad)) + facultad
+    return SOLICITUD.pack(VERSION_SOLICITUD, uuid_bytes, mensaje["num_salones"],
+                          mensaje["num_laboratorios"], len(facultad)) + facultad
+
+def _respuesta_binaria(mensaje):
+    # El texto de "message" es informativo en estos estados y no viaja; los errores van en msgpack
+    if not set(mensaje) <= CAMPOS_RESPUESTA or mensaje.get("status") not in ESTADOS:
+        return None
+    uuid_bytes = _uuid_binario(mensaje.get("uuid"))
+    valores = [mensaje.get(campo) for campo in ("salones_asignados", "laboratorios_asignados",
+                                                 "salones_restantes", "laboratorios_restantes",
+                                                 "franja_inicio", "franja_fin")]
+    ids = [mensaje.get("ids_salones"), mensaje.get("ids_laboratorios")]
+    if (uuid_bytes is None or not all(_en_rango(v, 0xFFFF) for v in valores[:2] + valores[4:])
+            or not all(_en_rango(v, 0xFFFFFFFF) for v in valores[2:4])
+            or not all(isinstance(lista, list) and len(lista) == n for lista, n in zip(ids, valores[:2]))
+            or not all(_en_rango(id_recurso, 0xFFFF) for id_recurso in ids[0] + ids[1])):
+        return None
+    return (RESPUESTA.pack(VERSION_RESPUESTA, uuid_bytes, ESTADOS.index(mensaje["status"]), *valores)
+            + struct.pack(f"!{len(ids[0]) + len(ids[1])}H", *ids[0], *ids[1]))
+
+def codificar(mensaje, codec=CODEC_JSON):
+    """Serializa un mensaje con el codec indicado; el primer byte identifica el formato."""
+    if codec == CODEC_BINARIO:
+        datos = _solicitud_binaria(mensaje) or _respuesta_binaria(mensaje)
+        if datos:
+            return datos
+        codec = CODEC_MSGPACK
+    if codec == CODEC_MSGPACK and msgpack is not None:
+        return bytes([VERSION_MSGPACK]) + msgpack.packb(mensaje, use_bin_type=True)
+    return json.dumps(mensaje).encode()
+
+def decodificar(datos):
+    """Devuelve (mensaje, codec) para responder al otro extremo en el mismo formato."""
+    version = datos[0]
+    if version == VERSION_JSON:
+        return json.loads(datos), CODEC_JSON
+    if version == VERSION_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Mensaje msgpack recibido pero msgpack no está instalado")
+        return msgpack.unpackb(datos[1:], raw=False), CODEC_MSGPACK
+    if version == VERSION_SOLICITUD:
+        _, uuid_bytes, salones, laboratorios, largo = SOLICITUD.unpack_from(datos)
+        facultad = datos[SOLICITUD.size:SOLICITUD.size + largo].decode()
+        return {
+            "uuid": str(uuid_lib.UUID(bytes=uuid_bytes)),
+            "facultad": facultad,
+            "num_salones": salones,
+            "num_laboratorios": laboratorios
+        }, CODEC_BINARIO
+    if version == VERSION_SOLICITUD_PLAZO:
+        _, uuid_bytes, salones, laboratorios, plazo, largo = SOLICITUD_PLAZO.unpack_from(datos)
+        facultad = datos[SOLICITUD_PLAZO.size:SOLICITUD_PLAZO.size + largo].decode()
+        return {
+            "uuid": str(uuid_lib.UUID(bytes=uuid_bytes)),
+            "facultad": facultad,
+            "num_salones": salones,
+            "num_laboratorios": laboratorios,
+            "plazo": plazo
+        }, CODEC_BINARIO
+    if version == VERSION_RESPUESTA:
+        _, uuid_bytes, estado, salones, laboratorios, salones_rest, labs_rest, inicio, fin = RESPUESTA.unpack_from(datos)
+        ids = list(struct.unpack_from(f"!{salones + laboratorios}H", datos, RESPUESTA.size))
+        return {
+            "status": ESTADOS[estado],
+            "uuid": str(uuid_lib.UUID(bytes=uuid_bytes)),
+            "salones_asignados": salones,
+            "laboratorios_asignados": laboratorios,
+            "salones_restantes": salones_rest,
+            "laboratorios_restantes": labs_rest,
+            "franja_inicio": inicio,
+            "franja_fin": fin,
+            "ids_salones": ids[:salones],
+            "ids_laboratorios": ids[salones:]
+        }, CODEC_BINARIO
+    raise ValueError(f"Versión de mensaje desconocida: {version}")
+
+def decodificar_solicitud(datos):
+    """Como `decodificar`, pero exige un objeto: un msgpack o JSON que sea lista o número lanza ValueError."""
+    mensaje, codec = decodificar(datos)
+    if not isinstance(mensaje, dict):
+        raise ValueError(f"Se esperaba una solicitud y llegó {type(mensaje).__name__}")
+    return mensaje, codec
@@ -1,38 +1,773 @@
 import sqlite3
- 
+import json
+import threading
+import queue
+import time
+from datetime import datetime, timedelta
+from inventario import InventarioAulas, RECURSOS, SEMANAS, NUM_FRANJAS, empaquetar, desempaquetar, semanas
+
 DB_NAME = "aulas.db"
- 
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "FULL"  # OFF | NORMAL | FULL | EXTRA
+SEMANA_TOTAL = -1  # fila de `uso_facultad` con el acumulado de todo el semestre
+CACHE_SENTENCIAS = 64
+TAM_LOTE_ESCRITURA = 256
+ESPERA_MAX_LOTE = 0.001  # segundos que el escritor espera para completar un lote
+
+SQL_CREAR_TABLA = """
+    CREATE TABLE IF NOT EXISTS solicitudes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT UNIQUE,
+        facultad TEXT,
+        salones_asignados INTEGER,
+        laboratorios_asignados INTEGER,
+        fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+        franja_inicio INTEGER,
+        franja_fin INTEGER,
+        ids_salones TEXT,
+        ids_laboratorios TEXT
+    )
+"""
+# Columnas añadidas con el inventario por franjas; las BD anteriores se migran al abrirlas
+COLUMNAS_ASIGNACION = [
+    ("franja_inicio", "INTEGER"),
+    ("franja_fin", "INTEGER"),
+    ("ids_salones", "TEXT"),
+    ("ids_laboratorios", "TEXT")
+]
+SQL_CREAR_LOG = """
+    CREATE TABLE IF NOT EXISTS replicacion_log (
+        seq INTEGER PRIMARY KEY,
+        evento TEXT NOT NULL
+    )
+"""
+SQL_CREAR_ESTADO = """
+    CREATE TABLE IF NOT EXISTS estado_replicacion (
+        clave TEXT PRIMARY KEY,
+        valor INTEGER
+    )
+"""
+# Ocupación materializada de cada recurso (una fila por salón o laboratorio, un bit por franja),
+# actualizada en la misma transacción que cada inserción o borrado de `solicitudes`
+SQL_CREAR_INVENTARIO = """
+    CREATE TABLE IF NOT EXISTS inventario (
+        recurso TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        franjas BLOB NOT NULL,
+        PRIMARY KEY (recurso, id)
+    ) WITHOUT ROWID
+"""
+# Uso acumulado por facultad y semana del semestre (más la fila SEMANA_TOTAL), mantenido
+# en la misma transacción que cada reserva o borrado para responder reportes sin recorrer `solicitudes`
+SQL_CREAR_USO = """
+    CREATE TABLE IF NOT EXISTS uso_facultad (
+        semana INTEGER NOT NULL,
+        facultad TEXT NOT NULL,
+        reservas INTEGER NOT NULL,
+        salones INTEGER NOT NULL,
+        laboratorios INTEGER NOT NULL,
+        PRIMARY KEY (semana, facultad)
+    ) WITHOUT ROWID
+"""
+# Índices para recorrer los registros por fecha (todas las facultades o una) sin ordenar la tabla
+SQL_CREAR_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_solicitudes_fecha ON solicitudes (fecha, id)",
+    "CREATE INDEX IF NOT EXISTS idx_solicitudes_facultad_fecha ON solicitudes (facultad, fecha, id)"
+]
+SQL_EXISTE_TABLA = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+SQL_BUSCAR_UUID = "SELECT id FROM solicitudes WHERE uuid = ?"
+SQL_COLUMNAS = "PRAGMA table_info(solicitudes)"
+SQL_BUSCAR_ASIGNACION = """
+    SELECT salones_asignados, laboratorios_asignados, franja_inicio, franja_fin, ids_salones, ids_laboratorios
+    FROM solicitudes WHERE uuid = ?
+"""
+SQL_UUIDS = "SELECT uuid FROM solicitudes"
+SQL_ULTIMAS_ASIGNACIONES = """
+    SELECT uuid, salones_asignados, laboratorios_asignados, franja_inicio, franja_fin, ids_salones, ids_laboratorios
+    FROM solicitudes ORDER BY id DESC LIMIT ?
+"""
+SQL_ASIGNACIONES = """
+    SELECT salones_asignados, laboratorios_asignados, franja_inicio, franja_fin, ids_salones, ids_laboratorios
+    FROM solicitudes ORDER BY id
+"""
+SQL_INSERTAR = """
+    INSERT INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados, fecha,
+                             franja_inicio, franja_fin, ids_salones, ids_laboratorios)
+    VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?)
+"""
+SQL_INSERTAR_O_IGNORAR = """
+    INSERT OR IGNORE INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados, fecha,
+                                       franja_inicio, franja_fin, ids_salones, ids_laboratorios)
+    VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?)
+"""
+SQL_BUSCAR_ID = """
+    SELECT salones_asignados, laboratorios_asignados, uuid, facultad, franja_inicio, franja_fin, ids_salones, ids_laboratorios
+    FROM solicitudes WHERE id = ?
+"""
+SQL_BUSCAR_POR_UUID = """
+    SELECT salones_asignados, laboratorios_asignados, uuid, facultad, franja_inicio, franja_fin, ids_salones, ids_laboratorios
+    FROM solicitudes WHERE uuid = ?
+"""
+SQL_BORRAR_ID = "DELETE FROM solicitudes WHERE id = ?"
+SQL_BORRAR_UUID = "DELETE FROM solicitudes WHERE uuid = ?"
+SQL_BORRAR_TODO = "DELETE FROM solicitudes"
+SQL_SUMAR_USO = """
+    INSERT INTO uso_facultad (semana, facultad, reservas, salones, laboratorios) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (semana, facultad) DO UPDATE SET
+        reservas = reservas + excluded.reservas,
+        salones = salones + excluded.salones,
+        laboratorios = laboratorios + excluded.laboratorios
+"""
+SQL_LIMPIAR_USO = "DELETE FROM uso_facultad WHERE reservas <= 0"
+SQL_VACIAR_USO = "DELETE FROM uso_facultad"
+SQL_FILAS_USO = "SELECT facultad, salones_asignados, laboratorios_asignados, franja_inicio, franja_fin FROM solicitudes"
+SQL_LEER_USO = "SELECT facultad, reservas, salones, laboratorios FROM uso_facultad WHERE semana = ? ORDER BY facultad"
+SQL_LEER_FRANJAS = "SELECT franjas FROM inventario WHERE recurso = ? AND id = ?"
+SQL_GUARDAR_FRANJAS = "INSERT OR REPLACE INTO inventario (recurso, id, franjas) VALUES (?, ?, ?)"
+SQL_LEER_INVENTARIO = "SELECT recurso, id, franjas FROM inventario"
+SQL_VACIAR_INVENTARIO = "DELETE FROM inventario"
+COLUMNAS_REGISTRO = """id, uuid, facultad, salones_asignados, laboratorios_asignados, fecha,
+           franja_inicio, franja_fin, ids_salones, ids_laboratorios"""
+SQL_PAGINA = "SELECT " + COLUMNAS_REGISTRO + " FROM solicitudes {filtro} ORDER BY fecha DESC, id DESC LIMIT ?"
+SQL_INSERTAR_LOG = "INSERT INTO replicacion_log (seq, evento) VALUES (?, ?)"
+# La última secuencia es la del log o, si es mayor, la reservada para el historial previo al log (ver sembrar_log)
+SQL_ULTIMO_SEQ = """
+    SELECT MAX(COALESCE((SELECT MAX(seq) FROM replicacion_log), 0),
+               COALESCE((SELECT valor FROM estado_replicacion WHERE clave = 'seq_historial'), 0))
+"""
+SQL_HAY_SOLICITUDES = "SELECT EXISTS (SELECT 1 FROM solicitudes)"
+SQL_LEER_LOG = "SELECT seq, evento FROM replicacion_log WHERE seq > ? ORDER BY seq LIMIT ?"
+SQL_PRIMER_SEQ = "SELECT MIN(seq) FROM replicacion_log"
+SQL_PODAR_LOG = "DELETE FROM replicacion_log WHERE seq <= ?"
+SQL_EXPORTAR = "SELECT " + COLUMNAS_REGISTRO + " FROM solicitudes ORDER BY id"
+SQL_IMPORTAR = """
+    INSERT INTO solicitudes (id, uuid, facultad, salones_asignados, laboratorios_asignados, fecha,
+                             franja_inicio, franja_fin, ids_salones, ids_laboratorios)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_LEER_ESTADO = "SELECT valor FROM estado_replicacion WHERE clave = ?"
+SQL_GUARDAR_ESTADO = "INSERT OR REPLACE INTO estado_replicacion (clave, valor) VALUES (?, ?)"
+
+def fila_reserva(uuid, facultad, salones, laboratorios, fecha=None, asignacion=None):
+    """Fila para SQL_INSERTAR; la asignación (franjas e IDs concretos) es opcional."""
+    asignacion = asignacion or {}
+    ids_salones = asignacion.get("ids_salones")
+    ids_laboratorios = asignacion.get("ids_laboratorios")
+    return (uuid, facultad, salones, laboratorios, fecha, asignacion.get("franja_inicio"), asignacion.get("franja_fin"),
+            None if ids_salones is None else json.dumps(ids_salones),
+            None if ids_laboratorios is None else json.dumps(ids_laboratorios))
+
+def evento_reserva(uuid, facultad, salones, laboratorios, fecha=None, asignacion=None):
+    """Reserva tal como viaja por el log de replicación."""
+    evento = {
+        "tipo": "reserva",
+        "uuid": uuid,
+        "facultad": facultad,
+        "salones_asignados": salones,
+        "laboratorios_asignados": laboratorios,
+        "fecha": fecha
+    }
+    evento.update(asignacion or {})
+    return evento
+
+def fila_de_evento(reserva):
+    return fila_reserva(reserva["uuid"], reserva["facultad"], reserva["salones_asignados"],
+                        reserva["laboratorios_asignados"], reserva.get("fecha"), reserva)
+
+def asignacion_de_columnas(franja_inicio, franja_fin, ids_salones, ids_laboratorios):
+    """Asignación guardada en una fila, o None si la fila es anterior al inventario por franjas."""
+    if ids_salones is None:
+        return None
+    return {
+        "franja_inicio": franja_inicio,
+        "franja_fin": franja_fin,
+        "ids_salones": json.loads(ids_salones),
+        "ids_laboratorios": json.loads(ids_laboratorios)
+    }
+
+def _respuesta_guardada(salones, laboratorios, *columnas):
+    respuesta = {"salones_asignados": salones, "laboratorios_asignados": laboratorios}
+    respuesta.update(asignacion_de_columnas(*columnas) or {})
+    return respuesta
+
+def _asignaciones(conn):
+    for fila in conn.execute(SQL_ASIGNACIONES):
+        yield fila[0], fila[1], asignacion_de_columnas(*fila[2:])
+
+def _marcar(conn, asignaciones, ocupado):
+    """Marca (o libera) en `inventario` las franjas de cada asignación, dentro de la transacción abierta."""
+    franjas = {}
+    for asignacion in asignaciones:
+        inicio, fin = asignacion["franja_inicio"], asignacion["franja_fin"]
+        for recurso, campo in RECURSOS:
+            for id_recurso in asignacion[campo]:
+                clave = (recurso, id_recurso)
+                if clave not in franjas:
+                    fila = conn.execute(SQL_LEER_FRANJAS, clave).fetchone()
+                    franjas[clave] = desempaquetar(fila and fila[0])
+                franjas[clave][inicio:fin] = ocupado
+    conn.executemany(SQL_GUARDAR_FRANJAS, [(recurso, id_recurso, empaquetar(bits))
+                                           for (recurso, id_recurso), bits in franjas.items()])
+
+def _reconstruir_inventario(conn):
+    """Recalcula `inventario` recorriendo todas las reservas, dentro de la transacción abierta."""
+    inventario = InventarioAulas()
+    inventario.cargar(_asignaciones(conn))
+    conn.execute(SQL_VACIAR_INVENTARIO)
+    conn.executemany(SQL_GUARDAR_FRANJAS, inventario.filas())
+
+def _acumular_uso(uso, facultad, salones, laboratorios, franja_inicio, franja_fin, signo=1):
+    """Suma (o resta) una reserva en `uso`: {(semana, facultad): [reservas, salones, laboratorios]}."""
+    inicio = 0 if franja_inicio is None else franja_inicio
+    fin = NUM_FRANJAS if franja_fin is None else franja_fin  # reservas anteriores a las franjas: todo el semestre
+    for semana in (SEMANA_TOTAL, *semanas(inicio, fin)):
+        acumulado = uso.setdefault((semana, facultad), [0, 0, 0])
+        acumulado[0] += signo
+        acumulado[1] += signo * salones
+        acumulado[2] += signo * laboratorios
+
+def _sumar_uso(conn, uso):
+    conn.executemany(SQL_SUMAR_USO, [(semana, facultad, *valores) for (semana, facultad), valores in uso.items()])
+
+def _reconstruir_uso(conn):
+    """Recalcula `uso_facultad` recorriendo todas las reservas, dentro de la transacción abierta."""
+    uso = {}
+    for fila in conn.execute(SQL_FILAS_USO):
+        _acumular_uso(uso, *fila)
+    conn.execute(SQL_VACIAR_USO)
+    _sumar_uso(conn, uso)
+
+def _insertar_filas(conn, filas, sql=SQL_INSERTAR):
+    """Inserta reservas (ver `fila_reserva`), marca su ocupación y suma su uso; devuelve False si alguna ya existía y se ignoró."""
+    antes = conn.total_changes
+    conn.executemany(sql, filas)
+    exacto = conn.total_changes - antes == len(filas)
+    if exacto:
+        uso = {}
+        for fila in filas:
+            _acumular_uso(uso, fila[1], fila[2], fila[3], fila[5], fila[6])
+        _sumar_uso(conn, uso)
+    else:
+        _reconstruir_uso(conn)
+    asignaciones = [asignacion_de_columnas(*fila[5:]) for fila in filas]
+    if exacto and all(asignaciones):
+        _marcar(conn, asignaciones, True)
+    else:
+        # Filas ignoradas (con IDs distintos a los guardados) o sin IDs: sus salones dependen del orden de llegada
+        _reconstruir_inventario(conn)
+    return exacto
+
+def _borrar_fila(conn, sql_buscar, sql_borrar, clave):
+    """Borra una reserva y libera su ocupación; devuelve (fila leída con `sql_buscar`, asignación) o None."""
+    fila = conn.execute(sql_buscar, (clave,)).fetchone()
+    if fila is None:
+        return None
+    conn.execute(sql_borrar, (clave,))
+    uso = {}
+    _acumular_uso(uso, fila[3], fila[0], fila[1], fila[4], fila[5], signo=-1)
+    _sumar_uso(conn, uso)
+    conn.execute(SQL_LIMPIAR_USO)
+    asignacion = asignacion_de_columnas(*fila[-4:])
+    if asignacion:
+        _marcar(conn, [asignacion], False)
+    else:
+        _reconstruir_inventario(conn)
+    return fila, asignacion
+
+def _borrar_id(conn, id_registro):
+    borrada = _borrar_fila(conn, SQL_BUSCAR_ID, SQL_BORRAR_ID, id_registro)
+    if borrada is None:
+        return None
+    fila, asignacion = borrada
+    return fila[0], fila[1], fila[2], asignacion
+
+def _borrar_todo(conn):
+    conn.execute(SQL_VACIAR_INVENTARIO)
+    conn.execute(SQL_VACIAR_USO)
+    return conn.execute(SQL_BORRAR_TODO).rowcount
+
+class AlmacenReservas:
+    """Conexión SQLite persistente por hilo, en modo WAL y con sentencias preparadas cacheadas.
+
+    Cada hilo obtiene su propia conexión la primera vez que la usa y la conserva
+    mientras viva el almacén, evitando abrir una conexión por solicitud.
+    """
+
+    def __init__(self, db_name=DB_NAME, synchronous=SYNCHRONOUS):
+        self.db_name = db_name
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock_conexiones = threading.Lock()
+
+    def conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, cached_statements=CACHE_SENTENCIAS)
+            conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            with self._lock_conexiones:
+                self._conexiones.append(conn)
+        return conn
+
+    def cerrar(self):
+        with self._lock_conexiones:
+            for conn in self._conexiones:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._conexiones.clear()
+        self._local = threading.local()
+
+    def crear_tabla(self):
+        conn = self.conexion()
+        with conn:
+            conn.execute(SQL_CREAR_TABLA)
+            existentes = {fila[1] for fila in conn.execute(SQL_COLUMNAS)}
+            for columna, tipo in COLUMNAS_ASIGNACION:
+                if columna not in existentes:
+                    conn.execute(f"ALTER TABLE solicitudes ADD COLUMN {columna} {tipo}")
+            for sql in SQL_CREAR_INDICES:
+                conn.execute(sql)
+            conn.execute(SQL_CREAR_LOG)
+            conn.execute(SQL_CREAR_ESTADO)
+            if conn.execute(SQL_EXISTE_TABLA, ("inventario",)).fetchone() is None:
+                # BD anterior a la tabla materializada: se llena una vez con todo lo guardado
+                conn.execute(SQL_CREAR_INVENTARIO)
+                _reconstruir_inventario(conn)
+            if conn.execute(SQL_EXISTE_TABLA, ("uso_facultad",)).fetchone() is None:
+                conn.execute(SQL_CREAR_USO)
+                _reconstruir_uso(conn)
+
+    def existe_uuid(self, uuid):
+        return self.conexion().execute(SQL_BUSCAR_UUID, (uuid,)).fetchone() is not None
+
+    def buscar_asignacion(self, uuid):
+        """Asignación original de un UUID ya guardado, o None si no existe."""
+        fila = self.conexion().execute(SQL_BUSCAR_ASIGNACION, (uuid,)).fetchone()
+        if fila is None:
+            return None
+        return _respuesta_guardada(*fila)
+
+    def iterar_uuids(self):
+        return self.conexion().execute(SQL_UUIDS)
+
+    def ultimas_asignaciones(self, limite):
+        """[(uuid, respuesta guardada), ...] de las reservas más recientes primero."""
+        return [(fila[0], _respuesta_guardada(*fila[1:]))
+                for fila in self.conexion().execute(SQL_ULTIMAS_ASIGNACIONES, (limite,))]
+
+    def iterar_asignaciones(self):
+        """(salones, laboratorios, asignación o None) de cada reserva, en orden de llegada."""
+        return _asignaciones(self.conexion())
+
+    def leer_inventario(self):
+        """Ocupación materializada: (recurso, id, franjas empaquetadas) por recurso, sin recorrer las reservas."""
+        return self.conexion().execute(SQL_LEER_INVENTARIO)
+
+    def verificar_inventario(self):
+        """Compara `inventario` con la ocupación recalculada desde todas las reservas.
+
+        Ambas se leen en la misma transacción de lectura, así que el escritor
+        puede seguir confirmando lotes. Devuelve los (recurso, id) que difieren.
+        """
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            materializado = InventarioAulas()
+            materializado.cargar_filas(conn.execute(SQL_LEER_INVENTARIO))
+            recalculado = InventarioAulas()
+            recalculado.cargar(_asignaciones(conn))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return materializado.diferencias(recalculado)
+
+    def uso_por_facultad(self, semana=None):
+        """Reservas, salones y laboratorios por facultad en una semana (0..SEMANAS-1) o, sin ella, en todo el semestre.
+
+        Lee solo los agregados de `uso_facultad`: una fila por facultad.
+        """
+        if semana is None:
+            semana = SEMANA_TOTAL
+        elif not (isinstance(semana, int) and 0 <= semana < SEMANAS):
+            raise ValueError(f"Semana inválida: {semana} (debe estar entre 0 y {SEMANAS - 1})")
+        return [{"facultad": facultad, "reservas": reservas, "salones": salones, "laboratorios": laboratorios}
+                for facultad, reservas, salones, laboratorios in self.conexion().execute(SQL_LEER_USO, (semana,))]
+
+    def reconstruir_inventario(self):
+        conn = self.conexion()
+        with conn:
+            _reconstruir_inventario(conn)
+
+    def insertar_solicitud(self, uuid, facultad, salones, laboratorios, fecha=None, asignacion=None):
+        self.insertar_solicitudes([fila_reserva(uuid, facultad, salones, laboratorios, fecha, asignacion)])
+
+    def insertar_solicitudes(self, filas):
+        """Inserta varias filas (ver `fila_reserva`) en una sola transacción."""
+        conn = self.conexion()
+        with conn:
+            _insertar_filas(conn, filas)
+
+    def borrar_registro(self, id_registro):
+        """Borra un registro y devuelve (salones, laboratorios, uuid, asignación), o None si no existe."""
+        conn = self.conexion()
+        with conn:
+            resultado = _borrar_id(conn, id_registro)
+        return resultado
+
+    def borrar_todo(self):
+        """Borra todos los registros y devuelve cuántos había."""
+        conn = self.conexion()
+        with conn:
+            borrados = _borrar_todo(conn)
+        return borrados
+
+    def pagina_registros(self, limite, despues_de=None, facultad=None, desde=None, hasta=None):
+        """Hasta `limite` registros, de los más recientes a los más antiguos (paginación por clave).
+
+        `despues_de` es la clave (fecha, id) del último registro de la página
+        anterior; `desde` y `hasta` acotan la fecha como texto ISO (`hasta`
+        exclusivo). Cada página es una consulta por índice independiente, así
+        que ni se ordena la tabla ni se mantiene abierta una lectura entre páginas.
+        """
+        condiciones = []
+        parametros = []
+        if facultad:
+            condiciones.append("facultad = ?")
+            parametros.append(facultad)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha < ?")
+            parametros.append(hasta)
+        if despues_de:
+            condiciones.append("(fecha, id) < (?, ?)")
+            parametros.extend(despues_de)
+        filtro = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+        return self.conexion().execute(SQL_PAGINA.format(filtro=filtro), parametros + [limite]).fetchall()
+
+    def iterar_paginas(self, tam_pagina, **filtros):
+        """Genera páginas de `pagina_registros` hasta agotar los registros que cumplen los filtros."""
+        despues_de = None
+        while True:
+            pagina = self.pagina_registros(tam_pagina, despues_de, **filtros)
+            if pagina:
+                yield pagina
+            if len(pagina) < tam_pagina:
+                return
+            despues_de = (pagina[-1][5], pagina[-1][0])
+
+    def ultimo_seq(self):
+        return self.conexion().execute(SQL_ULTIMO_SEQ).fetchone()[0] or 0
+
+    def sembrar_log(self):
+        """Seq hasta la que el historial solo se puede copiar con un snapshot (0 si no hay).
+
+        En una BD anterior al log de replicación (log vacío pero con reservas) se
+        reserva la seq 1 para todo ese historial: los eventos nuevos empiezan en 2
+        y una réplica en seq 0 recibe un snapshot en vez de darse por al día.
+        """
+        if (self.leer_estado("seq_historial") is None and self.ultimo_seq() == 0
+                and self.conexion().execute(SQL_HAY_SOLICITUDES).fetchone()[0]):
+            self.guardar_estado("seq_historial", 1)
+        return self.leer_estado("seq_historial", 0)
+
+    def leer_log(self, despues_de, limite):
+        """Eventos del log de replicación con seq > despues_de, en orden."""
+        return self.conexion().execute(SQL_LEER_LOG, (despues_de, limite)).fetchall()
+
+    def primer_seq(self):
+        """Primera secuencia que sigue en el log, o None si está vacío."""
+        return self.conexion().execute(SQL_PRIMER_SEQ).fetchone()[0]
+
+    def podar_log(self, hasta):
+        """Descarta del log los eventos con seq <= hasta."""
+        conn = self.conexion()
+        with conn:
+            return conn.execute(SQL_PODAR_LOG, (hasta,)).rowcount
+
+    def exportar_snapshot(self, tam_bloque):
+        """Copia consistente de `solicitudes` en bloques de filas.
+
+        El primer valor generado es la secuencia del log a la que corresponde la
+        copia; después vienen las filas en listas de hasta `tam_bloque`. Todo se
+        lee dentro de una única transacción de lectura en una conexión propia,
+        así que en modo WAL el escritor sigue confirmando lotes mientras tanto.
+        """
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            yield conn.execute(SQL_ULTIMO_SEQ).fetchone()[0] or 0
+            cursor = conn.execute(SQL_EXPORTAR)
+            while True:
+                filas = cursor.fetchmany(tam_bloque)
+                if not filas:
+                    break
+                yield filas
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def importar_snapshot(self, seq, bloques):
+        """Reemplaza `solicitudes` por los bloques recibidos y deja la réplica en `seq`, en una sola transacción."""
+        conn = self.conexion()
+        total = 0
+        with conn:
+            conn.execute(SQL_BORRAR_TODO)
+            for filas in bloques:
+                conn.executemany(SQL_IMPORTAR, filas)
+                total += len(filas)
+            _reconstruir_inventario(conn)
+            _reconstruir_uso(conn)
+            conn.execute(SQL_GUARDAR_ESTADO, ("ultimo_seq", seq))
+        return total
+
+    def aplicar_replicacion(self, eventos, seq):
+        """Aplica eventos replicados en una sola transacción y deja la réplica en `seq`.
+
+        Devuelve False si alguna reserva ya existía y se ignoró; en ese caso el
+        llamador debe reconstruir su estado en memoria desde la tabla.
+        """
+        conn = self.conexion()
+        exacto = True
+        filas = []
+
+        def insertar():
+            nonlocal exacto
+            if not _insertar_filas(conn, filas, SQL_INSERTAR_O_IGNORAR):
+                exacto = False
+            filas.clear()
+
+        with conn:
+            for evento in eventos:
+                if evento["tipo"] in ("reserva", "reservas"):
+                    filas.extend(fila_de_evento(reserva) for reserva in evento.get("reservas", [evento]))
+                    continue
+                if filas:
+                    insertar()
+                if evento["tipo"] == "borrado_registro":
+                    _borrar_fila(conn, SQL_BUSCAR_POR_UUID, SQL_BORRAR_UUID, evento["uuid"])
+                else:
+                    _borrar_todo(conn)
+            if filas:
+                insertar()
+            conn.execute(SQL_GUARDAR_ESTADO, ("ultimo_seq", seq))
+        return exacto
+
+    def leer_estado(self, clave, defecto=None):
+        fila = self.conexion().execute(SQL_LEER_ESTADO, (clave,)).fetchone()
+        return defecto if fila is None else fila[0]
+
+    def guardar_estado(self, clave, valor):
+        conn = self.conexion()
+        with conn:
+            conn.execute(SQL_GUARDAR_ESTADO, (clave, valor))
+
+class EscrituraPendiente:
+    """Operación encolada en el escritor; se completa cuando su lote queda en disco."""
+
+    def __init__(self, operacion, datos):
+        self.operacion = operacion
+        self.datos = datos
+        self.resultado = None
+        self.error = None
+        self._hecho = threading.Event()
+        self._lock = threading.Lock()
+        self._al_completar = []
+
+    def completar(self, error=None):
+        with self._lock:
+            self.error = error
+            self._hecho.set()
+            callbacks, self._al_completar = self._al_completar, []
+        for callback in callbacks:
+            callback(error)
+
+    def al_completar(self, callback):
+        """Llama a `callback(error)` cuando el lote termine (en el hilo escritor), o ya si terminó; no debe lanzar."""
+        with self._lock:
+            if not self._hecho.is_set():
+                self._al_completar.append(callback)
+                return
+        callback(self.error)
+
+    def esperar(self, timeout=None):
+        if not self._hecho.wait(timeout):
+            raise TimeoutError("La escritura no se confirmó a tiempo")
+        if self.error:
+            raise self.error
+        return self.resultado
+
+class EscritorAgrupado:
+    """Hilo escritor único que confirma varias operaciones en una sola transacción (group commit).
+
+    Los hilos que atienden solicitudes encolan sus filas y esperan; el escritor
+    toma todo lo pendiente (hasta `tam_lote`, esperando como mucho `espera_max`
+    segundos a que lleguen más), lo inserta con `executemany` y despierta a cada
+    solicitud solo cuando el COMMIT del lote terminó.
+
+    Con `al_confirmar`, cada operación se anota además en `replicacion_log` con
+    un número de secuencia en la misma transacción, y tras el COMMIT se entrega
+    la lista de (seq, evento) al callback.
+    """
+
+    def __init__(self, almacen, tam_lote=TAM_LOTE_ESCRITURA, espera_max=ESPERA_MAX_LOTE, al_confirmar=None):
+        self.almacen = almacen
+        self.tam_lote = tam_lote
+        self.espera_max = espera_max
+        self.al_confirmar = al_confirmar
+        self.ultimo_seq = almacen.ultimo_seq()
+        self.cola = queue.Queue()
+        self.hilo = threading.Thread(target=self._ciclo, daemon=True)
+        self.hilo.start()
+
+    def _encolar(self, operacion, datos):
+        pendiente = EscrituraPendiente(operacion, datos)
+        self.cola.put(pendiente)
+        return pendiente
+
+    def encolar(self, uuid, facultad, salones, laboratorios, fecha=None, asignacion=None):
+        return self._encolar("reserva", evento_reserva(uuid, facultad, salones, laboratorios, fecha, asignacion))
+
+    def encolar_varias(self, reservas):
+        """Encola varias reservas (ver `evento_reserva`) que se guardan juntas y se replican como un solo evento."""
+        return self._encolar("reservas", list(reservas))
+
+    def guardar(self, uuid, facultad, salones, laboratorios, fecha=None, asignacion=None, timeout=None):
+        """Encola la fila y bloquea hasta que sea durable."""
+        self.encolar(uuid, facultad, salones, laboratorios, fecha, asignacion).esperar(timeout)
+
+    def borrar_registro(self, id_registro, timeout=None):
+        """Borra un registro y devuelve (salones, laboratorios, uuid, asignación), o None si no existe."""
+        return self._encolar("borrado_registro", id_registro).esperar(timeout)
+
+    def encolar_borrado_total(self):
+        """Encola el borrado de todos los registros; `esperar()` devuelve cuántos había."""
+        return self._encolar("borrado_total", None)
+
+    def _tomar_lote(self):
+        lote = [self.cola.get()]
+        limite = time.monotonic() + self.espera_max
+        while len(lote) < self.tam_lote:
+            try:
+                lote.append(self.cola.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _aplicar(self, conn, lote):
+        """Aplica el lote en orden dentro de la transacción abierta y devuelve sus eventos."""
+        eventos = []
+        filas = []
+        for pendiente in lote:
+            if pendiente.operacion == "reserva":
+                filas.append(fila_de_evento(pendiente.datos))
+                eventos.append(pendiente.datos)
+                continue
+            if pendiente.operacion == "reservas":
+                filas.extend(fila_de_evento(reserva) for reserva in pendiente.datos)
+                eventos.append({"tipo": "reservas", "reservas": pendiente.datos})
+                continue
+            # Los borrados cortan la racha de inserciones para respetar el orden de llegada
+            if filas:
+                _insertar_filas(conn, filas, SQL_INSERTAR_O_IGNORAR)
+                filas = []
+            if pendiente.operacion == "borrado_registro":
+                pendiente.resultado = _borrar_id(conn, pendiente.datos)
+                if pendiente.resultado:
+                    eventos.append({"tipo": "borrado_registro", "id": pendiente.datos, "uuid": pendiente.resultado[2],
+                                    "asignacion": pendiente.resultado[3]})
+            else:
+                pendiente.resultado = _borrar_todo(conn)
+                eventos.append({"tipo": "borrado_total"})
+        if filas:
+            _insertar_filas(conn, filas, SQL_INSERTAR_O_IGNORAR)
+        return eventos
+
+    def _ciclo(self):
+        while True:
+            lote = self._tomar_lote()
+            error = None
+            registrados = []
+            try:
+                conn = self.almacen.conexion()
+                with conn:
+                    eventos = self._aplicar(conn, lote)
+                    if self.al_confirmar is not None:
+                        registrados = [(self.ultimo_seq + i + 1, evento) for i, evento in enumerate(eventos)]
+                        conn.executemany(SQL_INSERTAR_LOG, [(seq, json.dumps(evento)) for seq, evento in registrados])
+                if registrados:
+                    self.ultimo_seq = registrados[-1][0]
+            except Exception as e:
+                error = e
+                registrados = []
+            for pendiente in lote:
+                pendiente.completar(error)
+            if registrados:
+                self.al_confirmar(registrados)
+
+_almacen = AlmacenReservas(DB_NAME)
+
 def crear_tablas():
     """Crea la tabla de solicitudes si no existe."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS solicitudes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                uuid TEXT UNIQUE,
-                facultad TEXT NOT NULL,
-                salones_asignados INTEGER NOT NULL,
-                laboratorios_asignados INTEGER NOT NULL,
-                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        print("✅ [DATABASE] Tabla 'solicitudes' creada o ya existente.")
- 
+    _almacen.crear_tabla()
+    print("✅ [DATABASE] Tabla 'solicitudes' creada o ya existente.")
+
 def guardar_solicitud(uuid, facultad, salones, laboratorios):
     """Guarda una solicitud en la base de datos si el uuid no existe."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM solicitudes WHERE uuid = ?", (uuid,))
-        if cursor.fetchone():
-            print(" [DATABASE] Solicitud duplicada ignorada (UUID ya existe).")
-            return
-        cursor.execute('''
-            INSERT INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados)
-            VALUES (?, ?, ?, ?)
-        ''', (uuid, facultad, salones, laboratorios))
-        conn.commit()
-        print(f" [DATABASE] Solicitud guardada: {facultad} - {salones} salones, {laboratorios} laboratorios")
- 
+    if _almacen.existe_uuid(uuid):
+        print(" [DATABASE] Solicitud duplicada ignorada (UUID ya existe).")
+        return
+    _almacen.insertar_solicitud(uuid, facultad, salones, laboratorios)
+    print(f" [DATABASE] Solicitud guardada: {facultad} - {salones} salones, {laboratorios} laboratorios")
+
+def pedir_filtros_registros():
+    """Pregunta por consola los filtros del listado; Enter deja cada uno sin aplicar."""
+    filtros = {}
+    facultad = input("Facultad (Enter = todas): ").strip()
+    if facultad:
+        filtros["facultad"] = facultad
+    for clave, texto in (("desde", "Desde"), ("hasta", "Hasta")):
+        valor = input(f"{texto} (AAAA-MM-DD, Enter = sin límite): ").strip()
+        if not valor:
+            continue
+        fecha = datetime.strptime(valor, "%Y-%m-%d")
+        if clave == "hasta":
+            fecha += timedelta(days=1)  # incluye todo el día indicado
+        filtros[clave] = fecha.strftime("%Y-%m-%d")
+    return filtros
+
+def verificar_inventario(almacen, lock, recargar):
+    """Compara la tabla `inventario` con la ocupación recalculada desde todas las reservas.
+
+    Si hay diferencias ofrece reconstruirla; `recargar` vuelve a leer el inventario
+    en memoria y se llama con `lock` tomado.
+    """
+    inicio = time.time()
+    diferencias = almacen.verificar_inventario()
+    print(f"\nVerificación completada en {time.time() - inicio:.2f} s")
+    if not diferencias:
+        print("✅ La tabla inventario coincide con las reservas guardadas.\n")
+        return True
+    print(f"❌ {len(diferencias)} recursos no coinciden, por ejemplo: {diferencias[:10]}")
+    if input("¿Reconstruir la tabla desde las reservas? (s/n): ").lower() == 's':
+        with lock:
+            almacen.reconstruir_inventario()
+            recargar()
+        print("✅ Inventario reconstruido.\n")
+    return False
+
 if __name__ == "__main__":
     crear_tablas()
@@ -1,22 +1,68 @@
 import zmq
 
+import zmq.asyncio
+
+from codec import codificar, decodificar, CODEC_JSON
+
+from metricas import VentanaLatencias
+
+import asyncio
+
 import time
 
 import logging
 
 import uuid
+
+import random
+
+import queue
+
+import threading
  
 logging.basicConfig(level=logging.INFO)
 
 logger = logging.getLogger("Facultad")
  
 PUERTO_SERVIDOR = 5555
+
+PUERTO_HEALTHCHECK = 5557
  
 IP_SERVIDOR_CENTRAL = "10.43.96.52"
 
 IP_SERVIDOR_BACKUP  = "10.43.96.100"
  
+IP_BROKER = "127.0.0.1"  # máquina donde corre broker.py
+
+PUERTO_BROKER = 5560
+ 
 TIMEOUT = 5000  # 5 segundos en milisegundos
+
+CODEC = CODEC_JSON  # "json" (compatible con todo), "msgpack" o "binario" (ver codec.py)
+
+REINTENTOS = 2  # intentos por servidor, con un socket nuevo cada vez, antes de pasar al siguiente
+
+REINTENTOS_OCUPADO = 3  # veces que se repite una solicitud rechazada con "ocupado" antes de devolver el rechazo
+
+# Las lecturas van primero a la réplica; si su respuesta está más atrasada que esto se repiten en el primario
+MAX_RETRASO_LECTURA = 100  # eventos de replicación
+MAX_ANTIGUEDAD_LECTURA = 1.0  # segundos desde el último latido del central que vio la réplica
+
+INTERVALO_SALUD = 0.5  # segundos entre consultas al health check de cada servidor
+
+TIMEOUT_SALUD = 300  # ms; sin respuesta en este tiempo el servidor se da por caído hasta el próximo sondeo
+
+# Hedging: si la respuesta tarda más que el p95 observado, la misma solicitud (mismo UUID) sale también
+# hacia el siguiente servidor y se usa la primera que llegue. La deduplicación por UUID lo hace seguro.
+HEDGING = False
+
+PERCENTIL_HEDGING = 0.95
+
+RETARDO_HEDGING_INICIAL = 0.05  # segundos, hasta tener MIN_MUESTRAS_HEDGING latencias medidas
+
+MIN_MUESTRAS_HEDGING = 20
+
+FRACCION_MAX_HEDGING = 0.1  # como mucho una solicitud duplicada por cada 10 enviadas
  
 FACULTADES = {
 
@@ -46,33 +92,525 @@ MAX_AULAS = 500
 
 MAX_LABORATORIOS = 200
  
+def con_plazo(solicitud, timeout):
+    """Copia de la solicitud con el instante (epoch, s) en que el cliente dejará de esperar este intento."""
+    return dict(solicitud, plazo=time.time() + timeout / 1000)
+
+def lectura_vigente(respuesta, max_retraso=MAX_RETRASO_LECTURA, max_antiguedad=MAX_ANTIGUEDAD_LECTURA):
+    """True si una respuesta de lectura está dentro de la cota de atraso aceptada."""
+    if respuesta is None or respuesta.get("status") != "success":
+        return False
+    antiguedad = respuesta.get("antiguedad_s")
+    return (respuesta.get("retraso_eventos", 0) <= max_retraso
+            and antiguedad is not None and antiguedad <= max_antiguedad)
+
+def espera_ocupado(respuesta):
+    """Segundos antes de repetir una solicitud rechazada con "ocupado" (None si no lo fue).
+
+    Es lo que indica el servidor con jitter, para que los clientes rechazados a la vez no vuelvan juntos.
+    """
+    if not respuesta or respuesta.get("status") != "ocupado":
+        return None
+    return respuesta.get("reintentar_en_ms", 0) / 1000 * random.uniform(1, 2)
+
+def destino_redireccion(respuesta):
+    """Servidor primario indicado por una réplica en STANDBY, o None si la respuesta no es una redirección."""
+    if respuesta and respuesta.get("status") == "redirect":
+        return respuesta.get("primario")
+    return None
+
+class VistaServidores:
+    """Salud de cada servidor según su health check, refrescada en segundo plano.
+
+    Un hilo consulta cada `intervalo` segundos el health check de cada servidor
+    (rol, solicitudes en cola y p99 reciente) y guarda la última respuesta, o
+    None si no respondió. Elegir servidor solo lee esa vista, así que ninguna
+    solicitud espera a un servidor que ya se sabe caído.
+    """
+
+    def __init__(self, servidores, intervalo=INTERVALO_SALUD, timeout=TIMEOUT_SALUD, contexto=None):
+        self.servidores = dict(servidores)  # endpoint de solicitudes -> endpoint del health check
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.contexto = contexto or zmq.Context.instance()
+        self.estados = {}  # endpoint de solicitudes -> último estado, o None si el último sondeo falló
+        self.sockets = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self._ciclo, daemon=True).start()
+
+    def _sondear(self, endpoint_salud):
+        socket = self.sockets.get(endpoint_salud)
+        if socket is None:
+            socket = self.sockets[endpoint_salud] = self.contexto.socket(zmq.REQ)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.setsockopt(zmq.RCVTIMEO, self.timeout)
+            socket.connect(endpoint_salud)
+        try:
+            socket.send(b"PING")
+            return decodificar(socket.recv())[0]
+        except zmq.ZMQError:
+            # REQ sin respuesta: se descarta y el próximo sondeo usa uno nuevo
+            socket.close()
+            del self.sockets[endpoint_salud]
+            return None
+
+    def _ciclo(self):
+        while True:
+            for endpoint, endpoint_salud in self.servidores.items():
+                estado = self._sondear(endpoint_salud)
+                with self.lock:
+                    if estado is None and self.estados.get(endpoint) is not None:
+                        logger.warning(f"{endpoint} no respondió al health check, se evita hasta que vuelva")
+                    self.estados[endpoint] = estado
+            time.sleep(self.intervalo)
+
+    def marcar_caido(self, endpoint):
+        """Una solicitud sin respuesta cuenta como sondeo fallido hasta el próximo health check."""
+        with self.lock:
+            if endpoint in self.servidores:
+                self.estados[endpoint] = None
+
+    def vivos(self, endpoints):
+        """Los endpoints, en el mismo orden, sin los que se saben caídos; todos si no queda ninguno."""
+        with self.lock:
+            vivos = [e for e in endpoints if e not in self.estados or self.estados[e] is not None]
+        return vivos or list(endpoints)
+
+    def ordenar(self, endpoints):
+        """Primarios vivos de menor a mayor carga, luego los aún sin sondear y al final las réplicas en STANDBY.
+
+        La carga estimada es (en cola + 1) × p99: lo que tardaría una solicitud más.
+        """
+        with self.lock:
+            estados = dict(self.estados)
+
+        def clave(endpoint):
+            if endpoint not in estados:
+                return 1, 0
+            estado = estados[endpoint]
+            if estado is None:
+                return 3, 0
+            if estado.get("rol") != "primario":
+                return 2, 0
+            return 0, (estado.get("en_cola", 0) + 1) * max(estado.get("p99_ms", 0), 1.0)
+
+        return sorted(self.vivos(endpoints), key=clave)
+
+class SesionFacultad:
+    """Sockets REQ de larga vida hacia cada servidor, reutilizados entre solicitudes.
+
+    Cada servidor tiene un pool de sockets libres: quien envía toma uno, hace su
+    petición y lo devuelve, así que varios hilos pueden compartir la sesión
+    (desde asyncio, con `run_in_executor`). Si la respuesta no llega a tiempo
+    solo ese socket se cierra y se reintenta con uno nuevo (lazy pirate); el
+    UUID de la solicitud hace que el reintento sea seguro.
+    """
+
+    def __init__(self, servidores=None, timeout=TIMEOUT, reintentos=REINTENTOS, contexto=None, codec=None, vista=None,
+                 hedging=False):
+        self.contexto = contexto or zmq.Context.instance()
+        self.servidores = servidores or [f"tcp://{ip}:{PUERTO_SERVIDOR}" for ip in (IP_SERVIDOR_CENTRAL, IP_SERVIDOR_BACKUP)]
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.codec = codec or CODEC
+        self.vista = vista  # VistaServidores opcional: sin ella se prueban los servidores en el orden dado
+        self.hedging = hedging
+        self.latencias = VentanaLatencias()  # de cada solicitud cubierta, vista por el cliente
+        self.enviadas = 0
+        self.duplicadas = 0
+        self.libres = {}  # endpoint -> pila de sockets conectados y libres
+        self.lock = threading.Lock()
+
+    def _tomar(self, endpoint):
+        with self.lock:
+            libres = self.libres.setdefault(endpoint, queue.LifoQueue())
+        try:
+            return libres.get_nowait()
+        except queue.Empty:
+            socket = self.contexto.socket(zmq.REQ)
+            socket.setsockopt(zmq.RCVTIMEO, self.timeout)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(endpoint)
+            return socket
+
+    def enviar_a(self, endpoint, solicitud):
+        """Envía la solicitud a un servidor concreto; lanza zmq.Again si no respondió en ningún intento."""
+        for intento in range(1, self.reintentos + 1):
+            socket = self._tomar(endpoint)
+            try:
+                socket.send(codificar(con_plazo(solicitud, self.timeout), self.codec))
+                respuesta, _ = decodificar(socket.recv())
+            except zmq.Again:
+                # Un REQ sin respuesta queda inutilizable: se descarta solo este socket
+                socket.close()
+                logger.warning(f"Sin respuesta de {endpoint} (intento {intento}/{self.reintentos})")
+                continue
+            except Exception:
+                socket.close()
+                raise
+            self.libres[endpoint].put(socket)
+            return respuesta
+        if self.vista:
+            self.vista.marcar_caido(endpoint)
+        raise zmq.Again()
+
+    def retardo_hedging(self):
+        """Segundos que se espera la primera respuesta antes de duplicar la solicitud: el p95 observado."""
+        if len(self.latencias) < MIN_MUESTRAS_HEDGING:
+            return RETARDO_HEDGING_INICIAL
+        return self.latencias.percentil(PERCENTIL_HEDGING)
+
+    def _puede_duplicar(self):
+        # Presupuesto de duplicados: si todo va lento (p. ej. sobrecarga), no se multiplica la carga
+        with self.lock:
+            if self.duplicadas + 1 > FRACCION_MAX_HEDGING * self.enviadas:
+                return False
+            self.duplicadas += 1
+            return True
+
+    def enviar_cubierta(self, endpoint, alterno, solicitud):
+        """Envía a `endpoint` y, si no responde en `retardo_hedging()`, la misma solicitud a `alterno`.
+
+        Devuelve (respuesta, endpoint que respondió) con la primera respuesta que
+        llegue; lanza zmq.Again si ninguna llegó en `timeout`. Sin `alterno` el
+        duplicado va al mismo servidor por otro socket.
+        """
+        with self.lock:
+            self.enviadas += 1
+        poller = zmq.Poller()
+        en_vuelo = {}  # socket -> (endpoint, instante en que se envió)
+        probados = set()
+
+        def lanzar(destino):
+            socket = self._tomar(destino)
+            socket.send(codificar(con_plazo(solicitud, self.timeout), self.codec))
+            poller.register(socket, zmq.POLLIN)
+            en_vuelo[socket] = (destino, time.monotonic())
+            probados.add(destino)
+
+        lanzar(endpoint)
+        # Los plazos se cuentan desde el primer envío, así el primero tiene su timeout completo
+        inicio = en_vuelo[next(iter(en_vuelo))][1]
+        limite = inicio + self.timeout / 1000
+        hedge = inicio + self.retardo_hedging()
+        try:
+            while en_vuelo:
+                ahora = time.monotonic()
+                if hedge is not None and ahora >= hedge:
+                    hedge = None
+                    if self._puede_duplicar():
+                        logger.info(f"Sin respuesta de {endpoint} tras {(ahora - inicio) * 1000:.0f} ms, duplicando hacia {alterno or endpoint}")
+                        lanzar(alterno or endpoint)
+                if ahora >= limite:
+                    break
+                espera = min(limite, hedge) if hedge is not None else limite
+                for socket, _ in poller.poll(max(0.0, espera - ahora) * 1000):
+                    destino, _ = en_vuelo.pop(socket)
+                    poller.unregister(socket)
+                    respuesta, _ = decodificar(socket.recv())
+                    self.libres[destino].put(socket)
+                    primario = destino_redireccion(respuesta)
+                    if primario is None:
+                        self.latencias.registrar(time.monotonic() - inicio)
+                        return respuesta, destino
+                    if primario not in probados:
+                        lanzar(primario)
+        finally:
+            # Los REQ que siguen esperando respuesta no se pueden reutilizar
+            for socket in en_vuelo:
+                socket.close()
+        if self.vista:
+            # Solo se da por caído a quien tuvo su timeout completo: un duplicado enviado
+            # poco antes del límite no dice nada de ese servidor
+            fin = time.monotonic()
+            for destino, enviado in en_vuelo.values():
+                if fin - enviado >= self.timeout / 1000:
+                    self.vista.marcar_caido(destino)
+        raise zmq.Again()
+
+    def candidatos(self):
+        """Servidores en el orden en que conviene probarlos: según la vista de salud, si hay, o el configurado."""
+        return self.vista.ordenar(self.servidores) if self.vista else list(self.servidores)
+
+    def enviar(self, solicitud, servidores=None):
+        """Prueba los servidores en orden (por defecto `candidatos()`); devuelve la primera respuesta o None si ninguno respondió.
+
+        Si una réplica en STANDBY redirige, se prueba primero el primario que indica. Un
+        rechazo "ocupado" se repite hasta REINTENTOS_OCUPADO veces tras la espera que indica.
+        """
+        for intento in range(REINTENTOS_OCUPADO + 1):
+            respuesta = self._probar(solicitud, servidores)
+            espera = espera_ocupado(respuesta)
+            if espera is None or intento == REINTENTOS_OCUPADO:
+                return respuesta
+            time.sleep(espera)
+
+    def _probar(self, solicitud, servidores=None):
+        pendientes = list(servidores or self.candidatos())
+        probados = set()
+        while pendientes:
+            endpoint = pendientes.pop(0)
+            if endpoint in probados:
+                continue
+            probados.add(endpoint)
+            try:
+                if self.hedging:
+                    alterno = next((e for e in pendientes if e not in probados), None)
+                    respuesta, endpoint = self.enviar_cubierta(endpoint, alterno, solicitud)
+                    probados.add(endpoint)
+                else:
+                    respuesta = self.enviar_a(endpoint, solicitud)
+            except zmq.ZMQError as e:
+                logger.warning(f"El servidor {endpoint} no respondió ({e}), probando siguiente...")
+                continue
+            primario = destino_redireccion(respuesta)
+            if primario is None:
+                return respuesta
+            logger.info(f"{endpoint} no es el primario, redirigiendo a {primario}")
+            pendientes.insert(0, primario)
+        return None
+
+    def leer(self, solicitud):
+        """Envía una solicitud de solo lectura a la réplica primero y, si su respuesta
+        está demasiado atrasada o no llega, al primario; así el primario solo carga con las escrituras."""
+        lecturas = self.servidores[::-1]
+        respuesta = self.enviar(solicitud, self.vista.vivos(lecturas) if self.vista else lecturas)
+        if lectura_vigente(respuesta) or len(self.servidores) < 2:
+            return respuesta
+        logger.info(f"Lectura atrasada o sin respuesta de la réplica ({respuesta and respuesta.get('retraso_eventos')} eventos), "
+                    f"repitiendo en el primario")
+        return self.enviar(solicitud, self.candidatos()[:1]) or respuesta
+
+    def cerrar(self):
+        with self.lock:
+            for libres in self.libres.values():
+                while not libres.empty():
+                    libres.get_nowait().close()
+            self.libres.clear()
+
+class ClienteAsincrono:
+    """Cliente zmq.asyncio con muchas solicitudes en vuelo sobre un DEALER por servidor.
+
+    Cada solicitud se envía sin esperar a las anteriores y queda registrada por
+    su UUID; una tarea receptora por socket entrega cada respuesta al futuro
+    que la espera. Si no llega a tiempo se reenvía con el mismo UUID y, agotados
+    los intentos, se pasa al siguiente servidor.
+    """
+
+    def __init__(self, servidores=None, timeout=TIMEOUT, reintentos=REINTENTOS, contexto=None, codec=None, vista=None):
+        self.contexto = contexto or zmq.asyncio.Context.instance()
+        self.servidores = servidores or [f"tcp://{ip}:{PUERTO_SERVIDOR}" for ip in (IP_SERVIDOR_CENTRAL, IP_SERVIDOR_BACKUP)]
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.codec = codec or CODEC
+        self.vista = vista  # VistaServidores opcional, como en SesionFacultad
+        self.sockets = {}      # endpoint -> DEALER
+        self.receptores = []
+        self.pendientes = {}   # uuid -> futuro de la respuesta
+
+    def _socket(self, endpoint):
+        socket = self.sockets.get(endpoint)
+        if socket is None:
+            socket = self.contexto.socket(zmq.DEALER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(endpoint)
+            self.sockets[endpoint] = socket
+            self.receptores.append(asyncio.ensure_future(self._recibir(socket)))
+        return socket
+
+    async def _recibir(self, socket):
+        while True:
+            frames = await socket.recv_multipart()
+            try:
+                respuesta, _ = decodificar(frames[-1])
+                futuro = self.pendientes.get(respuesta.get("uuid"))
+                # Sin futuro: respuesta tardía a un intento que ya se resolvió
+                if futuro is not None and not futuro.done():
+                    futuro.set_result(respuesta)
+            except Exception as e:
+                # Una respuesta ilegible no debe dejar sin receptor a las demás solicitudes en vuelo
+                logger.error(f"Respuesta inválida descartada: {e}")
+
+    async def _enviar_a(self, endpoint, solicitud):
+        socket = self._socket(endpoint)
+        for intento in range(1, self.reintentos + 1):
+            # Un futuro por intento; una respuesta tardía de un intento anterior (mismo UUID) también lo resuelve
+            futuro = asyncio.get_running_loop().create_future()
+            self.pendientes[solicitud["uuid"]] = futuro
+            # Frame vacío como delimitador, igual que un REQ
+            await socket.send_multipart([b"", codificar(con_plazo(solicitud, self.timeout), self.codec)])
+            try:
+                return await asyncio.wait_for(futuro, self.timeout / 1000)
+            except asyncio.TimeoutError:
+                logger.warning(f"Sin respuesta de {endpoint} (intento {intento}/{self.reintentos})")
+        if self.vista:
+            self.vista.marcar_caido(endpoint)
+        return None
+
+    def candidatos(self):
+        return self.vista.ordenar(self.servidores) if self.vista else list(self.servidores)
+
+    async def enviar(self, solicitud, servidores=None):
+        """Envía la solicitud y espera su respuesta; devuelve None si ningún servidor respondió.
+
+        Como `SesionFacultad.enviar`, repite tras la espera indicada los rechazos "ocupado".
+        """
+        try:
+            for intento in range(REINTENTOS_OCUPADO + 1):
+                respuesta = await self._probar(solicitud, servidores)
+                espera = espera_ocupado(respuesta)
+                if espera is None or intento == REINTENTOS_OCUPADO:
+                    return respuesta
+                await asyncio.sleep(espera)
+        finally:
+            self.pendientes.pop(solicitud["uuid"], None)
+
+    async def _probar(self, solicitud, servidores=None):
+        pendientes = list(servidores or self.candidatos())
+        probados = set()
+        while pendientes:
+            endpoint = pendientes.pop(0)
+            if endpoint in probados:
+                continue
+            probados.add(endpoint)
+            respuesta = await self._enviar_a(endpoint, solicitud)
+            primario = destino_redireccion(respuesta)
+            if primario is not None:
+                pendientes.insert(0, primario)
+            elif respuesta is not None:
+                return respuesta
+        return None
+
+    async def reservar(self, facultad, num_salones, num_laboratorios, franja_inicio=None, franja_fin=None):
+        """Sin franjas la reserva cubre todo el semestre."""
+        solicitud = {
+            "uuid": str(uuid.uuid4()),
+            "facultad": facultad,
+            "num_salones": num_salones,
+            "num_laboratorios": num_laboratorios
+        }
+        if franja_inicio is not None:
+            solicitud["franja_inicio"] = franja_inicio
+        if franja_fin is not None:
+            solicitud["franja_fin"] = franja_fin
+        return await self.enviar(solicitud)
+
+    async def reservar_lote(self, facultad, programas):
+        """Envía las solicitudes de todos los programas [(salones, laboratorios), ...] en un solo mensaje."""
+        respuesta = await self.enviar(mensaje_lote(facultad, programas))
+        return respuesta and respuesta.get("resultados")
+
+    async def leer(self, solicitud):
+        """Como `SesionFacultad.leer`: réplica primero y primario si la respuesta está atrasada."""
+        lecturas = self.servidores[::-1]
+        respuesta = await self.enviar(solicitud, self.vista.vivos(lecturas) if self.vista else lecturas)
+        if lectura_vigente(respuesta) or len(self.servidores) < 2:
+            return respuesta
+        return await self.enviar(solicitud, self.candidatos()[:1]) or respuesta
+
+    async def reporte(self, semana=None):
+        """[{"facultad", "reservas", "salones", "laboratorios"}, ...] de la semana pedida o de todo el semestre."""
+        respuesta = await self.leer(mensaje_reporte(semana))
+        return respuesta and respuesta.get("facultades")
+
+    async def disponibilidad(self, franja_inicio=None, franja_fin=None):
+        """Respuesta de "disponibilidad" (libres y cota de atraso) sin reservar nada."""
+        return await self.leer(mensaje_disponibilidad(franja_inicio, franja_fin))
+
+    async def reservar_varias(self, pedidos):
+        """Envía todos los pedidos (facultad, salones, laboratorios) a la vez y devuelve las respuestas en orden."""
+        return await asyncio.gather(*(self.reservar(*pedido) for pedido in pedidos))
+
+    def cerrar(self):
+        for receptor in self.receptores:
+            receptor.cancel()
+        for socket in self.sockets.values():
+            socket.close()
+        self.sockets.clear()
+        self.receptores.clear()
+
+def mensaje_lote(facultad, programas):
+    """Solicitud de tipo "lote" con una entrada (con su propio UUID) por programa académico."""
+    return {
+        "tipo": "lote",
+        "uuid": str(uuid.uuid4()),
+        "solicitudes": [{
+            "uuid": str(uuid.uuid4()),
+            "facultad": facultad,
+            "num_salones": num_salones,
+            "num_laboratorios": num_laboratorios
+        } for num_salones, num_laboratorios in programas]
+    }
+
+_sesiones = {}
+_lock_sesiones = threading.Lock()
+
+def mensaje_reporte(semana=None):
+    """Consulta de uso por facultad; sin semana (0..15) se pide el acumulado de todo el semestre."""
+    mensaje = {"tipo": "reporte", "uuid": str(uuid.uuid4())}
+    if semana is not None:
+        mensaje["semana"] = semana
+    return mensaje
+
+def mensaje_disponibilidad(franja_inicio=None, franja_fin=None):
+    """Consulta de salones y laboratorios libres en [franja_inicio, franja_fin); sin franjas, todo el semestre."""
+    mensaje = {"tipo": "disponibilidad", "uuid": str(uuid.uuid4())}
+    if franja_inicio is not None:
+        mensaje["franja_inicio"] = franja_inicio
+    if franja_fin is not None:
+        mensaje["franja_fin"] = franja_fin
+    return mensaje
+
+def vista_por_defecto():
+    """VistaServidores del central y el backup configurados, con el health check en PUERTO_HEALTHCHECK."""
+    return VistaServidores({f"tcp://{ip}:{PUERTO_SERVIDOR}": f"tcp://{ip}:{PUERTO_HEALTHCHECK}"
+                            for ip in (IP_SERVIDOR_CENTRAL, IP_SERVIDOR_BACKUP)})
+
+def obtener_sesion(*servidores):
+    """Sesión compartida por todo el proceso para ese conjunto de servidores.
+
+    Por defecto (central y backup) la sesión elige servidor con la vista de salud de ambos.
+    """
+    with _lock_sesiones:
+        sesion = _sesiones.get(servidores)
+        if sesion is None:
+            if servidores:
+                sesion = SesionFacultad(list(servidores))
+            else:
+                vista = vista_por_defecto()
+                sesion = SesionFacultad(list(vista.servidores), vista=vista, hedging=HEDGING)
+            _sesiones[servidores] = sesion
+        return sesion
+ 
 class Facultad:
 
     def __init__(self, nombre):
 
         self.nombre = nombre
 
-        self.contexto = zmq.Context()
+        self.sesion = obtener_sesion()
 
         logger.info(f" Procesando solicitud de facultad {nombre}...")
+
+    def consultar_disponibilidad(self, franja_inicio=None, franja_fin=None):
+
+        """Lectura servida por la réplica (o por el primario si la réplica está atrasada); no reserva nada."""
+
+        return self.sesion.leer(mensaje_disponibilidad(franja_inicio, franja_fin))
  
     def enviar_solicitud(self, num_salones, num_laboratorios):
 
-        """Prueba automáticamente Central y luego Backup."""
+        """Prueba los servidores en el orden de la vista de salud: primario vivo menos cargado primero."""
 
         solicitud_uuid = str(uuid.uuid4())  # <-- Generar UUID
 
-        for ip_servidor in [IP_SERVIDOR_CENTRAL, IP_SERVIDOR_BACKUP]:
+        candidatos = self.sesion.candidatos()
 
-            socket = self.contexto.socket(zmq.REQ)
-
-            socket.setsockopt(zmq.RCVTIMEO, TIMEOUT)
+        for i, endpoint in enumerate(candidatos):
 
             try:
 
-                logger.info(f"Intentando conexión a {ip_servidor}:{PUERTO_SERVIDOR} ...")
-
-                socket.connect(f"tcp://{ip_servidor}:{PUERTO_SERVIDOR}")
+                logger.info(f"Intentando conexión a {endpoint} ...")
 
                 solicitud = {
 
@@ -88,11 +626,25 @@ class Facultad:
 
                 logger.info(f" Enviando solicitud: {solicitud}")
 
-                socket.send_json(solicitud)
+                if self.sesion.hedging:
 
-                respuesta = socket.recv_json()
+                    # Si tarda más que el p95, la misma solicitud sale también hacia el siguiente servidor
+
+                    alterno = candidatos[i + 1] if i + 1 < len(candidatos) else None
+
+                    respuesta, endpoint = self.sesion.enviar_cubierta(endpoint, alterno, solicitud)
+
+                else:
+
+                    respuesta = self.sesion.enviar_a(endpoint, solicitud)
+
+                if destino_redireccion(respuesta):
+
+                    logger.info(f"{endpoint} está en STANDBY, probando siguiente...")
+
+                    continue
  
-                print(f"\n=== RESULTADO DE LA RESERVA (Servidor {ip_servidor}) ===")
+                print(f"\n=== RESULTADO DE LA RESERVA (Servidor {endpoint}) ===")
 
                 print(f" Facultad: {self.nombre}")
 
@@ -102,6 +654,10 @@ class Facultad:
 
                 print(f"- Asignados: {respuesta.get('salones_asignados', 0)}")
 
+                if respuesta.get("ids_salones"):
+
+                    print(f"- IDs: {respuesta['ids_salones']}")
+
                 faltan_salones = num_salones - respuesta.get('salones_asignados', 0)
 
                 if faltan_salones > 0:
@@ -114,6 +670,10 @@ class Facultad:
 
                 print(f"- Asignados: {respuesta.get('laboratorios_asignados', 0)}")
 
+                if respuesta.get("ids_laboratorios"):
+
+                    print(f"- IDs: {respuesta['ids_laboratorios']}")
+
                 faltan_labs = num_laboratorios - respuesta.get('laboratorios_asignados', 0)
 
                 if faltan_labs > 0:
@@ -132,27 +692,25 @@ class Facultad:
 
                     print(f"\n⚠️ Esta solicitud ya fue procesada anteriormente (duplicada).")
 
+                elif respuesta.get("status") == "ocupado":
+
+                    print(f"\n⏳ Servidor saturado, reintente en {respuesta.get('reintentar_en_ms', 0)} ms.")
+
                 elif respuesta.get("status") == "error":
 
                     print(f"\n❌ Error: {respuesta.get('message', '')}")
  
-                socket.close()
-
                 return respuesta
  
             except zmq.Again:
 
-                logger.warning(f"El servidor {ip_servidor} no respondió en el tiempo esperado, probando siguiente...")
-
-                socket.close()
+                logger.warning(f"El servidor {endpoint} no respondió en el tiempo esperado, probando siguiente...")
 
                 continue
 
             except zmq.ZMQError as e:
 
-                logger.error(f"Error de conexión con {ip_servidor}: {e}")
-
-                socket.close()
+                logger.error(f"Error de conexión con {endpoint}: {e}")
 
                 continue
 
@@ -160,8 +718,6 @@ class Facultad:
 
                 logger.error(f"Error inesperado: {e}")
 
-                socket.close()
-
                 continue
  
         print("\n⌛ Error: Ningún servidor respondió en el tiempo esperado.")
@@ -214,32 +770,70 @@ def solicitar_cantidad(tipo_recurso, maximo):
 
 def enviar_peticiones_a_facultad_balanceado(facultad_id, num_aulas, num_laboratorios):
     """
-    Función auxiliar para pruebas automáticas. Elige aleatoriamente entre Servidor Central y Backup.
-    No usa menú, ni input del usuario.
+    Función auxiliar para pruebas automáticas. Envía al primario vivo menos cargado según
+    el health check de cada servidor. No usa menú, ni input del usuario.
     """
-    import random
-    context = zmq.Context()
-    socket = context.socket(zmq.REQ)
-    socket.setsockopt(zmq.RCVTIMEO, TIMEOUT)
-
-    servidor = random.choice([IP_SERVIDOR_CENTRAL, IP_SERVIDOR_BACKUP])
+    solicitud = {
+        "uuid": str(uuid.uuid4()),
+        "facultad": FACULTADES.get(facultad_id, f"Facultad {facultad_id}"),
+        "num_salones": num_aulas,
+        "num_laboratorios": num_laboratorios
+    }
     try:
-        socket.connect(f"tcp://{servidor}:{PUERTO_SERVIDOR}")
-        solicitud = {
-            "uuid": str(uuid.uuid4()),
-            "facultad": FACULTADES.get(facultad_id, f"Facultad {facultad_id}"),
-            "num_salones": num_aulas,
-            "num_laboratorios": num_laboratorios
-        }
-        socket.send_json(solicitud)
-        respuesta = socket.recv_json()
+        respuesta = obtener_sesion().enviar(solicitud)
     except Exception as e:
-        respuesta = {"success": False, "error": str(e)}
-    finally:
-        socket.close()
-        context.term()
+        return {"success": False, "error": str(e)}
+    if respuesta is None:
+        return {"success": False, "error": "Ningún servidor respondió"}
+    return respuesta
+
+def enviar_lote_a_facultad(facultad_id, programas):
+    """
+    Función auxiliar para pruebas automáticas. Envía en un solo mensaje las solicitudes de todos
+    los programas [(aulas, laboratorios), ...] de una facultad y devuelve una respuesta por programa.
+    """
+    mensaje = mensaje_lote(FACULTADES.get(facultad_id, f"Facultad {facultad_id}"), programas)
+    respuesta = obtener_sesion().enviar(mensaje)
+    if respuesta is None:
+        return [{"success": False, "error": "Ningún servidor respondió"}] * len(programas)
+    return respuesta.get("resultados") or [respuesta] * len(programas)
+
+def consultar_reporte(semana=None):
+    """
+    Función auxiliar para pruebas automáticas. Devuelve el uso por facultad de una semana
+    del semestre (o de todo el semestre) sin afectar las reservas en curso.
+    """
+    respuesta = obtener_sesion().leer(mensaje_reporte(semana))
+    if respuesta is None:
+        return {"success": False, "error": "Ningún servidor respondió"}
+    return respuesta
 
+def consultar_disponibilidad(franja_inicio=None, franja_fin=None):
+    """
+    Función auxiliar para pruebas automáticas. Devuelve los salones y laboratorios libres
+    en las franjas pedidas, leídos de la réplica cuando está al día.
+    """
+    respuesta = obtener_sesion().leer(mensaje_disponibilidad(franja_inicio, franja_fin))
+    if respuesta is None:
+        return {"success": False, "error": "Ningún servidor respondió"}
     return respuesta
+
+def enviar_peticiones_a_facultad_broker(facultad_id, num_aulas, num_laboratorios):
+    """
+    Función auxiliar para pruebas automáticas. Envía la solicitud al broker, que la
+    entrega al servidor libre; el cliente no necesita saber cuál está activo.
+    """
+    endpoint = f"tcp://{IP_BROKER}:{PUERTO_BROKER}"
+    solicitud = {
+        "uuid": str(uuid.uuid4()),
+        "facultad": FACULTADES.get(facultad_id, f"Facultad {facultad_id}"),
+        "num_salones": num_aulas,
+        "num_laboratorios": num_laboratorios
+    }
+    try:
+        return obtener_sesion(endpoint).enviar_a(endpoint, solicitud)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
  
 if __name__ == "__main__":
 
@@ -255,6 +849,13 @@ if __name__ == "__main__":
  
         print(f"\nFacultad seleccionada: {facultad_nombre}")
 
+        disponibilidad = facultad.consultar_disponibilidad()
+
+        if disponibilidad and disponibilidad.get("status") == "success":
+
+            print(f"Disponibles todo el semestre: {disponibilidad['salones_disponibles']} aulas | "
+                  f"{disponibilidad['laboratorios_disponibles']} laboratorios")
+
         num_salones = solicitar_cantidad("aulas", MAX_AULAS)
 
         num_laboratorios = solicitar_cantidad("laboratorios", MAX_LABORATORIOS)
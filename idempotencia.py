@@ -0,0 +1,121 @@
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+
+CAPACIDAD_CACHE = 100000         # respuestas recientes guardadas en memoria
+ELEMENTOS_BLOOM = 1000000        # UUIDs esperados en el filtro de Bloom
+TASA_FALSOS_POSITIVOS = 0.01
+
+def validar_uuid(uuid):
+    """Devuelve el UUID de la solicitud; sin uno (texto no vacío) no hay deduplicación posible y se rechaza."""
+    if not isinstance(uuid, str) or not uuid:
+        raise ValueError(f"UUID de solicitud inválido: {uuid!r}")
+    return uuid
+
+def validar_facultad(facultad):
+    """Devuelve la facultad de la solicitud; sin ella la reserva no puede guardarse (uso_facultad la exige)."""
+    if not isinstance(facultad, str) or not facultad:
+        raise ValueError(f"Facultad de solicitud inválida: {facultad!r}")
+    return facultad
+
+def validar_lote(solicitudes):
+    """Comprueba todo el lote antes de asignar nada: una entrada mal formada a mitad del lote
+    dejaría marcados en el inventario los salones de las anteriores sin fila ni respuesta."""
+    if not isinstance(solicitudes, list) or not solicitudes:
+        raise ValueError("El lote no trae solicitudes.")
+    for i, solicitud in enumerate(solicitudes):
+        if not isinstance(solicitud, dict):
+            raise ValueError(f"La entrada {i} del lote no es una solicitud.")
+        validar_uuid(solicitud.get("uuid"))
+        validar_facultad(solicitud.get("facultad"))
+    return solicitudes
+
+def respuesta_duplicada(original):
+    """Respuesta para un UUID ya procesado: repite la asignación original."""
+    respuesta = dict(original)
+    respuesta["status"] = "duplicate"
+    respuesta["message"] = "Solicitud ya procesada anteriormente."
+    return respuesta
+
+class FiltroBloom:
+    """Filtro de Bloom sobre un bytearray con doble hashing (blake2b de 128 bits)."""
+
+    def __init__(self, elementos=ELEMENTOS_BLOOM, tasa_falsos=TASA_FALSOS_POSITIVOS):
+        self.num_bits = max(8, int(-elementos * math.log(tasa_falsos) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / elementos * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _posiciones(self, clave):
+        digest = hashlib.blake2b(clave.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def agregar(self, clave):
+        for pos in self._posiciones(clave):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, clave):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(clave))
+
+    def limpiar(self):
+        self.bits = bytearray(len(self.bits))
+
+class CacheIdempotencia:
+    """Caché LRU UUID -> respuesta original, respaldada por un filtro de Bloom.
+
+    Un acierto en el LRU se responde sin tocar la BD. Si el UUID no está en el
+    LRU y el filtro dice que nunca se vio, es nuevo con certeza; solo los
+    positivos del filtro (reales o falsos) consultan la BD con `cargar`.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_CACHE, elementos_bloom=ELEMENTOS_BLOOM,
+                 tasa_falsos=TASA_FALSOS_POSITIVOS):
+        self.capacidad = capacidad
+        self.respuestas = OrderedDict()
+        self.bloom = FiltroBloom(elementos_bloom, tasa_falsos)
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.consultas_bd = 0
+
+    def registrar(self, uuid, respuesta):
+        with self.lock:
+            self.respuestas[uuid] = respuesta
+            self.respuestas.move_to_end(uuid)
+            if len(self.respuestas) > self.capacidad:
+                self.respuestas.popitem(last=False)
+            self.bloom.agregar(uuid)
+
+    def buscar(self, uuid, cargar=None):
+        """Devuelve la respuesta original del UUID o None si es una solicitud nueva."""
+        with self.lock:
+            respuesta = self.respuestas.get(uuid)
+            if respuesta is not None:
+                self.respuestas.move_to_end(uuid)
+                self.aciertos += 1
+                return respuesta
+            if uuid not in self.bloom or cargar is None:
+                return None
+            self.consultas_bd += 1
+        respuesta = cargar(uuid)
+        if respuesta is not None:
+            self.registrar(uuid, respuesta)
+        return respuesta
+
+    def olvidar(self, uuid):
+        with self.lock:
+            self.respuestas.pop(uuid, None)
+
+    def limpiar(self):
+        with self.lock:
+            self.respuestas.clear()
+            self.bloom.limpiar()
+
+    def precargar(self, almacen):
+        """Carga todos los UUIDs en el filtro y las asignaciones más recientes en el LRU."""
+        with self.lock:
+            for (uuid,) in almacen.iterar_uuids():
+                self.bloom.agregar(uuid)
+        for uuid, respuesta in reversed(almacen.ultimas_asignaciones(self.capacidad)):
+            self.registrar(uuid, respuesta)
@@ -0,0 +1,153 @@
+import numpy as np
+
+NUM_SALONES = 450
+NUM_LABORATORIOS = 140
+SEMANAS = 16
+DIAS_POR_SEMANA = 6    # lunes a sábado
+FRANJAS_POR_DIA = 7    # bloques de 2 horas entre las 7:00 y las 21:00
+FRANJAS_POR_SEMANA = DIAS_POR_SEMANA * FRANJAS_POR_DIA
+NUM_FRANJAS = SEMANAS * FRANJAS_POR_SEMANA
+
+CAMPOS_ASIGNACION = ("franja_inicio", "franja_fin", "ids_salones", "ids_laboratorios")
+# Nombre de cada tipo de recurso en la tabla `inventario` y campo de la asignación con sus IDs
+RECURSOS = (("salon", "ids_salones"), ("laboratorio", "ids_laboratorios"))
+
+def asignacion_de(respuesta):
+    """Extrae la asignación (franjas e IDs) de una respuesta o evento que la incluye."""
+    return {campo: respuesta[campo] for campo in CAMPOS_ASIGNACION}
+
+def franja(semana, dia, bloque):
+    """Índice de la franja de un bloque (todo empieza en 0: semana 0, lunes = día 0, bloque de las 7:00 = 0)."""
+    return (semana * DIAS_POR_SEMANA + dia) * FRANJAS_POR_DIA + bloque
+
+def semanas(inicio, fin):
+    """Semanas del semestre que toca el rango de franjas [inicio, fin)."""
+    return range(inicio // FRANJAS_POR_SEMANA, (fin - 1) // FRANJAS_POR_SEMANA + 1)
+
+def empaquetar(franjas):
+    """Franjas ocupadas de un recurso (vector booleano) como bytes, un bit por franja."""
+    return np.packbits(franjas).tobytes()
+
+def desempaquetar(datos, num_franjas=NUM_FRANJAS):
+    """Inverso de `empaquetar`; sin datos, el recurso está libre en todas las franjas."""
+    if datos is None:
+        return np.zeros(num_franjas, dtype=bool)
+    return np.unpackbits(np.frombuffer(datos, dtype=np.uint8), count=num_franjas).astype(bool)
+
+class Ocupacion:
+    """Matriz booleana recurso × franja (True = ocupado) para un tipo de recurso."""
+
+    def __init__(self, num_recursos, num_franjas=NUM_FRANJAS):
+        self.ocupado = np.zeros((num_recursos, num_franjas), dtype=bool)
+
+    def libres(self, inicio, fin):
+        """IDs, en orden, de los recursos libres en todas las franjas de [inicio, fin)."""
+        return np.flatnonzero(~self.ocupado[:, inicio:fin].any(axis=1))
+
+    def ocupar(self, ids, inicio, fin):
+        self.ocupado[ids, inicio:fin] = True
+
+    def liberar(self, ids, inicio, fin):
+        self.ocupado[ids, inicio:fin] = False
+
+    def limpiar(self):
+        self.ocupado[:] = False
+
+class InventarioAulas:
+    """Ocupación de cada salón y laboratorio por franja del semestre.
+
+    Una asignación es un dict con `franja_inicio`, `franja_fin` (exclusiva),
+    `ids_salones` e `ids_laboratorios`. `asignar` elige siempre los IDs libres
+    más bajos, así que aplicar las mismas asignaciones en el mismo orden deja a
+    la réplica con la misma ocupación que el central. No es thread-safe: se usa
+    bajo el lock del servidor.
+    """
+
+    def __init__(self, num_salones=NUM_SALONES, num_laboratorios=NUM_LABORATORIOS, num_franjas=NUM_FRANJAS):
+        self.num_salones = num_salones
+        self.num_laboratorios = num_laboratorios
+        self.num_franjas = num_franjas
+        self.salones = Ocupacion(num_salones, num_franjas)
+        self.laboratorios = Ocupacion(num_laboratorios, num_franjas)
+        self.recursos = {"salon": self.salones, "laboratorio": self.laboratorios}
+
+    def rango(self, mensaje):
+        """Franjas [inicio, fin) pedidas en la solicitud; sin ellas, todo el semestre."""
+        inicio = mensaje.get("franja_inicio", 0)
+        fin = mensaje.get("franja_fin", self.num_franjas)
+        if not (isinstance(inicio, int) and isinstance(fin, int) and 0 <= inicio < fin <= self.num_franjas):
+            raise ValueError(f"Rango de franjas inválido: [{inicio}, {fin}) fuera de [0, {self.num_franjas})")
+        return inicio, fin
+
+    @staticmethod
+    def cantidades(mensaje):
+        """(salones, laboratorios) pedidos en la solicitud; ambos obligatorios y enteros no negativos."""
+        pedidos = (mensaje.get("num_salones"), mensaje.get("num_laboratorios"))
+        if not all(isinstance(n, int) and not isinstance(n, bool) and n >= 0 for n in pedidos):
+            raise ValueError(f"Cantidades inválidas: {pedidos[0]} salones y {pedidos[1]} laboratorios")
+        return pedidos
+
+    def asignar(self, num_salones, num_laboratorios, inicio, fin):
+        """Reserva hasta `num_salones` salones y `num_laboratorios` laboratorios libres en [inicio, fin)."""
+        asignacion = {
+            "franja_inicio": inicio,
+            "franja_fin": fin,
+            "ids_salones": self.salones.libres(inicio, fin)[:num_salones].tolist(),
+            "ids_laboratorios": self.laboratorios.libres(inicio, fin)[:num_laboratorios].tolist()
+        }
+        self.aplicar(asignacion)
+        return asignacion
+
+    def aplicar(self, asignacion):
+        """Marca como ocupados los IDs de una asignación ya decidida (p. ej. recibida por replicación)."""
+        inicio, fin = asignacion["franja_inicio"], asignacion["franja_fin"]
+        self.salones.ocupar(asignacion["ids_salones"], inicio, fin)
+        self.laboratorios.ocupar(asignacion["ids_laboratorios"], inicio, fin)
+
+    def liberar(self, asignacion):
+        inicio, fin = asignacion["franja_inicio"], asignacion["franja_fin"]
+        self.salones.liberar(asignacion["ids_salones"], inicio, fin)
+        self.laboratorios.liberar(asignacion["ids_laboratorios"], inicio, fin)
+
+    def disponibles(self, inicio=0, fin=None):
+        """(salones, laboratorios) libres en todas las franjas de [inicio, fin)."""
+        fin = self.num_franjas if fin is None else fin
+        return len(self.salones.libres(inicio, fin)), len(self.laboratorios.libres(inicio, fin))
+
+    def ocupacion(self):
+        """Fracción de celdas recurso × franja ocupadas (salones, laboratorios)."""
+        return float(self.salones.ocupado.mean()), float(self.laboratorios.ocupado.mean())
+
+    def limpiar(self):
+        self.salones.limpiar()
+        self.laboratorios.limpiar()
+
+    def cargar(self, reservas):
+        """Reconstruye la ocupación desde [(salones, laboratorios, asignación o None), ...] en orden de llegada.
+
+        Las reservas guardadas antes de existir el inventario no tienen IDs: se les
+        asigna de forma determinista todo el semestre, igual en central y réplica.
+        """
+        self.limpiar()
+        for salones, laboratorios, asignacion in reservas:
+            if asignacion is None:
+                self.asignar(salones, laboratorios, 0, self.num_franjas)
+            else:
+                self.aplicar(asignacion)
+
+    def filas(self):
+        """(recurso, id, franjas empaquetadas) de cada recurso con alguna franja ocupada."""
+        for recurso, ocupacion in self.recursos.items():
+            for id_recurso in np.flatnonzero(ocupacion.ocupado.any(axis=1)):
+                yield recurso, int(id_recurso), empaquetar(ocupacion.ocupado[id_recurso])
+
+    def cargar_filas(self, filas):
+        """Reconstruye la ocupación desde filas (recurso, id, franjas empaquetadas) como las de `filas()`."""
+        self.limpiar()
+        for recurso, id_recurso, franjas in filas:
+            self.recursos[recurso].ocupado[id_recurso] = desempaquetar(franjas, self.num_franjas)
+
+    def diferencias(self, otro):
+        """(recurso, id) cuya ocupación no coincide con la de `otro`."""
+        return [(recurso, int(id_recurso)) for recurso, ocupacion in self.recursos.items()
+                for id_recurso in np.flatnonzero((ocupacion.ocupado != otro.recursos[recurso].ocupado).any(axis=1))]
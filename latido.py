@@ -0,0 +1,156 @@
+import zmq
+import math
+import time
+import logging
+import threading
+from collections import deque
+from codec import codificar, decodificar
+
+logger = logging.getLogger("Latido")
+
+INTERVALO_LATIDO = 0.1    # segundos entre latidos del primario
+UMBRAL_PHI = 8.0          # sospecha a partir de la cual se declara caído (8 ≈ 1 falso positivo en 10^8)
+PAUSA_ACEPTABLE = 0.2     # segundos de silencio que se toleran además del intervalo medido (GC, picos de carga)
+DESVIACION_MINIMA = 0.05  # evita que unos latidos muy regulares vuelvan al detector hipersensible
+VENTANA_LATIDOS = 200     # intervalos recientes con los que se estima la distribución
+
+class EmisorLatidos:
+    """Publica un latido cada `intervalo` segundos en un PUB persistente.
+
+    A diferencia del PING/PONG, no se abre un socket por comprobación: los
+    monitores se suscriben una vez y solo escuchan. `estado()`, si se indica,
+    devuelve campos extra que viajan en cada latido (p. ej. la última secuencia
+    de replicación del primario).
+    """
+
+    def __init__(self, contexto, endpoint, intervalo=INTERVALO_LATIDO, estado=None):
+        self.intervalo = intervalo
+        self.estado = estado
+        self.socket = contexto.socket(zmq.PUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(endpoint)
+        threading.Thread(target=self._ciclo, daemon=True).start()
+
+    def _ciclo(self):
+        numero = 0
+        proximo = time.monotonic()
+        while True:
+            numero += 1
+            try:
+                latido = {"tipo": "latido", "n": numero, "intervalo": self.intervalo}
+                if self.estado:
+                    latido.update(self.estado())
+                self.socket.send(codificar(latido))
+            except zmq.ZMQError as e:
+                logger.error(f"Error publicando latido: {e}")
+            proximo += self.intervalo
+            time.sleep(max(0, proximo - time.monotonic()))
+
+class DetectorPhiAccrual:
+    """Detector de fallos adaptativo phi-accrual (Hayashibara et al.).
+
+    En vez de un sí/no tras N latidos perdidos, estima con los últimos
+    intervalos entre latidos (media y desviación) qué tan improbable es el
+    silencio actual: phi = -log10(P(el próximo latido llegue aún más tarde)).
+    Con latidos cada 0.1 s y los valores por defecto, phi supera 8 a los
+    ~0.6 s de silencio; en una red con más jitter el umbral se alcanza más tarde.
+    """
+
+    def __init__(self, intervalo_esperado=INTERVALO_LATIDO, ventana=VENTANA_LATIDOS,
+                 desviacion_minima=DESVIACION_MINIMA, pausa_aceptable=PAUSA_ACEPTABLE):
+        self.intervalo_esperado = intervalo_esperado
+        self.ventana = ventana
+        self.desviacion_minima = desviacion_minima
+        self.pausa_aceptable = pausa_aceptable
+        self.reiniciar()
+
+    def reiniciar(self, ahora=None):
+        """Vuelve a la estimación inicial contando `ahora` como el último latido."""
+        self.intervalos = deque(maxlen=self.ventana)
+        self.suma = 0.0
+        self.suma_cuadrados = 0.0
+        # Estimación inicial hasta tener intervalos medidos
+        self._registrar(self.intervalo_esperado - self.intervalo_esperado / 4)
+        self._registrar(self.intervalo_esperado + self.intervalo_esperado / 4)
+        self.ultimo = time.monotonic() if ahora is None else ahora
+
+    def _registrar(self, intervalo):
+        if len(self.intervalos) == self.intervalos.maxlen:
+            viejo = self.intervalos[0]
+            self.suma -= viejo
+            self.suma_cuadrados -= viejo * viejo
+        self.intervalos.append(intervalo)
+        self.suma += intervalo
+        self.suma_cuadrados += intervalo * intervalo
+
+    def latido(self, ahora=None):
+        ahora = time.monotonic() if ahora is None else ahora
+        self._registrar(ahora - self.ultimo)
+        self.ultimo = ahora
+
+    def phi(self, ahora=None):
+        ahora = time.monotonic() if ahora is None else ahora
+        n = len(self.intervalos)
+        media = self.suma / n
+        varianza = max(0.0, self.suma_cuadrados / n - media * media)
+        desviacion = max(math.sqrt(varianza), self.desviacion_minima)
+        z = (ahora - self.ultimo - media - self.pausa_aceptable) / desviacion
+        p_mas_tarde = 0.5 * math.erfc(z / math.sqrt(2))
+        return -math.log10(max(p_mas_tarde, 1e-300))
+
+class MonitorLatidos:
+    """Se suscribe a los latidos de `endpoint` y avisa cuando phi cruza el umbral.
+
+    `al_caer()` se llama una vez cuando phi supera `umbral`; `al_volver()` al
+    llegar el primer latido después de una caída. El monitor arranca como si
+    acabara de recibir un latido, así que un primario que nunca aparece
+    también se detecta. `ultimo_latido` guarda el contenido del último latido
+    recibido y `hora_ultimo_latido` cuándo llegó (time.time()).
+    """
+
+    def __init__(self, contexto, endpoint, al_caer, al_volver=None, umbral=UMBRAL_PHI, detector=None):
+        self.endpoint = endpoint
+        self.al_caer = al_caer
+        self.al_volver = al_volver
+        self.umbral = umbral
+        self.detector = detector or DetectorPhiAccrual()
+        self.caido = False
+        self.ultimo_latido = None
+        self.hora_ultimo_latido = None
+        self.socket = contexto.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.CONFLATE, 1)  # solo interesa el latido más reciente
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self.socket.connect(endpoint)
+        threading.Thread(target=self._ciclo, daemon=True).start()
+
+    def phi(self):
+        return self.detector.phi()
+
+    def _ciclo(self):
+        self.detector.reiniciar()
+        # Se evalúa phi varias veces por intervalo para que la detección no espere al siguiente poll
+        espera_ms = max(1, int(self.detector.intervalo_esperado * 1000 / 4))
+        while True:
+            try:
+                if self.socket.poll(espera_ms):
+                    self.ultimo_latido, _ = decodificar(self.socket.recv())
+                    self.hora_ultimo_latido = time.time()
+                    if self.caido:
+                        self.caido = False
+                        self.detector.reiniciar()
+                        logger.info(f"Latidos de {self.endpoint} restablecidos")
+                        if self.al_volver:
+                            self.al_volver()
+                    else:
+                        self.detector.latido()
+                elif not self.caido:
+                    phi = self.detector.phi()
+                    if phi > self.umbral:
+                        self.caido = True
+                        silencio = time.monotonic() - self.detector.ultimo
+                        logger.warning(f"Sin latidos de {self.endpoint} hace {silencio:.2f} s (phi={phi:.1f})")
+                        self.al_caer()
+            except Exception as e:
+                logger.error(f"Error en el monitor de latidos: {e}")
+                time.sleep(self.detector.intervalo_esperado)
@@ -0,0 +1,117 @@
+import threading
+from collections import deque
+
+VENTANA_LATENCIAS = 1000  # solicitudes recientes con las que se calculan los percentiles
+ALFA_SERVICIO = 0.05      # peso de cada muestra nueva en la media móvil (EWMA) del tiempo de servicio
+
+class VentanaLatencias:
+    """Últimas `ventana` latencias (segundos) y sus percentiles; thread-safe."""
+
+    def __init__(self, ventana=VENTANA_LATENCIAS):
+        self.lock = threading.Lock()
+        self.latencias = deque(maxlen=ventana)
+
+    def __len__(self):
+        return len(self.latencias)
+
+    def registrar(self, segundos):
+        with self.lock:
+            self.latencias.append(segundos)
+
+    def percentil(self, q):
+        """Percentil `q` (0..1) en segundos, o 0 si aún no hay muestras."""
+        with self.lock:
+            latencias = sorted(self.latencias)
+        if not latencias:
+            return 0.0
+        return latencias[min(len(latencias) - 1, int(len(latencias) * q))]
+
+class MetricasServidor:
+    """Carga reciente de un servidor: solicitudes en cola o en proceso, p99 de latencia y rechazos.
+
+    `entrada()` al recibir una solicitud y `salida(segundos, servicio)` al
+    responderla, con el tiempo total y el que estuvo ocupado un trabajador;
+    `rechazo()` por cada solicitud descartada sin atender, `expirada()` por
+    cada una descartada porque su plazo venció y `espera()` con lo que esperó
+    en cola cada una, todos por facultad. `estado()` es lo que el servidor
+    informa en su health check.
+    """
+
+    def __init__(self, ventana=VENTANA_LATENCIAS):
+        self.lock = threading.Lock()
+        self.en_cola = 0
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.expiradas = 0
+        self.latencias = VentanaLatencias(ventana)
+        self.servicio = None    # EWMA (s) de lo que tarda un trabajador en atender una solicitud
+        self.esperas = {}       # facultad -> VentanaLatencias del tiempo en cola
+        self.rechazadas_por_facultad = {}
+        self.expiradas_por_facultad = {}
+
+    def entrada(self):
+        with self.lock:
+            self.en_cola += 1
+
+    def salida(self, segundos, servicio=None):
+        with self.lock:
+            self.en_cola -= 1
+            self.atendidas += 1
+            if servicio is not None:
+                self.servicio = servicio if self.servicio is None else \
+                    self.servicio + ALFA_SERVICIO * (servicio - self.servicio)
+        self.latencias.registrar(segundos)
+
+    def rechazo(self, facultad=None):
+        with self.lock:
+            self.rechazadas += 1
+            self.rechazadas_por_facultad[facultad] = self.rechazadas_por_facultad.get(facultad, 0) + 1
+
+    def expirada(self, facultad=None, encolada=False):
+        """Cuenta una solicitud descartada por plazo; `encolada` si ya contaba en `en_cola` y no habrá `salida()`."""
+        with self.lock:
+            self.expiradas += 1
+            self.expiradas_por_facultad[facultad] = self.expiradas_por_facultad.get(facultad, 0) + 1
+            if encolada:
+                self.en_cola -= 1
+
+    def espera(self, facultad, segundos):
+        ventana = self.esperas.get(facultad)
+        if ventana is None:
+            with self.lock:
+                ventana = self.esperas.setdefault(facultad, VentanaLatencias())
+        ventana.registrar(segundos)
+
+    def por_facultad(self):
+        """{facultad: p50 y p99 del tiempo en cola (ms), rechazos y descartes por plazo}."""
+        with self.lock:
+            facultades = set(self.esperas) | set(self.rechazadas_por_facultad) | set(self.expiradas_por_facultad)
+            esperas = dict(self.esperas)
+            rechazadas = dict(self.rechazadas_por_facultad)
+            expiradas = dict(self.expiradas_por_facultad)
+        return {str(facultad): {
+            "espera_p50_ms": round(esperas[facultad].percentil(0.5) * 1000, 3) if facultad in esperas else 0.0,
+            "espera_p99_ms": round(esperas[facultad].percentil(0.99) * 1000, 3) if facultad in esperas else 0.0,
+            "rechazadas": rechazadas.get(facultad, 0),
+            "expiradas": expiradas.get(facultad, 0)
+        } for facultad in facultades}
+
+    def espera_estimada(self, trabajadores=1):
+        """Segundos que esperaría una solicitud nueva: las que ya están en cola o en proceso por el
+        tiempo medio de servicio, repartidas entre `trabajadores`.
+
+        Se basa en la capacidad medida y no en el ritmo de respuestas reciente, que tras un
+        rato de poca carga haría parecer larguísima cualquier ráfaga. Sin muestras, 0.
+        """
+        with self.lock:
+            if self.servicio is None:
+                return 0.0
+            return self.en_cola * self.servicio / trabajadores
+
+    def p99(self):
+        """p99 en segundos de las últimas solicitudes, o 0 si aún no hay ninguna."""
+        return self.latencias.percentil(0.99)
+
+    def estado(self):
+        return {"en_cola": self.en_cola, "p99_ms": round(self.p99() * 1000, 3), "atendidas": self.atendidas,
+                "rechazadas": self.rechazadas, "expiradas": self.expiradas, "por_facultad": self.por_facultad()}
@@ -0,0 +1,93 @@
+import time
+from collections import deque
+
+QUANTUM_DRR = 20  # unidades de costo (salones + laboratorios pedidos) que recibe una cola de peso 1 por ronda
+MARGEN_PLAZO = 0.1  # segundos de tolerancia por diferencias de reloj entre cliente y servidor
+
+def plazo_vencido(mensaje, margen=MARGEN_PLAZO):
+    """True si el cliente ya dejó de esperar la solicitud: su `plazo` (epoch, reloj del cliente) pasó hace más de `margen`."""
+    plazo = mensaje.get("plazo") if isinstance(mensaje, dict) else None
+    return isinstance(plazo, (int, float)) and plazo + margen < time.time()
+
+class PlanificadorDRR:
+    """Colas por clave (facultad) atendidas con Deficit Round Robin.
+
+    En cada ronda, cada cola con trabajo suma `quantum × peso` a su déficit y
+    despacha mientras el costo de su primer elemento quepa en él. Una facultad
+    con ráfagas solo alarga su propia cola: las demás siguen recibiendo su
+    parte en proporción a su peso. No es thread-safe: lo usa solo el hilo del proxy.
+    """
+
+    def __init__(self, quantum=QUANTUM_DRR, pesos=None):
+        self.quantum = quantum
+        self.pesos = pesos or {}
+        self.colas = {}          # clave -> deque de (costo, elemento)
+        self.deficit = {}
+        self.activas = deque()   # claves con elementos, en orden de ronda
+        self.en_turno = False    # si la clave al frente ya recibió su quantum en esta ronda
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def pendientes(self, clave):
+        cola = self.colas.get(clave)
+        return len(cola) if cola else 0
+
+    def encolar(self, clave, elemento, costo=1):
+        cola = self.colas.get(clave)
+        if cola is None:
+            cola = self.colas[clave] = deque()
+        if not cola:
+            self.activas.append(clave)
+            self.deficit[clave] = 0
+        cola.append((costo, elemento))
+        self.total += 1
+
+    def siguiente(self):
+        """(clave, elemento) que toca despachar, o None si no hay nada en cola."""
+        while self.activas:
+            clave = self.activas[0]
+            if not self.en_turno:
+                self.deficit[clave] += self.quantum * self.pesos.get(clave, 1)
+                self.en_turno = True
+            cola = self.colas[clave]
+            costo, elemento = cola[0]
+            if costo <= self.deficit[clave]:
+                cola.popleft()
+                self.total -= 1
+                self.deficit[clave] -= costo
+                if not cola:
+                    # Una cola que se vacía no guarda déficit para la próxima ráfaga
+                    self.activas.popleft()
+                    self.deficit[clave] = 0
+                    self.en_turno = False
+                return clave, elemento
+            self.activas.rotate(-1)
+            self.en_turno = False
+        return None
+
+class CubetaTokens:
+    """Limitador de ritmo: `ritmo` tokens por segundo con ráfagas de hasta `rafaga`."""
+
+    def __init__(self, ritmo, rafaga):
+        self.ritmo = ritmo
+        self.rafaga = rafaga
+        self.tokens = rafaga
+        self.ultimo = time.monotonic()
+
+    def _recargar(self, ahora):
+        self.tokens = min(self.rafaga, self.tokens + (ahora - self.ultimo) * self.ritmo)
+        self.ultimo = ahora
+
+    def tomar(self):
+        """True si había un token (y lo consume); False si la solicitud excede el ritmo."""
+        self._recargar(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def espera(self):
+        """Segundos hasta que haya un token disponible."""
+        return max(0.0, (1 - self.tokens) / self.ritmo)
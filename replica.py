@@ -1,11 +1,19 @@
 import zmq
 import threading
-import sqlite3
 import logging
 import time
 from tabulate import tabulate
 import os
 import sys
+from database import AlmacenReservas, fila_reserva, pedir_filtros_registros, verificar_inventario
+from broker import TrabajadorBroker, PUERTO_BACKEND
+from idempotencia import CacheIdempotencia, respuesta_duplicada, validar_uuid, validar_facultad, validar_lote
+from replicacion import descargar_snapshot
+from codec import codificar, decodificar, decodificar_solicitud, CODEC_JSON
+from inventario import InventarioAulas, asignacion_de
+from latido import MonitorLatidos, DetectorPhiAccrual
+from metricas import MetricasServidor
+from planificador import plazo_vencido
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,225 +29,366 @@ logger = logging.getLogger("ServidorReplica")
 NUM_SALONES = 450
 NUM_LABORATORIOS = 140
 PUERTO_SOLICITUDES = 5555
+PUERTO_SOLICITUDES_CENTRAL = 5555  # adonde se redirige a los clientes mientras la réplica está en STANDBY
+LECTURAS = ("disponibilidad", "reporte")  # tipos de solicitud que la réplica atiende también en STANDBY
 PUERTO_HEALTHCHECK = 5557
 PUERTO_SYNC = 5556
+PUERTO_SNAPSHOT = 5558  # en el servidor central
 DB_NAME = "aulas_replica.db"
-HEARTBEAT_INTERVAL = 3
-HEARTBEAT_TIMEOUT = 5
-MAX_FAILED_HEARTBEATS = 3
+PUERTO_LATIDOS = 5559      # en el servidor central
+INTERVALO_LATIDO = 0.1     # debe coincidir con el del central
+UMBRAL_PHI = 8.0           # sospecha phi a partir de la cual se toma el control
+PAUSA_ACEPTABLE = 0.2      # silencio extra tolerado; con los valores por defecto el failover tarda ~0.6 s
 IP_SERVIDOR_CENTRAL = "10.43.96.52"
+SQLITE_SYNCHRONOUS = "FULL"
+IP_BROKER = None  # IP de la máquina con broker.py; None para no registrarse en el broker
+NUM_TRABAJADORES_BROKER = 4
+MAX_FRAMES_SYNC = 64      # frames del canal de replicación que se aplican juntos
+UMBRAL_SNAPSHOT = 100000  # eventos de atraso a partir de los cuales conviene un snapshot
+TAM_PAGINA = 20           # registros por página en el menú
 
 class ServidorReplica:
     def __init__(self):
-        self.salones_disponibles = NUM_SALONES
-        self.laboratorios_disponibles = NUM_LABORATORIOS
+        self.inventario = InventarioAulas(NUM_SALONES, NUM_LABORATORIOS)
         self.lock = threading.Lock()
         self.activo = False
-        self.failed_heartbeats = 0
+        self.monitor = None
+        self.metricas = MetricasServidor()
         self.contexto = zmq.Context()
 
         self.solicitudes_socket = self.contexto.socket(zmq.REP)
         self.solicitudes_socket.bind(f"tcp://*:{PUERTO_SOLICITUDES}")
 
-        self.sync_socket = self.contexto.socket(zmq.REP)
+        self.sync_socket = self.contexto.socket(zmq.ROUTER)
         self.sync_socket.bind(f"tcp://*:{PUERTO_SYNC}")
 
         self.healthcheck_socket = self.contexto.socket(zmq.REP)
         self.healthcheck_socket.bind(f"tcp://*:{PUERTO_HEALTHCHECK}")
 
+        self.almacen = AlmacenReservas(DB_NAME, synchronous=SQLITE_SYNCHRONOUS)
         self._inicializar_db()
+        self.cache = CacheIdempotencia()
+        self.cache.precargar(self.almacen)
+        self.ultimo_seq = self.almacen.leer_estado("ultimo_seq", 0)
         logger.info("Servidor Réplica iniciado en modo STANDBY")
 
     def _inicializar_db(self):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS solicitudes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    uuid TEXT UNIQUE,
-                    facultad TEXT,
-                    salones_asignados INTEGER,
-                    laboratorios_asignados INTEGER,
-                    fecha DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            cursor.execute("SELECT SUM(salones_asignados), SUM(laboratorios_asignados) FROM solicitudes")
-            total = cursor.fetchone()
-            if total and total[0]:
-                self.salones_disponibles -= total[0]
-                self.laboratorios_disponibles -= total[1]
-
-    def health_check(self):
-        while True:
-            try:
-                if self.activo:
-                    if self._verificar_central_activo():
-                        logger.info("Central recuperado, volviendo a modo STANDBY")
-                        self.activo = False
-                        self.failed_heartbeats = 0
-                    time.sleep(HEARTBEAT_INTERVAL)
-                    continue
-                if not self._verificar_central_activo():
-                    self.failed_heartbeats += 1
-                    logger.warning(f"Heartbeat fallido ({self.failed_heartbeats}/{MAX_FAILED_HEARTBEATS})")
-                    if self.failed_heartbeats >= MAX_FAILED_HEARTBEATS:
-                        self.activar_replica()
-                else:
-                    self.failed_heartbeats = 0
-                time.sleep(HEARTBEAT_INTERVAL)
-            except Exception as e:
-                logger.error(f"Error en health_check: {str(e)}")
-                time.sleep(HEARTBEAT_INTERVAL)
+        self.almacen.crear_tabla()
+        self._cargar_inventario()
 
-    def _verificar_central_activo(self):
-        socket = self.contexto.socket(zmq.REQ)
-        socket.setsockopt(zmq.LINGER, 0)
-        socket.setsockopt(zmq.RCVTIMEO, HEARTBEAT_TIMEOUT * 1000)
-        try:
-            socket.connect(f"tcp://{IP_SERVIDOR_CENTRAL}:{PUERTO_HEALTHCHECK}")
-            socket.send_string("PING")
-            reply = socket.recv_string()
-            return reply == "PONG"
-        except:
-            return False
-        finally:
-            socket.close()
+    def _cargar_inventario(self):
+        self.inventario.cargar_filas(self.almacen.leer_inventario())
+
+    def vigilar_central(self):
+        """Sigue los latidos del central; el detector phi-accrual decide cuándo tomar el control."""
+        detector = DetectorPhiAccrual(INTERVALO_LATIDO, pausa_aceptable=PAUSA_ACEPTABLE)
+        self.monitor = MonitorLatidos(self.contexto, f"tcp://{IP_SERVIDOR_CENTRAL}:{PUERTO_LATIDOS}",
+                                      self.activar_replica, self.volver_a_standby, UMBRAL_PHI, detector)
 
     def activar_replica(self):
         if not self.activo:
             self.activo = True
-            self.failed_heartbeats = 0
             logger.warning("¡FALLOVER ACTIVADO! Este servidor ahora es primario")
             print("\n¡ATENCIÓN! Este servidor ha tomado el control como primario")
 
+    def volver_a_standby(self):
+        if self.activo:
+            logger.info("Central recuperado, volviendo a modo STANDBY")
+            self.activo = False
+
+    def _asignar(self, mensaje):
+        """Asigna una solicitud con self.lock tomado; devuelve (respuesta, fila a insertar o None)."""
+        try:
+            uuid = validar_uuid(mensaje.get("uuid"))
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, None
+        original = self.cache.buscar(uuid, self.almacen.buscar_asignacion)
+        if original is not None:
+            return respuesta_duplicada(original), None
+        try:
+            facultad = validar_facultad(mensaje.get("facultad"))
+            inicio, fin = self.inventario.rango(mensaje)
+            num_salones, num_labs = self.inventario.cantidades(mensaje)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, None
+        asignacion = self.inventario.asignar(num_salones, num_labs, inicio, fin)
+        salones = len(asignacion["ids_salones"])
+        labs = len(asignacion["ids_laboratorios"])
+        salones_restantes, labs_restantes = self.inventario.disponibles(inicio, fin)
+
+        respuesta = {
+            "status": "success" if (salones == num_salones and labs == num_labs) else "partial",
+            "salones_asignados": salones,
+            "laboratorios_asignados": labs,
+            "salones_restantes": salones_restantes,
+            "laboratorios_restantes": labs_restantes
+        }
+        respuesta.update(asignacion)
+        return respuesta, fila_reserva(uuid, facultad, salones, labs, None, asignacion)
+
+    def frescura(self):
+        """Cota de cuán atrasado está el estado local respecto del primario.
+
+        `seq_primario` es la última secuencia que anunció el central en sus
+        latidos y `antiguedad_s` cuánto hace de ese latido: la lectura incluye
+        todo lo que el central había confirmado hasta entonces salvo
+        `retraso_eventos` eventos. Como primario, la réplica está al día.
+        """
+        latido = self.monitor.ultimo_latido if self.monitor else None
+        if self.activo or latido is None or "seq" not in latido:
+            seq_primario = self.ultimo_seq
+            antiguedad = 0.0 if self.activo else None
+        else:
+            # Lo ya aplicado aquí también lo tenía el central, aunque el latido sea anterior
+            seq_primario = max(latido["seq"], self.ultimo_seq)
+            antiguedad = round(time.time() - self.monitor.hora_ultimo_latido, 3)
+        return {
+            "seq": self.ultimo_seq,
+            "seq_primario": seq_primario,
+            "retraso_eventos": max(0, seq_primario - self.ultimo_seq),
+            "antiguedad_s": antiguedad
+        }
+
+    def consultar_disponibilidad(self, mensaje):
+        """Salones y laboratorios libres en las franjas pedidas según el estado replicado, sin reservar nada."""
+        try:
+            inicio, fin = self.inventario.rango(mensaje)
+        except ValueError as e:
+            return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        with self.lock:
+            salones, laboratorios = self.inventario.disponibles(inicio, fin)
+            frescura = self.frescura()
+        return dict({
+            "status": "success",
+            "uuid": mensaje.get("uuid"),
+            "franja_inicio": inicio,
+            "franja_fin": fin,
+            "salones_disponibles": salones,
+            "laboratorios_disponibles": laboratorios
+        }, **frescura)
+
+    def procesar_solicitud(self, mensaje):
+        # Aquí y no en _atender: también llegan solicitudes por los trabajadores del broker
+        if plazo_vencido(mensaje):
+            # El cliente ya dejó de esperar (p. ej. encolada justo durante la promoción):
+            # asignarla solo gastaría salones en una respuesta que nadie lee
+            self.metricas.expirada(mensaje.get("facultad"))
+            return {"status": "expirada", "message": "El plazo de la solicitud venció.", "uuid": mensaje.get("uuid")}
+        if mensaje.get("tipo") == "disponibilidad":
+            return self.consultar_disponibilidad(mensaje)
+        if mensaje.get("tipo") == "reporte":
+            return self.reporte_uso(mensaje)
+        if mensaje.get("tipo") == "lote":
+            return self.procesar_lote(mensaje)
+        with self.lock:
+            respuesta, fila = self._asignar(mensaje)
+            if fila:
+                self.almacen.insertar_solicitudes([fila])
+                self.cache.registrar(mensaje["uuid"], respuesta)
+        return dict(respuesta, uuid=mensaje.get("uuid"))
+
+    def reporte_uso(self, mensaje):
+        try:
+            facultades = self.almacen.uso_por_facultad(mensaje.get("semana"))
+        except ValueError as e:
+            return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        return dict({"status": "success", "uuid": mensaje.get("uuid"), "semana": mensaje.get("semana"),
+                     "facultades": facultades}, **self.frescura())
+
+    def procesar_lote(self, mensaje):
+        """Atiende un lote de solicitudes con una sola toma del lock y una sola transacción."""
+        try:
+            validar_lote(mensaje.get("solicitudes"))
+        except ValueError as e:
+            return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        resultados = []
+        nuevas = {}  # uuid -> respuesta, también para repeticiones dentro del mismo lote
+        filas = []
+        with self.lock:
+            for solicitud in mensaje["solicitudes"]:
+                if solicitud["uuid"] in nuevas:
+                    respuesta, fila = respuesta_duplicada(nuevas[solicitud["uuid"]]), None
+                else:
+                    respuesta, fila = self._asignar(solicitud)
+                resultados.append(dict(respuesta, uuid=solicitud["uuid"]))
+                if fila:
+                    nuevas[solicitud["uuid"]] = respuesta
+                    filas.append(fila)
+            self.almacen.insertar_solicitudes(filas)
+            for uuid, respuesta in nuevas.items():
+                self.cache.registrar(uuid, respuesta)
+        completo = all(r["status"] in ("success", "duplicate") for r in resultados)
+        return {"status": "success" if completo else "partial", "uuid": mensaje.get("uuid"), "resultados": resultados}
+
+    def _redireccion(self, mensaje):
+        return {
+            "status": "redirect",
+            "message": "La réplica está en STANDBY; envíe la solicitud al servidor primario.",
+            "primario": f"tcp://{IP_SERVIDOR_CENTRAL}:{PUERTO_SOLICITUDES_CENTRAL}",
+            "uuid": mensaje.get("uuid")
+        }
+
+    def _atender(self, mensaje):
+        # En STANDBY también se atiende el socket: las lecturas se responden con el estado
+        # replicado y las escrituras reciben al instante una redirección al primario.
+        if not self.activo and mensaje.get("tipo") not in LECTURAS:
+            return self._redireccion(mensaje)
+        return self.procesar_solicitud(mensaje)
+
     def manejar_solicitudes(self):
         while True:
+            mensaje, codec = {}, CODEC_JSON
             try:
-                if not self.activo:
-                    time.sleep(1)
-                    continue
-
-                mensaje = self.solicitudes_socket.recv_json()
-                uuid = mensaje["uuid"]
-
-                with self.lock:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT id FROM solicitudes WHERE uuid = ?", (uuid,))
-                        if cursor.fetchone():
-                            respuesta = {
-                                "status": "duplicate",
-                                "message": "Solicitud ya procesada anteriormente.",
-                                "salones_asignados": 0,
-                                "laboratorios_asignados": 0
-                            }
-                            self.solicitudes_socket.send_json(respuesta)
-                            continue
-                        salones = min(mensaje["num_salones"], self.salones_disponibles)
-                        labs = min(mensaje["num_laboratorios"], self.laboratorios_disponibles)
-                        self.salones_disponibles -= salones
-                        self.laboratorios_disponibles -= labs
-                        cursor.execute("""
-                            INSERT INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados)
-                            VALUES (?, ?, ?, ?)
-                        """, (uuid, mensaje["facultad"], salones, labs))
-                        conn.commit()
-
-                respuesta = {
-                    "status": "success" if (salones == mensaje["num_salones"] and labs == mensaje["num_laboratorios"]) else "partial",
-                    "salones_asignados": salones,
-                    "laboratorios_asignados": labs,
-                    "salones_restantes": self.salones_disponibles,
-                    "laboratorios_restantes": self.laboratorios_disponibles
-                }
-
-                self.solicitudes_socket.send_json(respuesta)
+                mensaje, codec = decodificar_solicitud(self.solicitudes_socket.recv())
+                llegada = time.monotonic()
+                self.metricas.entrada()
+                try:
+                    respuesta = self._atender(mensaje)
+                finally:
+                    self.metricas.salida(time.monotonic() - llegada)
+                self.solicitudes_socket.send(codificar(respuesta, codec))
                 logger.info(f"Respuesta enviada: {respuesta}")
 
             except Exception as e:
                 logger.error(f"Error manejando solicitud: {str(e)}")
                 try:
-                    self.solicitudes_socket.send_json({"status": "error", "message": str(e)})
+                    self.solicitudes_socket.send(codificar({"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}, codec))
                 except:
                     pass
 
     def recibir_sincronizaciones(self):
+        """Drena los frames pendientes del canal de replicación, los aplica en una sola transacción y confirma con un ack acumulativo."""
         while True:
             try:
-                mensaje = self.sync_socket.recv_json()
-
-                if mensaje.get("tipo") == "borrado_total":
-                    logger.info("Recibida notificación de borrado total")
-                    self._procesar_borrado_total()
-                    self.sync_socket.send_json({"status": "ok"})
-                elif mensaje.get("tipo") == "borrado_registro":
-                    logger.info(f"Recibida notificación de borrado de registro {mensaje.get('id')}")
-                    self._procesar_borrado_registro(mensaje.get("id"))
-                    self.sync_socket.send_json({"status": "ok"})
-                else:
-                    logger.info(f"Recibiendo sincronización: {mensaje}")
-                    self._procesar_reserva(mensaje)
-                    self.sync_socket.send_json({"status": "ok"})
-
+                frames = [self.sync_socket.recv_multipart()]
+                while len(frames) < MAX_FRAMES_SYNC and self.sync_socket.poll(0):
+                    frames.append(self.sync_socket.recv_multipart())
+
+                eventos = []
+                respuestas = {}
+                codecs = {}
+                for identidad, payload in frames:
+                    mensaje, codecs[identidad] = decodificar(payload)
+                    if mensaje.get("tipo") == "snapshot_requerido":
+                        respuestas[identidad] = self._cargar_snapshot()
+                    elif mensaje.get("tipo") == "hola":
+                        respuestas[identidad] = self._responder_hola(mensaje["ultimo"])
+                    else:
+                        eventos.extend(mensaje["eventos"])
+                        respuestas[identidad] = None
+                if eventos:
+                    ack = self._aplicar_eventos(eventos)
+                    for identidad, respuesta in respuestas.items():
+                        if respuesta is None or not respuesta.get("reenviar"):
+                            respuestas[identidad] = ack
+                for identidad, respuesta in respuestas.items():
+                    self.sync_socket.send_multipart([identidad, codificar(respuesta, codecs[identidad])])
             except Exception as e:
                 logger.error(f"Error en sincronización: {str(e)}")
-                try:
-                    self.sync_socket.send_json({"status": "error", "message": str(e)})
-                except:
-                    pass
 
-    def _procesar_reserva(self, reserva):
-        with self.lock:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM solicitudes WHERE uuid = ?", (reserva["uuid"],))
-                if cursor.fetchone():
-                    logger.info("Solicitud duplicada recibida en sincronización, ignorando (UUID ya existe)")
-                    return
-                cursor.execute("""
-                    INSERT INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados, fecha)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (reserva["uuid"], reserva["facultad"], reserva["salones_asignados"], reserva["laboratorios_asignados"], reserva["fecha"]))
-                conn.commit()
-            self.salones_disponibles -= reserva["salones_asignados"]
-            self.laboratorios_disponibles -= reserva["laboratorios_asignados"]
-
-    def _procesar_borrado_total(self):
+    def _responder_hola(self, ultimo_central):
+        if ultimo_central < self.ultimo_seq:
+            logger.error(f"El log del central termina en {ultimo_central} y la réplica está en {self.ultimo_seq}; "
+                         "se continúa desde el central")
+            self._guardar_seq(ultimo_central)
+        if ultimo_central - self.ultimo_seq > UMBRAL_SNAPSHOT:
+            return self._cargar_snapshot()
+        if ultimo_central > self.ultimo_seq:
+            # Pide solo el sufijo que falta: "todo después de ultimo_seq"
+            logger.info(f"Réplica atrasada ({self.ultimo_seq}/{ultimo_central}), pidiendo ponerse al día")
+            return {"tipo": "ack", "seq": self.ultimo_seq, "reenviar": True}
+        return {"tipo": "ack", "seq": self.ultimo_seq}
+
+    def _cargar_snapshot(self):
+        """Reemplaza la BD local por una copia del central y pide solo lo posterior a ella."""
+        if self.activo:
+            # Actuando como primario sus propios datos mandan; no se sobrescriben
+            return {"tipo": "ack", "seq": self.ultimo_seq}
+        logger.info("Descargando snapshot del servidor central...")
+        inicio = time.time()
         with self.lock:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT SUM(salones_asignados), SUM(laboratorios_asignados) FROM solicitudes")
-                total = cursor.fetchone()
-                cursor.execute("DELETE FROM solicitudes")
-                conn.commit()
-                if total and total[0]:
-                    self.salones_disponibles += total[0]
-                    self.laboratorios_disponibles += total[1]
+            seq, filas = descargar_snapshot(self.contexto, f"tcp://{IP_SERVIDOR_CENTRAL}:{PUERTO_SNAPSHOT}", self.almacen)
+            self.ultimo_seq = seq
+            self._cargar_inventario()
+            self.cache.limpiar()
+            self.cache.precargar(self.almacen)
+        logger.info(f"Snapshot cargado: {filas} filas hasta seq {seq} en {time.time() - inicio:.1f} s")
+        return {"tipo": "ack", "seq": self.ultimo_seq, "reenviar": True}
+
+    def _guardar_seq(self, seq):
+        self.ultimo_seq = seq
+        self.almacen.guardar_estado("ultimo_seq", seq)
+
+    def _aplicar_eventos(self, eventos):
+        nuevos = []
+        respuesta = None
+        for evento in eventos:
+            seq = evento["seq"]
+            siguiente = nuevos[-1]["seq"] + 1 if nuevos else self.ultimo_seq + 1
+            if seq < siguiente:
+                continue
+            if seq > siguiente:
+                logger.warning(f"Hueco en la replicación tras seq {siguiente - 1}, pidiendo reenvío")
+                respuesta = {"reenviar": True}
+                break
+            nuevos.append(evento)
+
+        if nuevos:
+            seq = nuevos[-1]["seq"]
+            exacto = self.almacen.aplicar_replicacion(nuevos, seq)
+            with self.lock:
+                self.ultimo_seq = seq
+                if exacto and self._replicar_inventario(nuevos):
+                    self._actualizar_cache(nuevos)
                 else:
-                    self.salones_disponibles = NUM_SALONES
-                    self.laboratorios_disponibles = NUM_LABORATORIOS
-            logger.info("Borrado total completado por notificación del central")
+                    # Alguna reserva ya estaba (p. ej. escrita aquí durante un failover) o el
+                    # evento no trae IDs: se reconstruye desde la tabla, ya al día con el lote
+                    self._cargar_inventario()
+                    self.cache.limpiar()
+                    self.cache.precargar(self.almacen)
+            logger.info(f"Aplicados {len(nuevos)} eventos de replicación hasta seq {seq}")
+        return dict({"tipo": "ack", "seq": self.ultimo_seq}, **(respuesta or {}))
+
+    def _replicar_inventario(self, eventos):
+        """Repite en el inventario las asignaciones del central; False si algún evento no trae los IDs."""
+        for evento in eventos:
+            if evento["tipo"] in ("reserva", "reservas"):
+                for reserva in evento.get("reservas", [evento]):
+                    if "ids_salones" not in reserva:
+                        return False
+                    self.inventario.aplicar(reserva)
+            elif evento["tipo"] == "borrado_registro":
+                if not evento.get("asignacion"):
+                    return False
+                self.inventario.liberar(evento["asignacion"])
+            else:
+                self.inventario.limpiar()
+        return True
+
+    def _actualizar_cache(self, eventos):
+        for evento in eventos:
+            if evento["tipo"] in ("reserva", "reservas"):
+                for reserva in evento.get("reservas", [evento]):
+                    self.cache.registrar(reserva["uuid"], dict(
+                        asignacion_de(reserva),
+                        salones_asignados=reserva["salones_asignados"],
+                        laboratorios_asignados=reserva["laboratorios_asignados"]
+                    ))
+            elif evento["tipo"] == "borrado_registro":
+                self.cache.olvidar(evento["uuid"])
+            else:
+                self.cache.limpiar()
 
-    def _procesar_borrado_registro(self, id_registro):
-        with self.lock:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT salones_asignados, laboratorios_asignados FROM solicitudes WHERE id = ?", (id_registro,))
-                resultado = cursor.fetchone()
-                if resultado:
-                    cursor.execute("DELETE FROM solicitudes WHERE id = ?", (id_registro,))
-                    conn.commit()
-                    self.salones_disponibles += resultado[0]
-                    self.laboratorios_disponibles += resultado[1]
-                    logger.info(f"Registro {id_registro} borrado por notificación del central")
+    def salud(self):
+        """Lo que responde el health check: rol, solicitudes en cola y p99 reciente."""
+        return dict(self.metricas.estado(), rol="primario" if self.activo else "standby", seq=self.ultimo_seq)
 
     def health_check_server(self):
-        """Responde a health checks cuando está activo como primario."""
+        """Responde a health checks con el rol y la carga; en STANDBY los clientes no le envían escrituras."""
         while True:
             try:
-                msg = self.healthcheck_socket.recv_string()
-                if msg == "PING":
-                    self.healthcheck_socket.send_string("PONG")
+                self.healthcheck_socket.recv()
+                self.healthcheck_socket.send(codificar(self.salud()))
             except Exception as e:
                 logger.error(f"Error en health check server: {str(e)}")
 
@@ -248,14 +397,17 @@ class ServidorReplica:
             print("\n" + "="*50)
             print(" MENÚ DEL SERVIDOR RÉPLICA ".center(50))
             print("="*50)
-            estado = "ACTIVO (Primario)" if self.activo else f"STANDBY (Fallos: {self.failed_heartbeats}/{MAX_FAILED_HEARTBEATS})"
+            estado = "ACTIVO (Primario)" if self.activo else f"STANDBY (phi del central: {self.monitor.phi() if self.monitor else 0:.1f}/{UMBRAL_PHI})"
             print(f"Estado: {estado}")
+            if self.metricas.expiradas:
+                print(f"Solicitudes descartadas por plazo vencido: {self.metricas.expiradas}")
             print("1. Mostrar registros")
             if self.activo:
                 print("2. Borrar registro")
                 print("3. Borrar todo")
             print("4. Ver estado")
-            print("5. Salir")
+            print("5. Verificar inventario")
+            print("6. Salir")
             print("="*50)
 
             try:
@@ -270,6 +422,8 @@ class ServidorReplica:
                 elif opcion == "4":
                     self.mostrar_estado()
                 elif opcion == "5":
+                    self.verificar_inventario()
+                elif opcion == "6":
                     logger.info("Apagando servidor réplica...")
                     os._exit(0)
                 else:
@@ -280,45 +434,54 @@ class ServidorReplica:
                 print(f"Error: {str(e)}")
 
     def mostrar_registros(self):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM solicitudes ORDER BY fecha DESC")
-            registros = cursor.fetchall()
-            if registros:
-                print("\n" + "="*80)
-                print("REGISTROS DE RESERVAS".center(80))
-                print("="*80)
-                print(tabulate(
-                    registros,
-                    headers=["ID", "UUID", "Facultad", "Labs", "Laboratorios", "Fecha"],
-                    tablefmt="grid"
-                ))
-                print(f"\nTotal: {len(registros)} registros")
-            else:
-                print("\nNo hay registros en la base de datos")
-            self.mostrar_estado()
+        try:
+            filtros = pedir_filtros_registros()
+        except ValueError:
+            print("\nFecha inválida, use el formato AAAA-MM-DD")
+            return
+        mostrados = 0
+        for numero, pagina in enumerate(self.almacen.iterar_paginas(TAM_PAGINA, **filtros), 1):
+            mostrados += len(pagina)
+            print("\n" + "="*80)
+            print(f"REGISTROS DE RESERVAS (página {numero})".center(80))
+            print("="*80)
+            print(tabulate(
+                pagina,
+                headers=["ID", "UUID", "Facultad", "Labs", "Laboratorios", "Fecha",
+                         "Franja inicio", "Franja fin", "IDs salones", "IDs laboratorios"],
+                tablefmt="grid"
+            ))
+            print(f"\nMostrados: {mostrados} registros")
+            if len(pagina) == TAM_PAGINA and input("Enter = página siguiente, q = terminar: ").strip().lower() == "q":
+                break
+        if not mostrados:
+            print("\nNo hay registros en la base de datos")
+        self.mostrar_estado()
 
     def mostrar_estado(self):
-        print(f"\nSalones disponibles: {self.salones_disponibles}/{NUM_SALONES}")
-        print(f"Laboratorios disponibles: {self.laboratorios_disponibles}/{NUM_LABORATORIOS}")
+        salones, labs = self.inventario.disponibles()
+        ocupacion_salones, ocupacion_labs = self.inventario.ocupacion()
+        print(f"\nSalones libres todo el semestre: {salones}/{NUM_SALONES} (ocupación {ocupacion_salones:.1%})")
+        print(f"Laboratorios libres todo el semestre: {labs}/{NUM_LABORATORIOS} (ocupación {ocupacion_labs:.1%})")
         print(f"Estado: {'ACTIVO (Primario)' if self.activo else 'STANDBY'}")
 
+    def verificar_inventario(self):
+        verificar_inventario(self.almacen, self.lock, self._cargar_inventario)
+
     def borrar_registro(self):
         try:
             id_reg = int(input("Ingrese ID del registro a borrar: "))
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT salones_asignados, laboratorios_asignados FROM solicitudes WHERE id = ?", (id_reg,))
-                resultado = cursor.fetchone()
-                if resultado:
-                    cursor.execute("DELETE FROM solicitudes WHERE id = ?", (id_reg,))
-                    conn.commit()
-                    with self.lock:
-                        self.salones_disponibles += resultado[0]
-                        self.laboratorios_disponibles += resultado[1]
-                    print(f"\nRegistro {id_reg} borrado. Liberados {resultado[0]} salones y {resultado[1]} laboratorios")
-                else:
-                    print("\nRegistro no encontrado")
+            resultado = self.almacen.borrar_registro(id_reg)
+            if resultado:
+                with self.lock:
+                    if resultado[3]:
+                        self.inventario.liberar(resultado[3])
+                    else:
+                        self._cargar_inventario()
+                    self.cache.olvidar(resultado[2])
+                print(f"\nRegistro {id_reg} borrado. Liberados {resultado[0]} salones y {resultado[1]} laboratorios")
+            else:
+                print("\nRegistro no encontrado")
         except ValueError:
             print("\nID debe ser un número")
         except Exception as e:
@@ -327,28 +490,28 @@ class ServidorReplica:
     def borrar_todo(self):
         confirmacion = input("\n¿Está seguro de borrar TODOS los registros? (s/n): ").lower()
         if confirmacion == 's':
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT SUM(salones_asignados), SUM(laboratorios_asignados) FROM solicitudes")
-                total = cursor.fetchone()
-                cursor.execute("DELETE FROM solicitudes")
-                conn.commit()
-                with self.lock:
-                    if total and total[0]:
-                        self.salones_disponibles += total[0]
-                        self.laboratorios_disponibles += total[1]
-                    else:
-                        self.salones_disponibles = NUM_SALONES
-                        self.laboratorios_disponibles = NUM_LABORATORIOS
-                print("\nTodos los registros han sido borrados")
-                self.mostrar_estado()
+            self.almacen.borrar_todo()
+            with self.lock:
+                self.cache.limpiar()
+                self.inventario.limpiar()
+            print("\nTodos los registros han sido borrados")
+            self.mostrar_estado()
 
-    def iniciar(self):
-        threading.Thread(target=self.health_check, daemon=True).start()
+    def iniciar(self, interactivo=True):
+        self.vigilar_central()
         threading.Thread(target=self.recibir_sincronizaciones, daemon=True).start()
         threading.Thread(target=self.health_check_server, daemon=True).start()
         threading.Thread(target=self.manejar_solicitudes, daemon=True).start()
-        self.mostrar_menu()
+        if IP_BROKER:
+            # Solo se registra en el broker mientras actúa como primario
+            for _ in range(NUM_TRABAJADORES_BROKER):
+                trabajador = TrabajadorBroker(self.contexto, f"tcp://{IP_BROKER}:{PUERTO_BACKEND}",
+                                              self.procesar_solicitud, activo=lambda: self.activo)
+                threading.Thread(target=trabajador.ejecutar, daemon=True).start()
+        if interactivo:
+            self.mostrar_menu()
+        else:
+            threading.Event().wait()
 
 if __name__ == "__main__":
     try:
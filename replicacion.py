@@ -0,0 +1,261 @@
+import zmq
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from codec import codificar, decodificar, CODEC_MSGPACK
+
+logger = logging.getLogger("Replicacion")
+
+MAX_BUFFER_REPLICACION = 100000  # eventos recientes en memoria; los anteriores se leen del log
+TAM_LOTE_REPLICACION = 500       # eventos por frame
+VENTANA_REPLICACION = 5000       # eventos enviados sin confirmar como máximo
+TIMEOUT_ACK = 1.0                # segundos sin ack antes de retransmitir desde lo confirmado
+RETENCION_LOG = 1000000          # eventos que se conservan en replicacion_log; una réplica más atrasada usa snapshot
+INTERVALO_PODA = 60.0            # segundos entre podas del log
+TAM_BLOQUE_SNAPSHOT = 5000       # filas por frame del snapshot
+CREDITO_SNAPSHOT = 8             # bloques del snapshot en vuelo sin confirmar
+TIMEOUT_SNAPSHOT = 10.0          # segundos sin noticias del otro extremo antes de abortar un snapshot
+CODEC_REPLICACION = CODEC_MSGPACK  # formato de los frames del canal y del snapshot (JSON si no hay msgpack)
+
+class EmisorReplicacion:
+    """Canal de replicación persistente hacia la réplica (DEALER -> ROUTER).
+
+    Los eventos llegan ya numerados y guardados en `replicacion_log` por el
+    escritor agrupado. Un único hilo los agrupa en frames de hasta `tam_lote`,
+    mantiene como mucho `ventana` eventos en vuelo y avanza con el ack
+    acumulativo de la réplica. Cuando la réplica pide "todo después de N"
+    (al reconectarse o al ver un hueco), el envío retrocede a N y el sufijo
+    sale del buffer en memoria o, si es más antiguo, del log en bloque. Si lo
+    pedido ya se podó del log, se le indica que cargue un snapshot.
+    """
+
+    def __init__(self, contexto, endpoint, almacen, tam_buffer=MAX_BUFFER_REPLICACION,
+                 tam_lote=TAM_LOTE_REPLICACION, ventana=VENTANA_REPLICACION):
+        self.contexto = contexto
+        self.endpoint = endpoint
+        self.almacen = almacen
+        self.tam_lote = tam_lote
+        self.ventana = ventana
+
+        self.lock = threading.Lock()
+        self.recientes = deque(maxlen=tam_buffer)  # (seq, evento) más recientes, ya persistidos
+        self.seq_historial = almacen.sembrar_log()
+        self.ultimo_seq = almacen.ultimo_seq()
+        self.confirmado = self.ultimo_seq  # hasta que la réplica diga en qué secuencia está
+        self.enviado = self.ultimo_seq
+        self._esperando = False
+        self._snapshot_requerido = False
+
+        endpoint_aviso = f"inproc://replicacion-{uuid.uuid4().hex}"
+        self._aviso_rx = self.contexto.socket(zmq.PULL)
+        self._aviso_rx.bind(endpoint_aviso)
+        self._aviso_tx = self.contexto.socket(zmq.PUSH)
+        self._aviso_tx.connect(endpoint_aviso)
+
+        threading.Thread(target=self._ciclo, daemon=True).start()
+
+    def publicar(self, registrados):
+        """Recibe [(seq, evento), ...] recién confirmados en el log, sin bloquear."""
+        with self.lock:
+            for seq, evento in registrados:
+                self.recientes.append((seq, dict(evento, seq=seq)))
+            self.ultimo_seq = registrados[-1][0]
+            if self._esperando:
+                self._esperando = False
+                self._aviso_tx.send(b"")
+
+    def _procesar_ack(self, mensaje):
+        with self.lock:
+            seq = mensaje.get("seq", 0)
+            if mensaje.get("reenviar"):
+                primer_seq = self.almacen.primer_seq()
+                self._snapshot_requerido = seq < self.seq_historial or (primer_seq is not None and seq < primer_seq - 1)
+                if self._snapshot_requerido:
+                    logger.warning(f"Réplica en seq {seq} y el log empieza en {primer_seq or self.seq_historial + 1}: requiere snapshot")
+                # La réplica pide todo lo posterior a `seq`, aunque ya lo hubiera confirmado
+                self.confirmado = seq
+                self.enviado = seq
+                logger.info(f"Réplica en seq {seq}, enviando los {self.ultimo_seq - seq} eventos que le faltan")
+            elif seq > self.confirmado:
+                self.confirmado = seq
+
+    def _eventos(self, desde, hasta):
+        """Eventos con seq en [desde, hasta], del buffer en memoria o, si ya salieron de él, del log."""
+        with self.lock:
+            if self.recientes and self.recientes[0][0] <= desde:
+                base = self.recientes[0][0]
+                return [self.recientes[i][1] for i in range(desde - base, hasta - base + 1)]
+        filas = self.almacen.leer_log(desde - 1, hasta - desde + 1)
+        return [dict(json.loads(evento), seq=seq) for seq, evento in filas]
+
+    def _siguiente_lote(self):
+        with self.lock:
+            if self._snapshot_requerido:
+                return None
+            if self.enviado < self.confirmado:
+                self.enviado = self.confirmado
+            desde = self.enviado + 1
+            hasta = min(self.ultimo_seq, self.confirmado + self.ventana, self.enviado + self.tam_lote)
+            if hasta < desde:
+                self._esperando = True
+                return None
+            self.enviado = hasta
+        eventos = self._eventos(desde, hasta)
+        if not eventos:
+            return None
+        return {"tipo": "lote", "eventos": eventos}
+
+    def _podar_log(self):
+        hasta = self.ultimo_seq - RETENCION_LOG
+        if hasta > 0:
+            podados = self.almacen.podar_log(hasta)
+            if podados:
+                logger.info(f"Log de replicación podado hasta seq {hasta} ({podados} eventos)")
+
+    def _ciclo(self):
+        socket = self.contexto.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.setsockopt(zmq.IMMEDIATE, 1)  # sin réplica conectada el envío falla en vez de encolarse
+        socket.connect(self.endpoint)
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+        poller.register(self._aviso_rx, zmq.POLLIN)
+        ultimo_progreso = time.monotonic()
+        ultimo_hola = 0
+        proxima_poda = time.monotonic() + INTERVALO_PODA
+
+        while True:
+            try:
+                socks = dict(poller.poll(TIMEOUT_ACK * 1000))
+                if self._aviso_rx in socks:
+                    self._aviso_rx.recv()
+                if socket in socks:
+                    while socket.poll(0):
+                        self._procesar_ack(decodificar(socket.recv())[0])
+                    ultimo_progreso = time.monotonic()
+
+                with self.lock:
+                    hay_pendientes = self.confirmado < self.enviado
+                    ultimo_seq = self.ultimo_seq
+                if not hay_pendientes:
+                    ultimo_progreso = time.monotonic()
+                    if time.monotonic() - ultimo_hola > TIMEOUT_ACK:
+                        # Sin tráfico: anunciar la última secuencia para que una réplica
+                        # recién (re)conectada pida lo que le falta
+                        tipo = "snapshot_requerido" if self._snapshot_requerido else "hola"
+                        try:
+                            socket.send(codificar({"tipo": tipo, "ultimo": ultimo_seq}, CODEC_REPLICACION), zmq.NOBLOCK)
+                        except zmq.Again:
+                            pass
+                        ultimo_hola = time.monotonic()
+                elif time.monotonic() - ultimo_progreso > TIMEOUT_ACK:
+                    logger.warning("Réplica sin confirmar, retransmitiendo desde el último ack.")
+                    with self.lock:
+                        self.enviado = self.confirmado
+                    ultimo_progreso = time.monotonic()
+
+                lote = self._siguiente_lote()
+                while lote:
+                    try:
+                        socket.send(codificar(lote, CODEC_REPLICACION), zmq.NOBLOCK)
+                    except zmq.Again:
+                        with self.lock:
+                            self.enviado = lote["eventos"][0]["seq"] - 1
+                        break
+                    lote = self._siguiente_lote()
+
+                if time.monotonic() >= proxima_poda:
+                    self._podar_log()
+                    proxima_poda = time.monotonic() + INTERVALO_PODA
+            except Exception as e:
+                logger.error(f"Error en el canal de replicación: {e}")
+                time.sleep(TIMEOUT_ACK)
+
+class ServidorSnapshot:
+    """Entrega copias completas de `solicitudes` a réplicas nuevas o muy atrasadas (ROUTER).
+
+    La réplica pide un snapshot anunciando cuántos bloques acepta en vuelo; el
+    servidor responde con la secuencia de la copia, los bloques de filas y un
+    frame final, y solo envía un bloque más por cada crédito que le devuelve la
+    réplica. Se atiende una transferencia a la vez.
+    """
+
+    def __init__(self, contexto, endpoint, almacen, tam_bloque=TAM_BLOQUE_SNAPSHOT):
+        self.almacen = almacen
+        self.tam_bloque = tam_bloque
+        self.socket = contexto.socket(zmq.ROUTER)
+        self.socket.bind(endpoint)
+        threading.Thread(target=self._ciclo, daemon=True).start()
+
+    def _enviar(self, identidad, mensaje):
+        self.socket.send_multipart([identidad, codificar(mensaje, CODEC_REPLICACION)])
+
+    def _esperar_credito(self, identidad):
+        """Bloquea hasta recibir crédito de `identidad`; devuelve cuánto o 0 si se agotó el tiempo."""
+        limite = time.monotonic() + TIMEOUT_SNAPSHOT
+        while time.monotonic() < limite:
+            if not self.socket.poll((limite - time.monotonic()) * 1000):
+                break
+            origen, payload = self.socket.recv_multipart()
+            mensaje, _ = decodificar(payload)
+            if origen != identidad:
+                self._enviar(origen, {"tipo": "ocupado"})
+            elif mensaje.get("tipo") == "credito":
+                return mensaje["n"]
+        return 0
+
+    def _transferir(self, identidad, credito):
+        copia = self.almacen.exportar_snapshot(self.tam_bloque)
+        seq = next(copia)
+        self._enviar(identidad, {"tipo": "inicio", "seq": seq})
+        filas = 0
+        for bloque in copia:
+            if credito == 0:
+                credito = self._esperar_credito(identidad)
+                if credito == 0:
+                    copia.close()
+                    logger.warning("Snapshot abortado: la réplica dejó de pedir bloques")
+                    return
+            self._enviar(identidad, {"tipo": "filas", "filas": bloque})
+            credito -= 1
+            filas += len(bloque)
+        self._enviar(identidad, {"tipo": "fin", "filas": filas})
+        logger.info(f"Snapshot enviado: {filas} filas hasta seq {seq}")
+
+    def _ciclo(self):
+        while True:
+            try:
+                identidad, payload = self.socket.recv_multipart()
+                mensaje, _ = decodificar(payload)
+                if mensaje.get("tipo") == "snapshot":
+                    self._transferir(identidad, mensaje.get("credito", CREDITO_SNAPSHOT))
+            except Exception as e:
+                logger.error(f"Error enviando snapshot: {e}")
+
+def descargar_snapshot(contexto, endpoint, almacen, credito=CREDITO_SNAPSHOT):
+    """Descarga un snapshot del central y lo carga en `almacen`; devuelve (seq, filas)."""
+    socket = contexto.socket(zmq.DEALER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.RCVTIMEO, int(TIMEOUT_SNAPSHOT * 1000))
+    socket.connect(endpoint)
+    try:
+        socket.send(codificar({"tipo": "snapshot", "credito": credito}, CODEC_REPLICACION))
+        inicio, _ = decodificar(socket.recv())
+        if inicio.get("tipo") != "inicio":
+            raise RuntimeError(f"El central no puede enviar el snapshot ahora ({inicio.get('tipo')})")
+
+        def bloques():
+            while True:
+                mensaje, _ = decodificar(socket.recv())
+                if mensaje["tipo"] == "fin":
+                    return
+                yield mensaje["filas"]
+                socket.send(codificar({"tipo": "credito", "n": 1}, CODEC_REPLICACION))
+
+        filas = almacen.importar_snapshot(inicio["seq"], bloques())
+        return inicio["seq"], filas
+    finally:
+        socket.close()
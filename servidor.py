@@ -1,11 +1,20 @@
 import zmq
 import threading
-import sqlite3
 import logging
 from datetime import datetime
 import os
 import time
+import struct
 from tabulate import tabulate
+from database import AlmacenReservas, EscritorAgrupado, evento_reserva, pedir_filtros_registros, verificar_inventario
+from broker import TrabajadorBroker, PUERTO_BACKEND
+from idempotencia import CacheIdempotencia, respuesta_duplicada, validar_uuid, validar_facultad, validar_lote
+from codec import codificar, decodificar_solicitud, CODEC_JSON
+from replicacion import EmisorReplicacion, ServidorSnapshot
+from inventario import InventarioAulas, asignacion_de
+from latido import EmisorLatidos
+from metricas import MetricasServidor
+from planificador import PlanificadorDRR, CubetaTokens, QUANTUM_DRR, plazo_vencido
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,210 +28,494 @@ NUM_LABORATORIOS = 140
 PUERTO_SOLICITUDES = 5555
 PUERTO_HEALTHCHECK = 5557
 PUERTO_SYNC_BACKUP = 5556
+PUERTO_SNAPSHOT = 5558
+PUERTO_LATIDOS = 5559
+INTERVALO_LATIDO = 0.1  # segundos; la réplica detecta la caída en pocos intervalos
 DB_NAME = "aulas.db"
 INTERFACE = "0.0.0.0"
 IP_DEL_BACKUP = "10.43.96.100"
+SQLITE_SYNCHRONOUS = "FULL"
+TAM_LOTE_ESCRITURA = 256
+ESPERA_MAX_LOTE_MS = 1
+TIMEOUT_ESCRITURA = 5  # segundos
+NUM_TRABAJADORES = 8
+# Control de admisión: con la cola llena o una espera estimada mayor que el objetivo, el central
+# responde al instante "ocupado" en vez de dejar que la solicitud espere hasta el timeout del cliente
+MAX_EN_COLA = 1000             # None para no acotar la cola
+LATENCIA_OBJETIVO_MS = 500     # None para admitir mientras quepa en la cola
+REINTENTAR_MIN_MS = 10
+# Planificación justa entre facultades: una cola por facultad atendida con DRR (ver planificador.py)
+PESOS_FACULTADES = {}    # facultad -> peso (1 por defecto); p. ej. {"Facultad de Medicina": 2}
+LIMITES_FACULTADES = {}  # facultad -> (solicitudes por segundo, ráfaga); sin entrada no hay límite
+ENDPOINT_TRABAJADORES = "inproc://trabajadores"
+IP_BROKER = None  # IP de la máquina con broker.py; None para no registrarse en el broker
+NUM_TRABAJADORES_BROKER = 4
+TAM_PAGINA = 20  # registros por página en el menú
+
+def respuesta_expirada(mensaje):
+    return {"status": "expirada", "message": "El plazo de la solicitud venció.", "uuid": mensaje.get("uuid")}
+
+def _cantidad(valor):
+    return valor if isinstance(valor, int) and valor > 0 else 0
+
+def facultad_y_costo(mensaje):
+    """Facultad de una solicitud (o lote) y su costo para el planificador: salones + laboratorios pedidos."""
+    if not isinstance(mensaje, dict):
+        return None, 1
+    solicitudes = mensaje.get("solicitudes") if mensaje.get("tipo") == "lote" else [mensaje]
+    if not isinstance(solicitudes, list) or not solicitudes or not isinstance(solicitudes[0], dict):
+        solicitudes = [{}]
+    facultad = solicitudes[0].get("facultad", mensaje.get("facultad"))
+    costo = sum(_cantidad(s.get("num_salones")) + _cantidad(s.get("num_laboratorios"))
+                for s in solicitudes if isinstance(s, dict))
+    # Las consultas (reporte, disponibilidad) y los mensajes sin facultad comparten una cola
+    return facultad if isinstance(facultad, str) else None, max(1, costo)
 
 class ServidorCentral:
     def __init__(self):
-        self.salones_disponibles = NUM_SALONES
-        self.laboratorios_disponibles = NUM_LABORATORIOS
+        self.inventario = InventarioAulas(NUM_SALONES, NUM_LABORATORIOS)
         self.lock = threading.Lock()
         self.contexto = zmq.Context()
 
-        self.socket_solicitudes = self.contexto.socket(zmq.REP)
+        # Front end ROUTER hacia las facultades y DEALER inproc hacia el pool de trabajadores
+        self.socket_solicitudes = self.contexto.socket(zmq.ROUTER)
         self.socket_solicitudes.bind(f"tcp://{INTERFACE}:{PUERTO_SOLICITUDES}")
+        self.socket_trabajadores = self.contexto.socket(zmq.DEALER)
+        self.socket_trabajadores.bind(ENDPOINT_TRABAJADORES)
+        self.trabajadores_iniciados = False
+        self.metricas = MetricasServidor()
+        self.cubetas = {facultad: CubetaTokens(ritmo, rafaga) for facultad, (ritmo, rafaga) in LIMITES_FACULTADES.items()}
+        # Estado del proxy: sobrevive a Ctrl+C para que "Continuar" retome la cola y los trabajadores ocupados
+        self.planificador = PlanificadorDRR(QUANTUM_DRR, PESOS_FACULTADES)
+        self.trabajadores_libres = NUM_TRABAJADORES
 
         self.socket_healthcheck = self.contexto.socket(zmq.REP)
         self.socket_healthcheck.bind(f"tcp://*:{PUERTO_HEALTHCHECK}")
 
+        self.almacen = AlmacenReservas(DB_NAME, synchronous=SQLITE_SYNCHRONOUS)
         self._asegurar_tabla()
         self._cargar_estado()
+        self.cache = CacheIdempotencia()
+        self.cache.precargar(self.almacen)
+        self.uuids_pendientes = {}  # uuid -> (escritura pendiente, respuesta) hasta que el lote es durable
+        # Cada lote confirmado queda en replicacion_log y se entrega al canal hacia el backup
+        self.replicacion = EmisorReplicacion(self.contexto, f"tcp://{IP_DEL_BACKUP}:{PUERTO_SYNC_BACKUP}", self.almacen)
+        self.escritor = EscritorAgrupado(self.almacen, TAM_LOTE_ESCRITURA, ESPERA_MAX_LOTE_MS / 1000,
+                                         al_confirmar=self.replicacion.publicar)
+        # Copias completas para réplicas nuevas o que quedaron por detrás del log podado
+        self.snapshots = ServidorSnapshot(self.contexto, f"tcp://{INTERFACE}:{PUERTO_SNAPSHOT}", self.almacen)
+        # Latidos continuos hacia la réplica (PUB), en lugar de que ella abra un socket por PING
+        # Cada latido lleva la última secuencia del log: la réplica la usa para acotar cuán atrasadas están sus lecturas
+        self.latidos = EmisorLatidos(self.contexto, f"tcp://{INTERFACE}:{PUERTO_LATIDOS}", INTERVALO_LATIDO,
+                                     estado=lambda: {"seq": self.replicacion.ultimo_seq})
 
     def _asegurar_tabla(self):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS solicitudes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                uuid TEXT UNIQUE,
-                facultad TEXT,
-                salones_asignados INTEGER,
-                laboratorios_asignados INTEGER,
-                fecha DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            conn.commit()
+        self.almacen.crear_tabla()
         logger.info("Tabla 'solicitudes' verificada/creada.")
 
     def _cargar_estado(self):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT SUM(salones_asignados), SUM(laboratorios_asignados) FROM solicitudes")
-            total_salones, total_labs = cursor.fetchone()
-            if total_salones:
-                self.salones_disponibles -= total_salones
-            if total_labs:
-                self.laboratorios_disponibles -= total_labs
-        logger.info(f"Estado inicial: {self.salones_disponibles} salones, {self.laboratorios_disponibles} laboratorios disponibles.")
-
-    def notificar_backup(self, reserva):
+        # La ocupación está materializada en la tabla `inventario`: no hace falta recorrer las reservas
+        self.inventario.cargar_filas(self.almacen.leer_inventario())
+        salones, labs = self.inventario.disponibles()
+        logger.info(f"Estado inicial: {salones} salones y {labs} laboratorios libres todo el semestre.")
+
+    def _asignar(self, solicitud):
+        """Decide una solicitud; se llama con self.lock tomado.
+
+        Devuelve ("duplicada", respuesta), ("en_vuelo", (pendiente, respuesta)) si
+        es el reintento de una solicitud cuyo lote aún no es durable, ("invalida",
+        respuesta de error), o ("nueva", respuesta) con los salones y laboratorios
+        concretos ya marcados en el inventario, que el llamador debe encolar.
+        """
         try:
-            backup_socket = self.contexto.socket(zmq.REQ)
-            backup_socket.connect(f"tcp://{IP_DEL_BACKUP}:{PUERTO_SYNC_BACKUP}")
-            backup_socket.setsockopt(zmq.LINGER, 0)
-            backup_socket.setsockopt(zmq.RCVTIMEO, 1000)
-            backup_socket.send_json(reserva)
-            try:
-                ack = backup_socket.recv_json()
-                logger.info("Reserva notificada al backup.")
-            except zmq.Again:
-                logger.warning("Backup no respondió a tiempo. Continuando sin bloquear.")
-            backup_socket.close()
-        except Exception as e:
-            logger.error(f"No se pudo notificar reserva al backup: {e}")
-
-    def notificar_borrado_backup(self, id_registro=None):
+            uuid = validar_uuid(solicitud.get("uuid"))
+        except ValueError as e:
+            return "invalida", {"status": "error", "message": str(e)}
+        en_vuelo = self.uuids_pendientes.get(uuid)
+        if en_vuelo is not None:
+            return "en_vuelo", en_vuelo
+        original = self.cache.buscar(uuid, self.almacen.buscar_asignacion)
+        if original is not None:
+            logger.info("Solicitud duplicada detectada, respondiendo con la asignación original")
+            return "duplicada", respuesta_duplicada(original)
         try:
-            backup_socket = self.contexto.socket(zmq.REQ)
-            backup_socket.connect(f"tcp://{IP_DEL_BACKUP}:{PUERTO_SYNC_BACKUP}")
-            backup_socket.setsockopt(zmq.LINGER, 0)
-            backup_socket.setsockopt(zmq.RCVTIMEO, 1000)
-
-            mensaje = {
-                "tipo": "borrado_total" if id_registro is None else "borrado_registro",
-                "id": id_registro
-            }
-            backup_socket.send_json(mensaje)
+            validar_facultad(solicitud.get("facultad"))
+            inicio, fin = self.inventario.rango(solicitud)
+            num_salones, num_labs = self.inventario.cantidades(solicitud)
+        except ValueError as e:
+            return "invalida", {"status": "error", "message": str(e)}
+
+        asignacion = self.inventario.asignar(num_salones, num_labs, inicio, fin)
+        salones_asignados = len(asignacion["ids_salones"])
+        labs_asignados = len(asignacion["ids_laboratorios"])
+        salones_restantes, labs_restantes = self.inventario.disponibles(inicio, fin)
+
+        respuesta = {
+            "status": "success" if (salones_asignados == num_salones and labs_asignados == num_labs) else "partial",
+            "salones_asignados": salones_asignados,
+            "laboratorios_asignados": labs_asignados,
+            "salones_restantes": salones_restantes,
+            "laboratorios_restantes": labs_restantes
+        }
+        respuesta.update(asignacion)
+        if respuesta["status"] == "partial":
+            respuesta["message"] = "No se pudo asignar la cantidad total solicitada por disponibilidad limitada."
+        return "nueva", respuesta
+
+    def _recargar_inventario(self):
+        """Relee la ocupación de la BD con self.lock tomado, sin perder las reservas aún no durables."""
+        self.inventario.cargar_filas(self.almacen.leer_inventario())
+        for _, respuesta in self.uuids_pendientes.values():
+            self.inventario.aplicar(respuesta)
+
+    def _esperar_original(self, pendiente, respuesta):
+        # Reintento de una solicitud cuyo lote aún no es durable: se espera al original
+        try:
+            pendiente.esperar(TIMEOUT_ESCRITURA)
+        except Exception:
+            return {"status": "error", "message": "La solicitud original aún no se ha confirmado."}
+        return respuesta_duplicada(respuesta)
 
-            try:
-                ack = backup_socket.recv_json()
-                logger.info("Borrado notificado al backup")
-            except zmq.Again:
-                logger.warning("Backup no respondió a notificación de borrado")
-            backup_socket.close()
+    def _confirmar(self, nuevas, pendiente):
+        """Espera a que la escritura de `nuevas` [(uuid, respuesta), ...] sea durable y devuelve sus respuestas."""
+        try:
+            pendiente.esperar(TIMEOUT_ESCRITURA)
+        except TimeoutError:
+            # Sigue encolada: los UUID quedan marcados para que un reintento no asigne dos veces
+            # y se liberan (o pasan a la caché) cuando el lote termine, aunque ya nadie lo espere.
+            logger.error("La escritura en la BD local no se confirmó a tiempo")
+            pendiente.al_completar(lambda error: self._cerrar_pendientes(nuevas, error))
+            return [{"status": "error", "message": "No se pudo confirmar la reserva a tiempo."}] * len(nuevas)
         except Exception as e:
-            logger.error(f"Error notificando borrado al backup: {e}")
-
-    def manejar_solicitud(self, facultad, num_salones, num_labs, uuid):
+            logger.error(f"Error guardando en la BD local: {e}")
+            self._cerrar_pendientes(nuevas, e)
+            return [{"status": "error", "message": "No se pudo guardar la reserva."}] * len(nuevas)
+        self._cerrar_pendientes(nuevas)
+        return [respuesta for _, respuesta in nuevas]
+
+    def _cerrar_pendientes(self, nuevas, error=None):
+        """Saca `nuevas` de uuids_pendientes: a la caché si el lote es durable, o libera sus salones si falló."""
+        try:
+            with self.lock:
+                for uuid, respuesta in nuevas:
+                    if error is None:
+                        self.cache.registrar(uuid, respuesta)
+                    else:
+                        self.inventario.liberar(respuesta)
+                    self.uuids_pendientes.pop(uuid, None)
+        except Exception as e:
+            logger.error(f"Error cerrando reservas pendientes: {e}")
+
+    def manejar_solicitud(self, facultad, num_salones, num_labs, uuid, franja_inicio=None, franja_fin=None):
+        # La asignación se decide en memoria bajo el lock; la escritura la hace el
+        # escritor agrupado y solo se responde cuando el lote ya está en disco.
+        solicitud = {"uuid": uuid, "facultad": facultad, "num_salones": num_salones, "num_laboratorios": num_labs}
+        if franja_inicio is not None:
+            solicitud["franja_inicio"] = franja_inicio
+        if franja_fin is not None:
+            solicitud["franja_fin"] = franja_fin
         with self.lock:
             fecha_actual = datetime.now().isoformat()
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id FROM solicitudes WHERE uuid = ?", (uuid,))
-                    if cursor.fetchone():
-                        logger.info("Solicitud duplicada detectada, ignorando (UUID ya existe)")
-                        return {
-                            "status": "duplicate",
-                            "message": "Solicitud ya procesada anteriormente.",
-                            "salones_asignados": 0,
-                            "laboratorios_asignados": 0
-                        }
-                    salones_asignados = min(num_salones, self.salones_disponibles)
-                    labs_asignados = min(num_labs, self.laboratorios_disponibles)
-                    self.salones_disponibles -= salones_asignados
-                    self.laboratorios_disponibles -= labs_asignados
-
-                    cursor.execute("""
-                        INSERT INTO solicitudes (uuid, facultad, salones_asignados, laboratorios_asignados, fecha)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (uuid, facultad, salones_asignados, labs_asignados, fecha_actual))
-                    conn.commit()
-            except Exception as e:
-                logger.error(f"Error guardando en la BD local: {e}")
-
-            reserva = {
-                "uuid": uuid,
-                "facultad": facultad,
-                "salones_asignados": salones_asignados,
-                "laboratorios_asignados": labs_asignados,
-                "fecha": fecha_actual
-            }
-            threading.Thread(target=self.notificar_backup, args=(reserva,), daemon=True).start()
-
-            logger.info(f"Asignados a {facultad}: {salones_asignados} salones, {labs_asignados} labs.")
-
-            respuesta = {
-                "status": "success" if (salones_asignados == num_salones and labs_asignados == num_labs) else "partial",
-                "salones_asignados": salones_asignados,
-                "laboratorios_asignados": labs_asignados,
-                "salones_restantes": self.salones_disponibles,
-                "laboratorios_restantes": self.laboratorios_disponibles
-            }
-            if respuesta["status"] == "partial":
-                respuesta["message"] = "No se pudo asignar la cantidad total solicitada por disponibilidad limitada."
+            tipo, respuesta = self._asignar(solicitud)
+            if tipo == "nueva":
+                pendiente = self.escritor.encolar(uuid, facultad, respuesta["salones_asignados"],
+                                                  respuesta["laboratorios_asignados"], fecha_actual,
+                                                  asignacion_de(respuesta))
+                self.uuids_pendientes[uuid] = (pendiente, respuesta)
+
+        if tipo in ("duplicada", "invalida"):
             return respuesta
+        if tipo == "en_vuelo":
+            return self._esperar_original(*respuesta)
+
+        respuesta = self._confirmar([(uuid, respuesta)], pendiente)[0]
+        if respuesta["status"] != "error":
+            logger.info(f"Asignados a {facultad}: {respuesta['salones_asignados']} salones, {respuesta['laboratorios_asignados']} labs.")
+        return respuesta
+
+    def manejar_lote(self, solicitudes):
+        """Asigna varias solicitudes en orden con una sola toma del lock y las guarda en una sola transacción.
+
+        Devuelve la lista de respuestas, una por solicitud y en el mismo orden.
+        """
+        resultados = [None] * len(solicitudes)
+        nuevas = []      # (índice, solicitud, respuesta)
+        en_vuelo = []    # (índice, (pendiente, respuesta))
+        repetidas = []   # (índice, índice de la primera aparición del UUID en el lote)
+        vistas = {}
+        with self.lock:
+            fecha_actual = datetime.now().isoformat()
+            for i, solicitud in enumerate(solicitudes):
+                uuid = solicitud["uuid"]
+                if uuid in vistas:
+                    repetidas.append((i, vistas[uuid]))
+                    continue
+                vistas[uuid] = i
+                tipo, respuesta = self._asignar(solicitud)
+                if tipo == "nueva":
+                    nuevas.append((i, solicitud, respuesta))
+                elif tipo == "en_vuelo":
+                    en_vuelo.append((i, respuesta))
+                else:
+                    resultados[i] = respuesta
+            if nuevas:
+                pendiente = self.escritor.encolar_varias([
+                    evento_reserva(s["uuid"], s["facultad"], r["salones_asignados"], r["laboratorios_asignados"],
+                                   fecha_actual, asignacion_de(r))
+                    for _, s, r in nuevas
+                ])
+                for _, s, r in nuevas:
+                    self.uuids_pendientes[s["uuid"]] = (pendiente, r)
+
+        if nuevas:
+            confirmadas = self._confirmar([(s["uuid"], r) for _, s, r in nuevas], pendiente)
+            for (i, _, _), respuesta in zip(nuevas, confirmadas):
+                resultados[i] = respuesta
+            logger.info(f"Lote de {len(nuevas)} solicitudes asignado en una sola escritura.")
+        for i, original in en_vuelo:
+            resultados[i] = self._esperar_original(*original)
+        for i, primera in repetidas:
+            previa = resultados[primera]
+            resultados[i] = previa if previa["status"] == "error" else respuesta_duplicada(previa)
+        return [dict(r, uuid=s["uuid"]) for r, s in zip(resultados, solicitudes)]
+
+    def reporte_uso(self, mensaje):
+        """Uso por facultad leído de los agregados de la BD; no toma el lock de las reservas."""
+        try:
+            facultades = self.almacen.uso_por_facultad(mensaje.get("semana"))
+        except ValueError as e:
+            return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        return {"status": "success", "uuid": mensaje.get("uuid"), "semana": mensaje.get("semana"), "facultades": facultades}
 
-    def recibir_y_atender(self):
-        logger.info("Servidor listo para aceptar solicitudes en puerto 5555.")
+    def consultar_disponibilidad(self, mensaje):
+        """Salones y laboratorios libres en las franjas pedidas, sin reservar nada."""
+        try:
+            inicio, fin = self.inventario.rango(mensaje)
+        except ValueError as e:
+            return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+        with self.lock:
+            salones, laboratorios = self.inventario.disponibles(inicio, fin)
+        seq = self.replicacion.ultimo_seq
+        return {
+            "status": "success",
+            "uuid": mensaje.get("uuid"),
+            "franja_inicio": inicio,
+            "franja_fin": fin,
+            "salones_disponibles": salones,
+            "laboratorios_disponibles": laboratorios,
+            # El primario está al día por definición; mismos campos que responde la réplica
+            "seq": seq,
+            "seq_primario": seq,
+            "retraso_eventos": 0,
+            "antiguedad_s": 0.0
+        }
+
+    def procesar_mensaje(self, mensaje):
+        if plazo_vencido(mensaje):
+            # Última comprobación antes de asignar (p. ej. llegó por el broker o esperó en el trabajador)
+            self.metricas.expirada(facultad_y_costo(mensaje)[0])
+            return respuesta_expirada(mensaje)
+        if mensaje.get("tipo") == "disponibilidad":
+            return self.consultar_disponibilidad(mensaje)
+        if mensaje.get("tipo") == "reporte":
+            return self.reporte_uso(mensaje)
+        if mensaje.get("tipo") == "lote":
+            try:
+                solicitudes = validar_lote(mensaje.get("solicitudes"))
+            except ValueError as e:
+                return {"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}
+            resultados = self.manejar_lote(solicitudes)
+            completo = all(r["status"] in ("success", "duplicate") for r in resultados)
+            return {"status": "success" if completo else "partial", "uuid": mensaje.get("uuid"), "resultados": resultados}
+        facultad = mensaje.get("facultad")
+        num_salones = mensaje.get("num_salones")
+        num_laboratorios = mensaje.get("num_laboratorios")
+        uuid = mensaje.get("uuid")
+        franja_inicio = mensaje.get("franja_inicio")
+        franja_fin = mensaje.get("franja_fin")
+        # El UUID viaja en la respuesta para que un cliente con varias solicitudes en vuelo la empareje
+        return dict(self.manejar_solicitud(facultad, num_salones, num_laboratorios, uuid, franja_inicio, franja_fin), uuid=uuid)
+
+    def trabajador(self, num_trabajador):
+        # Cada trabajador tiene su propio REP: el sobre del ROUTER viaja con el mensaje
+        # y la respuesta vuelve al cliente correcto sin correlación manual.
+        socket = self.contexto.socket(zmq.REP)
+        socket.connect(ENDPOINT_TRABAJADORES)
         while True:
+            mensaje, codec = {}, CODEC_JSON
             try:
-                mensaje = self.socket_solicitudes.recv_json()
-                facultad = mensaje.get("facultad")
-                num_salones = mensaje.get("num_salones")
-                num_laboratorios = mensaje.get("num_laboratorios")
-                uuid = mensaje.get("uuid")
-                respuesta = self.manejar_solicitud(facultad, num_salones, num_laboratorios, uuid)
-                self.socket_solicitudes.send_json(respuesta)
+                # Se responde en el mismo formato en que llegó la solicitud
+                mensaje, codec = decodificar_solicitud(socket.recv())
+                respuesta = self.procesar_mensaje(mensaje)
+                socket.send(codificar(respuesta, codec))
             except Exception as e:
-                logger.error(f"Error inesperado: {e}")
+                logger.error(f"Error inesperado en trabajador {num_trabajador}: {e}")
                 try:
-                    self.socket_solicitudes.send_json({"status": "error", "message": str(e)})
+                    socket.send(codificar({"status": "error", "message": str(e), "uuid": mensaje.get("uuid")}, codec))
                 except Exception as ee:
                     logger.error(f"No se pudo enviar mensaje de error: {ee}")
 
+    def recibir_y_atender(self):
+        if not self.trabajadores_iniciados:
+            for i in range(NUM_TRABAJADORES):
+                threading.Thread(target=self.trabajador, args=(i,), daemon=True).start()
+            if IP_BROKER:
+                for _ in range(NUM_TRABAJADORES_BROKER):
+                    trabajador = TrabajadorBroker(self.contexto, f"tcp://{IP_BROKER}:{PUERTO_BACKEND}", self.procesar_mensaje)
+                    threading.Thread(target=trabajador.ejecutar, daemon=True).start()
+            self.trabajadores_iniciados = True
+        logger.info(f"Servidor listo para aceptar solicitudes en puerto {PUERTO_SOLICITUDES} ({NUM_TRABAJADORES} trabajadores).")
+        self._proxy()
+
+    def _proxy(self):
+        """Reparte las solicitudes entre los trabajadores con una cola por facultad (DRR).
+
+        El proxy guarda la cola y entrega a lo sumo una solicitud por trabajador
+        libre: el orden de atención lo decide el planificador y no el de llegada,
+        así que una facultad con ráfagas no deja sin turno a las demás. A cada
+        solicitud se le agrega al sobre un frame con la hora de llegada y la de
+        despacho; el REP del trabajador devuelve el sobre completo con la
+        respuesta, así que al volver se sabe la latencia total y cuánto estuvo
+        ocupado el trabajador (el tiempo de servicio con el que se estima la espera).
+        """
+        poller = zmq.Poller()
+        poller.register(self.socket_solicitudes, zmq.POLLIN)
+        poller.register(self.socket_trabajadores, zmq.POLLIN)
+        while True:
+            eventos = dict(poller.poll())
+            if self.socket_solicitudes in eventos:
+                frames = self.socket_solicitudes.recv_multipart()
+                # [identidad, "", payload]; sin delimitador el REP la descartaría y nunca volvería
+                if len(frames) >= 3 and frames[1] == b"":
+                    self._admitir(frames)
+            if self.socket_trabajadores in eventos:
+                identidad, estampa, *resto = self.socket_trabajadores.recv_multipart()
+                self.trabajadores_libres += 1
+                ahora = time.monotonic()
+                llegada, despacho = struct.unpack("!dd", estampa)
+                self.metricas.salida(ahora - llegada, ahora - despacho)
+                self.socket_solicitudes.send_multipart([identidad] + resto)
+            while self.trabajadores_libres and len(self.planificador):
+                facultad, (llegada, mensaje, codec, frames) = self.planificador.siguiente()
+                self.metricas.espera(facultad, time.monotonic() - llegada)
+                if plazo_vencido(mensaje):
+                    # Venció mientras esperaba turno: no se gasta un trabajador en ella
+                    self.metricas.expirada(facultad, encolada=True)
+                    self.socket_solicitudes.send_multipart(frames[:2] + [codificar(respuesta_expirada(mensaje), codec)])
+                    continue
+                self.trabajadores_libres -= 1
+                self.socket_trabajadores.send_multipart([frames[0], struct.pack("!dd", llegada, time.monotonic())] + frames[1:])
+
+    def _admitir(self, frames):
+        """Encola la solicitud en la cola de su facultad o la rechaza al instante con "ocupado"."""
+        try:
+            mensaje, codec = decodificar_solicitud(frames[2])
+        except Exception as e:
+            # Sin un dict no hay facultad ni UUID con los que admitir o responder: se contesta en JSON
+            respuesta = {"status": "error", "message": f"Solicitud inválida: {e}", "uuid": None}
+            self.socket_solicitudes.send_multipart(frames[:2] + [codificar(respuesta)])
+            return
+        facultad, costo = facultad_y_costo(mensaje)
+        if plazo_vencido(mensaje):
+            self.metricas.expirada(facultad)
+            self.socket_solicitudes.send_multipart(frames[:2] + [codificar(respuesta_expirada(mensaje), codec)])
+            return
+        espera = self._saturado(self.planificador.pendientes(facultad))
+        if espera is not None:
+            # Lo que tardaría la cola en bajar hasta el objetivo al ritmo actual
+            reintentar_ms = espera * 1000 - (LATENCIA_OBJETIVO_MS or 0)
+            motivo = "Servidor saturado, reintente más tarde."
+        else:
+            cubeta = self.cubetas.get(facultad)
+            if cubeta is None or cubeta.tomar():
+                self.metricas.entrada()
+                self.planificador.encolar(facultad, (time.monotonic(), mensaje, codec, frames), costo)
+                return
+            reintentar_ms = cubeta.espera() * 1000
+            motivo = "La facultad superó su límite de solicitudes por segundo."
+        self.metricas.rechazo(facultad)
+        respuesta = {
+            "status": "ocupado",
+            "message": motivo,
+            "reintentar_en_ms": max(REINTENTAR_MIN_MS, int(reintentar_ms)),
+            "uuid": mensaje.get("uuid")
+        }
+        self.socket_solicitudes.send_multipart(frames[:2] + [codificar(respuesta, codec)])
+
+    def _saturado(self, en_cola_facultad=1):
+        """Espera estimada (s) si la solicitud nueva debe rechazarse, o None si se admite.
+
+        Por encima del objetivo de latencia solo se rechaza a las facultades que ya
+        tienen solicitudes en cola: el recorte recae en quien está generando la cola.
+        """
+        espera = self.metricas.espera_estimada(NUM_TRABAJADORES)
+        if MAX_EN_COLA is not None and self.metricas.en_cola >= MAX_EN_COLA:
+            return espera
+        if LATENCIA_OBJETIVO_MS is not None and en_cola_facultad and espera * 1000 > LATENCIA_OBJETIVO_MS:
+            return espera
+        return None
+
+    def salud(self):
+        """Lo que responde el health check: rol, solicitudes en cola y p99 reciente."""
+        return dict(self.metricas.estado(), rol="primario", seq=self.replicacion.ultimo_seq)
+
     def health_check_server(self):
+        # Se responde a cualquier mensaje (antes "PING" → "PONG"); un REP que no responde queda bloqueado
         while True:
             try:
-                msg = self.socket_healthcheck.recv_string()
-                if msg == "PING":
-                    self.socket_healthcheck.send_string("PONG")
+                self.socket_healthcheck.recv()
+                self.socket_healthcheck.send(codificar(self.salud()))
             except Exception as e:
                 logging.error(f"Error en health-check server: {e}")
 
     def mostrar_datos(self):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM solicitudes ORDER BY fecha DESC")
-            datos = cursor.fetchall()
-
-            if not datos:
-                print("\nNo hay registros en la base de datos.\n")
-                return
+        try:
+            filtros = pedir_filtros_registros()
+        except ValueError:
+            print("\n❌ Fecha inválida, use el formato AAAA-MM-DD.\n")
+            return
 
-            headers = ["ID", "UUID", "Facultad", "Salones", "Laboratorios", "Fecha"]
+        # Se muestra una página a la vez: la memoria no depende del tamaño de la tabla
+        headers = ["ID", "UUID", "Facultad", "Salones", "Laboratorios", "Fecha",
+                   "Franja inicio", "Franja fin", "IDs salones", "IDs laboratorios"]
+        mostrados = 0
+        for numero, pagina in enumerate(self.almacen.iterar_paginas(TAM_PAGINA, **filtros), 1):
+            mostrados += len(pagina)
             print("\n" + "="*80)
-            print("REGISTROS EN LA BASE DE DATOS".center(80))
+            print(f"REGISTROS EN LA BASE DE DATOS (página {numero})".center(80))
             print("="*80)
-            print(tabulate(datos, headers=headers, tablefmt="grid"))
-            print(f"\nTotal registros: {len(datos)}")
-            print(f"Salones disponibles: {self.salones_disponibles}/{NUM_SALONES}")
-            print(f"Laboratorios disponibles: {self.laboratorios_disponibles}/{NUM_LABORATORIOS}\n")
+            print(tabulate(pagina, headers=headers, tablefmt="grid"))
+            print(f"\nMostrados: {mostrados} registros")
+            if len(pagina) == TAM_PAGINA and input("Enter = página siguiente, q = terminar: ").strip().lower() == "q":
+                break
+
+        if not mostrados:
+            print("\nNo hay registros en la base de datos.\n")
+        salones, labs = self.inventario.disponibles()
+        ocupacion_salones, ocupacion_labs = self.inventario.ocupacion()
+        print(f"Salones libres todo el semestre: {salones}/{NUM_SALONES} (ocupación {ocupacion_salones:.1%})")
+        print(f"Laboratorios libres todo el semestre: {labs}/{NUM_LABORATORIOS} (ocupación {ocupacion_labs:.1%})\n")
 
     def borrar_registro(self, id_registro):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT salones_asignados, laboratorios_asignados FROM solicitudes WHERE id = ?", (id_registro,))
-            resultado = cursor.fetchone()
-
-            if resultado:
-                salones, labs = resultado
-                cursor.execute("DELETE FROM solicitudes WHERE id = ?", (id_registro,))
-                conn.commit()
+        resultado = self.escritor.borrar_registro(id_registro, TIMEOUT_ESCRITURA)
 
-                with self.lock:
-                    self.salones_disponibles += salones
-                    self.laboratorios_disponibles += labs
+        if resultado:
+            salones, labs, uuid, asignacion = resultado
 
-                threading.Thread(target=self.notificar_borrado_backup, args=(id_registro,), daemon=True).start()
-
-                print(f"\n✅ Registro con ID {id_registro} eliminado correctamente.")
-                print(f"Se liberaron {salones} salones y {labs} laboratorios.\n")
-                return True
-            else:
-                print(f"\n❌ No se encontró ningún registro con ID {id_registro}\n")
-                return False
+            with self.lock:
+                if asignacion:
+                    self.inventario.liberar(asignacion)
+                else:
+                    # Reserva anterior al inventario por franjas: la BD recalculó los IDs de las demás
+                    self._recargar_inventario()
+                self.cache.olvidar(uuid)
+
+            print(f"\n✅ Registro con ID {id_registro} eliminado correctamente.")
+            print(f"Se liberaron {salones} salones y {labs} laboratorios.\n")
+            return True
+        else:
+            print(f"\n❌ No se encontró ningún registro con ID {id_registro}\n")
+            return False
 
     def borrar_todo(self):
         confirmacion = input("\n⚠️ ¿Estás seguro de que quieres borrar TODOS los registros? (s/n): ").lower()
@@ -230,24 +523,20 @@ class ServidorCentral:
             print("\nOperación cancelada.\n")
             return
 
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT SUM(salones_asignados), SUM(laboratorios_asignados) FROM solicitudes")
-            total_salones, total_labs = cursor.fetchone()
-
-            cursor.execute("DELETE FROM solicitudes")
-            conn.commit()
-
-            with self.lock:
-                self.salones_disponibles = NUM_SALONES
-                self.laboratorios_disponibles = NUM_LABORATORIOS
+        # Se encola bajo el lock para que ninguna reserva asignada después quede antes del borrado
+        with self.lock:
+            pendiente = self.escritor.encolar_borrado_total()
+            self.inventario.limpiar()
+            self.cache.limpiar()
+        borrados = pendiente.esperar(TIMEOUT_ESCRITURA)
 
-            threading.Thread(target=self.notificar_borrado_backup, daemon=True).start()
+        print("\n️ Todos los registros han sido eliminados.")
+        if borrados:
+            print(f"Se eliminaron {borrados} reservas.")
+        print("Los contadores han sido restablecidos a los valores iniciales.\n")
 
-            print("\n️ Todos los registros han sido eliminados.")
-            if total_salones:
-                print(f"Se liberaron {total_salones} salones y {total_labs} laboratorios.")
-            print("Los contadores han sido restablecidos a los valores iniciales.\n")
+    def verificar_inventario(self):
+        return verificar_inventario(self.almacen, self.lock, self._recargar_inventario)
 
 def mostrar_menu():
     print("\n" + "="*50)
@@ -257,14 +546,15 @@ def mostrar_menu():
     print("2. Borrar un registro específico")
     print("3. Borrar TODOS los registros")
     print("4. Iniciar/Continuar servicio de reservas")
-    print("5. Salir")
+    print("5. Verificar inventario")
+    print("6. Salir")
     print("="*50)
 
 def menu_interactivo(servidor):
     threading.Thread(target=servidor.health_check_server, daemon=True).start()
     while True:
         mostrar_menu()
-        opcion = input("Seleccione una opción (1-5): ")
+        opcion = input("Seleccione una opción (1-6): ")
 
         if opcion == "1":
             servidor.mostrar_datos()
@@ -281,13 +571,23 @@ def menu_interactivo(servidor):
             try:
                 servidor.recibir_y_atender()
             except KeyboardInterrupt:
-                print("\nVolviendo al menú principal...\n")
+                estado = servidor.metricas.estado()
+                print(f"\nAtendidas: {estado['atendidas']} | rechazadas por saturación o límite: {estado['rechazadas']} | "
+                      f"descartadas por plazo vencido: {estado['expiradas']}")
+                if estado["por_facultad"]:
+                    print(tabulate([[facultad, d["espera_p50_ms"], d["espera_p99_ms"], d["rechazadas"], d["expiradas"]]
+                                    for facultad, d in sorted(estado["por_facultad"].items())],
+                                   headers=["Facultad", "Espera p50 (ms)", "Espera p99 (ms)", "Rechazadas", "Expiradas"],
+                                   tablefmt="grid"))
+                print("Volviendo al menú principal...\n")
                 continue
         elif opcion == "5":
+            servidor.verificar_inventario()
+        elif opcion == "6":
             print("\nSaliendo del servidor...\n")
             os._exit(0)
         else:
-            print("\n❌ Opción no válida. Por favor, seleccione 1-5.\n")
+            print("\n❌ Opción no válida. Por favor, seleccione 1-6.\n")
 
         time.sleep(1)
 